@@ -0,0 +1,13 @@
+"""
+ASGI entry point of the planner API: the Flask application of app_name.main served by an asyncio server, with reads
+waiting on BigQuery on the event loop instead of in a thread. The routes and payloads are the ones of the WSGI app.
+
+Usage:
+    gunicorn -k uvicorn.workers.UvicornWorker --workers 1 app_name.asgi:app
+"""
+from app_name.main import app as flask_app, config, query_runner, start_background_services
+from app_name.utils import io
+from app_name.utils.asgi import AsgiAdapter
+
+app = AsgiAdapter(flask_app, query_runner, threads=io.fetch_env_variable_or_default(config, 'ASGI_THREADS', 8, int),
+                  on_startup=start_background_services)
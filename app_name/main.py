@@ -1,38 +1,187 @@
+import hashlib
+import json
 import os
+import threading
+import time
 from datetime import datetime
 
 import pytz
-from flasgger import Swagger
-from flask import Flask, jsonify, Response, render_template, request
-from google.cloud import bigquery
+from flask import Flask, g, has_request_context, jsonify, Response, render_template, request
+from flask.json.provider import DefaultJSONProvider
 from google.api_core.exceptions import NotFound
 
-
+from app_name.planner.changelog import ChangeLog
+from app_name.planner.project_search import ProjectSearchIndex
 from app_name.utils import io
+from app_name.utils.asgi import REQUEST_STARTED
+from app_name.utils.cache import TTLCache
+from app_name.utils.events import EventBroker, SubscriberLimitReached
+from app_name.utils.job_stats import JobStatsClient, JobStatsCollector
+from app_name.utils.lazy import LazyMount, LazyProxy
 from app_name.utils.logger import logger, log
 from app_name.utils.metric import Metric
 from app_name.utils.monitoring import Monitoring
+from app_name.utils.python import sorted_distinct, to_bool
+from app_name.utils.query_runner import QueryRunner
+from app_name.utils.single_flight import SingleFlight
+from app_name.utils.requests import validate_token
+from app_name.utils.result_cache import ResultCache
+from app_name.utils.revalidate import Revalidator
+from app_name.utils.shared_cache import SharedResultCache
+from app_name.utils.serializers import ARROW_STREAM_MIMETYPE, iter_json_document, to_columns, to_ipc_stream, to_records
+from app_name.utils.telemetry import Telemetry
+from app_name.utils.write_behind import WriteBehindBuffer
 from app_name.utils.writers import CsvWriter
 
 app = Flask(__name__)
 config = io.load_config_by_env()
 SCRIPT_START_TS = datetime.now(pytz.utc).isoformat()
 
+# --- Telemetry ---
+# Every route is counted and timed. When METRICS_DIR is set, gunicorn workers share their totals through it so
+# /metrics sums them; by default each process reports its own.
+telemetry = Telemetry(directory=io.fetch_env_variable_or_default(config, 'METRICS_DIR', ''),
+                      flush_interval=io.fetch_env_variable_or_default(config, 'METRICS_FLUSH_SECONDS', 5, float))
+telemetry.counter('http_requests_total', 'HTTP requests by endpoint, method and status.')
+telemetry.histogram('http_request_duration_seconds', 'Time until the response is returned, by endpoint.')
+telemetry.histogram('app_phase_duration_seconds',
+                    'Time spent in bigquery_wait, row_conversion and json_serialization, by endpoint.')
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that records the time spent serializing response bodies as the 'json_serialization' phase.
+    """
+
+    def dumps(self, obj, **kwargs):
+        with telemetry.phase('json_serialization'):
+            return super().dumps(obj, **kwargs)
+
+
+app.json = TimedJSONProvider(app)
+
+
+@app.before_request
+def start_request_timer():
+    # The route pattern keeps the label set bounded; unknown paths share one label
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.telemetry_endpoint = endpoint
+    g.telemetry_token = telemetry.bind_endpoint(endpoint)
+    g.telemetry_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    if 'telemetry_start' in g:
+        # Streamed responses are timed until their headers are sent
+        telemetry.observe('http_request_duration_seconds', {'endpoint': g.telemetry_endpoint},
+                          time.perf_counter() - g.telemetry_start)
+        telemetry.inc('http_requests_total', {'endpoint': g.telemetry_endpoint, 'method': request.method,
+                                              'status': str(response.status_code)})
+        telemetry.unbind_endpoint(g.pop('telemetry_token'))
+    return response
+
+
+@app.before_request
+def start_read_deadline():
+    # Under the ASGI adapter a read runs again once its queries are ready: the deadline counts from its arrival
+    g.read_deadline = request.environ.get(REQUEST_STARTED, time.monotonic()) + READ_DEADLINE_SECONDS
+
+
+@app.after_request
+def report_data_age(response):
+    if 'data_age' in g:
+        # Seconds since the oldest data in the response was loaded, set when a stale copy was served
+        response.headers['X-Data-Age'] = str(int(g.data_age))
+    return response
+
+
 # Obtener la ruta absoluta del archivo swagger.yaml
 base_dir = os.path.abspath(os.path.dirname(__file__))  # Ruta de la carpeta src/
 swagger_path = os.path.join(base_dir, '..', 'swagger.yaml')  # Subir un nivel y apuntar a swagger.yaml
-# Configurar Swagger para que use el archivo swagger.yaml
-swagger = Swagger(app, template_file=swagger_path)
+# Swagger UI routes of flasgger's default config, served by a docs app built on their first request
+SWAGGER_PREFIXES = ('/apidocs', '/apispec', '/flasgger_static')
+
+
+def create_docs_app():
+    """
+    Returns the app serving the Swagger UI of swagger.yaml. Built on demand, so flasgger is not imported at startup.
+    """
+    from flasgger import Swagger
+
+    docs_app = Flask(__name__)
+    # Configurar Swagger para que use el archivo swagger.yaml
+    Swagger(docs_app, template_file=swagger_path)
+    return docs_app
+
+
+app.wsgi_app = LazyMount(app.wsgi_app, SWAGGER_PREFIXES, create_docs_app)
 
 # --- BigQuery Client Initialization ---
-# This will use the environment's default credentials
-# (e.g., from GOOGLE_APPLICATION_CREDENTIALS or GKE Workload Identity)
-try:
-    bigquery_client = bigquery.Client()
-    logger.info("BigQuery client initialized successfully.")
-except Exception as e:
-    logger.critical(f"Failed to initialize BigQuery client: {e}")
-    bigquery_client = None
+# DATA_SOURCE selects BigQuery ('bigquery') or a local SQLite stand-in ('local') for offline runs and load tests
+DATA_SOURCE = io.fetch_env_variable_or_default(config, 'DATA_SOURCE', 'bigquery')
+
+
+def create_bigquery_client():
+    """
+    Returns the client of the configured data source. An empty local database is seeded with generated data.
+    """
+    if DATA_SOURCE == 'local':
+        from app_name.utils.local_bigquery import LocalBigQueryClient, seed_database
+
+        client = LocalBigQueryClient(
+            path=io.fetch_env_variable_or_default(config, 'LOCAL_DB_PATH', 'logs/local_bigquery.sqlite3'),
+            latency=io.fetch_env_variable_or_default(config, 'LOCAL_DB_LATENCY_SECONDS', 0.0, float),
+        )
+        if not client.has_tables():
+            counts = seed_database(
+                client,
+                sprints=io.fetch_env_variable_or_default(config, 'LOCAL_DB_SEED_SPRINTS', 12, int),
+                projects=io.fetch_env_variable_or_default(config, 'LOCAL_DB_SEED_PROJECTS', 200, int),
+                members=io.fetch_env_variable_or_default(config, 'LOCAL_DB_SEED_MEMBERS', 80, int),
+            )
+            logger.info(f"Seeded local database {client.path}: {counts}")
+        return client
+    from google.cloud import bigquery
+
+    # This will use the environment's default credentials
+    # (e.g., from GOOGLE_APPLICATION_CREDENTIALS or GKE Workload Identity)
+    return bigquery.Client()
+
+
+# --- BigQuery Job Statistics ---
+# When enabled, every job is written as a Metric (bytes processed/billed, slot time, cache hit, queue and execution
+# time) to a CSV file under logs/. It is opt-in, since logs/ is read-only on App Engine standard.
+JOB_STATS_ENABLED = io.fetch_env_variable_or_default(config, 'JOB_STATS_ENABLED', False, to_bool)
+
+
+def create_job_stats():
+    return JobStatsCollector(
+        Monitoring(CsvWriter(io.fetch_env_variable_or_default(config, 'JOB_STATS_FILE', 'job_stats.csv'))),
+        Metric(app_env=io.fetch_env_variable_or_default(config, 'APP_ENV', None), process_name='app_name',
+               script_name=os.path.basename(__file__), root_process_type="FLASK", script_start_ts=SCRIPT_START_TS),
+        max_pending=io.fetch_env_variable_or_default(config, 'JOB_STATS_MAX_PENDING', 1000, int),
+    )
+
+
+def init_bigquery_client():
+    """
+    Creates the client of the configured data source, wrapped to record job statistics. Returns None when the
+    client cannot be created, which endpoints answer with a 500.
+    """
+    try:
+        client = create_bigquery_client()
+        logger.info(f"BigQuery client initialized successfully (data source: {DATA_SOURCE}).")
+    except Exception as e:
+        logger.critical(f"Failed to initialize BigQuery client: {e}")
+        return None
+    return JobStatsClient(client, job_stats) if job_stats is not None else client
+
+
+# The client and the job statistics sink are created on first use (or by prewarm_resources), not at import:
+# resolving default credentials alone can take seconds outside GCP
+job_stats = LazyProxy(create_job_stats, name='job_stats') if JOB_STATS_ENABLED else None
+bigquery_client = LazyProxy(init_bigquery_client, name='bigquery_client')
 
 # --- !!! IMPORTANT: CONFIGURE YOUR TABLE NAMES HERE !!! ---
 # Replace with your actual project, dataset, and table names.
@@ -43,24 +192,230 @@ PROJECTS_TABLE = f"`{PROJECT_ID}.projects.luce_projects`"
 TEAM_MEMBERS_TABLE = f"`{PROJECT_ID}.people.luce_people`"
 ASSIGNMENTS_TABLE = f"`{PROJECT_ID}.capacity_planner_app.people_assignment`"
 PROJECT_CASES_TABLE = f"`{PROJECT_ID}.capacity_planner_app.project_assignment`"
+
+# --- Query Execution ---
+# Jobs of the same request are submitted together and awaited concurrently under an overall deadline.
+# Identical reads running at the same time (e.g. a burst of users loading the planner) share one job.
+QUERY_COALESCING_ENABLED = io.fetch_env_variable_or_default(config, 'QUERY_COALESCING_ENABLED', True, to_bool)
+query_coalescing = SingleFlight() if QUERY_COALESCING_ENABLED else None
+query_runner = QueryRunner(max_workers=io.fetch_env_variable_or_default(config, 'QUERY_MAX_WORKERS', 8, int),
+                           deadline=io.fetch_env_variable_or_default(config, 'QUERY_DEADLINE_SECONDS', 60, float),
+                           telemetry=telemetry, single_flight=query_coalescing)
+
+# --- Stale-While-Revalidate ---
+# A read needing expired data waits for its refresh until READ_DEADLINE_SECONDS after the request started, then serves
+# the last good copy (up to STALE_MAX_AGE_SECONDS old, reported in X-Data-Age) while the refresh completes. Failed
+# refreshes are retried after REFRESH_BACKOFF_SECONDS, doubling up to REFRESH_BACKOFF_MAX_SECONDS.
+READ_DEADLINE_SECONDS = io.fetch_env_variable_or_default(config, 'READ_DEADLINE_SECONDS', 2, float)
+STALE_MAX_AGE_SECONDS = io.fetch_env_variable_or_default(config, 'STALE_MAX_AGE_SECONDS', 3600, float)
+
+
+def note_data_age(age):
+    """
+    Records the age of stale data served by the current request, reported in its X-Data-Age header.
+    """
+    if has_request_context():
+        g.data_age = max(g.get('data_age', 0), age)
+
+
+def read_timeout():
+    """
+    Returns the seconds left until the read deadline of the current request.
+    """
+    if not has_request_context() or 'read_deadline' not in g:
+        return READ_DEADLINE_SECONDS
+    return g.read_deadline - time.monotonic()
+
+
+revalidator = Revalidator(
+    deadline=READ_DEADLINE_SECONDS,
+    max_stale_age=STALE_MAX_AGE_SECONDS,
+    backoff=io.fetch_env_variable_or_default(config, 'REFRESH_BACKOFF_SECONDS', 5, float),
+    max_backoff=io.fetch_env_variable_or_default(config, 'REFRESH_BACKOFF_MAX_SECONDS', 300, float),
+    on_stale=note_data_age,
+)
+
+# --- Reference Data Cache ---
+# Sprints, projects and people change rarely, so they are kept in memory between requests.
+# TTLs (seconds) can be overridden per endpoint from the environment or the config file. Expired payloads are kept
+# as the last good copy served while they are refreshed.
+reference_cache = TTLCache(max_entries=io.fetch_env_variable_or_default(config, 'CACHE_MAX_ENTRIES', 64, int),
+                           grace=STALE_MAX_AGE_SECONDS)
+CACHE_TTLS = {
+    'projects-and-groups': io.fetch_env_variable_or_default(config, 'CACHE_TTL_PROJECTS', 900, float),
+    'team-data': io.fetch_env_variable_or_default(config, 'CACHE_TTL_TEAM', 900, float),
+}
+
+
+def cached_reference(name, loader):
+    """
+    Returns the reference payload stored under name, running the loader on a miss or after its TTL. An expired
+    payload is served instead when the loader does not finish before the read deadline.
+    """
+    missing = object()
+    payload = reference_cache.get(name, missing)
+    if payload is missing:
+        def refresh():
+            loaded = loader()
+            reference_cache.set(name, loaded, ttl=reference_ttl(name))
+            return loaded
+
+        payload, _ = revalidator.get(f'reference/{name}', refresh, stale=reference_cache.get_stale(name),
+                                     timeout=read_timeout())
+    return payload
+
+
+def reference_ttl(name):
+    """
+    Returns the seconds a freshly loaded reference payload is kept. Payloads built from shared results expire with
+    them, so a worker never serves a copy older than the TTL.
+    """
+    ttl = CACHE_TTLS.get(name)
+    if shared_cache is None or ttl is None:
+        return ttl
+    return shared_cache.remaining(name, ttl)
+
+
+def invalidate_reference_cache(name=None):
+    """
+    Drops one cached reference payload, or all of them when no name is given.
+    """
+    removed = reference_cache.invalidate(name)
+    if shared_cache is not None:
+        for shared_name in ([name] if name else CACHE_TTLS):
+            shared_cache.invalidate(shared_name)
+    logger.info(f"Invalidated {removed} reference cache entries ({name or 'all'}).")
+    return removed
+
+
+def refresh_reference(name, loader):
+    """
+    Loads a reference payload and replaces the cached one.
+    """
+    payload = loader()
+    reference_cache.set(name, payload, ttl=reference_ttl(name))
+
+
+# --- Persisted Query Results ---
+# Reference and sprint results are also written to RESULT_CACHE_DIR as Arrow files. After a cold start, the first
+# request of each entry is answered from the copy of the previous instance while the entry is refreshed in background.
+RESULT_CACHE_DIR = io.fetch_env_variable_or_default(config, 'RESULT_CACHE_DIR', '')
+result_cache = ResultCache(
+    RESULT_CACHE_DIR,
+    max_age=io.fetch_env_variable_or_default(config, 'RESULT_CACHE_MAX_AGE_SECONDS', 604800, float),
+) if RESULT_CACHE_DIR else None
+
+
+# --- Shared Reference Results ---
+# With several gunicorn workers, the reference results (the entries of CACHE_TTLS) are published as Arrow files in
+# SHARED_CACHE_DIR (a tmpfs such as /dev/shm) that every worker memory-maps. The worker finding them stale refreshes
+# them under a file lock, so an instance runs one query per TTL and holds one copy of the rows (see gunicorn.conf.py).
+SHARED_CACHE_DIR = io.fetch_env_variable_or_default(config, 'SHARED_CACHE_DIR', '')
+shared_cache = SharedResultCache(SHARED_CACHE_DIR) if SHARED_CACHE_DIR else None
+
+
+def queries_version(queries):
+    """
+    Returns a fingerprint of the SQL of a group of queries, so results persisted by different queries are ignored.
+    """
+    sql = [query[0] if isinstance(query, tuple) else query for _, query in sorted(queries.items())]
+    return hashlib.sha256('\0'.join(sql).encode()).hexdigest()[:16]
+
+
+def revalidate_in_background(name, refresh):
+    """
+    Runs refresh() in a daemon thread, logging its failure instead of raising it.
+    """
+    def run():
+        try:
+            refresh()
+            logger.info(f"Revalidated persisted results of {name}.")
+        except Exception as e:
+            logger.error(f"Failed to revalidate persisted results of {name}: {e}")
+
+    threading.Thread(target=run, name='result-cache-revalidate', daemon=True).start()
+
+
+def fetch_results(name, queries, revalidate):
+    """
+    Runs a group of queries as Arrow tables and persists their results under name. The first time the entry is
+    needed after a cold start, the persisted copy is returned instead and revalidate() runs in background.
+    Reference entries are shared with the other workers, so the queries only run when none of them did in the TTL.
+    """
+    if result_cache is not None:
+        persisted = result_cache.take(name, queries_version(queries))
+        if persisted is not None:
+            revalidate_in_background(name, revalidate)
+            return persisted
+    ttl = CACHE_TTLS.get(name)
+    if shared_cache is not None and ttl is not None:
+        return shared_cache.get_or_load(name, queries_version(queries), lambda: run_queries(name, queries), ttl)
+    return run_queries(name, queries)
+
+
+def run_queries(name, queries):
+    """
+    Runs a group of queries as Arrow tables and persists their results under name.
+    """
+    results = query_runner.run(bigquery_client, queries, as_arrow=True)
+    if result_cache is not None:
+        result_cache.write(name, results, queries_version(queries))
+    return results
+
+
 # --- API Endpoints ---
 
+
+def load_sprint_calendar():
+    query = f"""
+        SELECT calendar_sprint_str_i as sprint, MIN(calendar_date_date_i) as start_date,
+            MAX(calendar_date_date_i) as end_date, COUNT(DISTINCT calendar_date_date_i) as working_days
+        FROM {SPRINTS_TABLE}
+        GROUP BY calendar_sprint_str_i
+    """
+    results = fetch_results('sprint-calendar', {'sprints': query}, sprint_calendar.refresh)
+    logger.info(f"Loaded the calendar of {results['sprints'].num_rows} sprints.")
+    return results['sprints']
+
+
+def create_sprint_calendar():
+    # Imported on first use, since it loads numpy
+    from app_name.planner.sprint_calendar import SprintCalendar
+
+    return SprintCalendar(load_sprint_calendar,
+                          timezone=io.fetch_env_variable_or_default(config, 'LOG_TIMEZONE', 'UTC') or 'UTC')
+
+
+# --- Sprint Calendar ---
+# Every sprint with its dates is loaded once and kept ordered by start date; the index is reloaded on the first use
+# after midnight in LOG_TIMEZONE, when the upcoming sprints change.
+sprint_calendar = LazyProxy(create_sprint_calendar, name='sprint_calendar')
+
+
+def upcoming_sprints():
+    """
+    Returns the upcoming sprints. The daily reload of the calendar runs through the revalidator like the reference
+    data: a read waits for it until its deadline and is then answered from the index of the previous day, and a
+    failing reload is retried with backoff.
+    """
+    if sprint_calendar.expired():
+        # The stale copy is the loaded index, as old as the time since it expired at midnight
+        expired_for = sprint_calendar.expired_for()
+        # upcoming() reloads the expired index once, under the lock of the calendar, however many reads wait for it
+        revalidator.get('sprint-calendar', sprint_calendar.upcoming,
+                        stale=(None, expired_for) if expired_for is not None else None, timeout=read_timeout())
+    return sprint_calendar.upcoming(allow_stale=True)
+
+
 @app.route("/api/sprints", methods=['GET'])
 def get_sprints():
     if not bigquery_client:
         return jsonify({"error": "BigQuery client not initialized"}), 500
 
-    query = f"""
-        SELECT DISTINCT calendar_sprint_str_i as sprint_name
-        FROM {SPRINTS_TABLE}
-        WHERE calendar_date_date_i > CURRENT_DATE()
-        ORDER BY calendar_sprint_str_i ASC
-    """
     try:
-        query_job = bigquery_client.query(query)
-        results = query_job.result()
-        sprints = [row.sprint_name for row in results]
-        logger.info(f"Successfully fetched {len(sprints)} sprints.")
+        sprints = upcoming_sprints()
+        if to_bool(request.args.get('details', False)):
+            return jsonify(sprint_calendar.describe(sprints, allow_stale=True))
         return jsonify(sprints)
     except NotFound:
         logger.error(f"Table not found: {SPRINTS_TABLE}")
@@ -70,76 +425,142 @@ def get_sprints():
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/projects-and-groups", methods=['GET'])
-def get_projects_and_groups():
-    if not bigquery_client:
-        return jsonify({"error": "BigQuery client not initialized"}), 500
-
+def load_projects_and_groups():
     projects_query = f"""
         SELECT project_code_int_i as id, project_name_str_i as name, project_bussinesLine_str_d as project_group
         FROM {PROJECTS_TABLE}
         ORDER BY project_name_str_i
     """
-    groups_query = f"""
-        SELECT DISTINCT project_bussinesLine_str_d as project_group
-        FROM {PROJECTS_TABLE}
-        WHERE project_bussinesLine_str_d IS NOT NULL
-        ORDER BY project_bussinesLine_str_d
+    results = fetch_results('projects-and-groups', {'projects': projects_query},
+                            lambda: refresh_reference('projects-and-groups', load_projects_and_groups))
+    from app_name.planner.project_catalog import ProjectCatalog
+
+    # Groups are derived from the fetched projects instead of a second scan, with "All Groups" first
+    catalog = ProjectCatalog(results['projects'].to_pylist())
+    changes = project_search.update(catalog.projects)
+
+    logger.info(f"Fetched {len(catalog)} projects and {len(catalog.groups) - 1} groups. Search index: {changes}")
+    return catalog
+
+
+# --- Project Search ---
+# Indexes the names and codes of the projects of the catalog. It is updated with every catalog load, re-indexing
+# only the projects that changed.
+project_search = ProjectSearchIndex()
+PROJECT_SEARCH_LIMIT = io.fetch_env_variable_or_default(config, 'PROJECT_SEARCH_LIMIT', 20, int)
+
+
+@app.route("/api/projects/search", methods=['GET'])
+def search_projects():
+    """
+    Returns the projects whose name words start with the words of q (ignoring case and accents), whose code
+    matches q, or whose name contains or resembles q, best matches first. Accepts an optional limit.
     """
+    if not bigquery_client:
+        return jsonify({"error": "BigQuery client not initialized"}), 500
+
+    query = request.args.get('q', '')
     try:
-        # Fetch projects
-        projects_job = bigquery_client.query(projects_query)
-        projects = [dict(row) for row in projects_job.result()]
-
-        # Fetch groups
-        groups_job = bigquery_client.query(groups_query)
-        # Prepend "All Groups" to the list
-        project_groups = ['All Groups'] + [row.project_group for row in groups_job.result()]
-
-        logger.info(f"Fetched {len(projects)} projects and {len(project_groups) - 1} groups.")
-        return jsonify({
-            'projects': projects,
-            'projectGroups': project_groups
-        })
+        limit = int(request.args.get('limit') or PROJECT_SEARCH_LIMIT)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        # Loading the catalog (when missing or expired) updates the index
+        cached_reference('projects-and-groups', load_projects_and_groups)
+        return jsonify({'query': query, 'projects': project_search.search(query, limit=max(limit, 0))})
     except NotFound:
         logger.error(f"Table not found: {PROJECTS_TABLE}")
         return jsonify({"error": f"Table not found: {PROJECTS_TABLE}"}), 500
     except Exception as e:
-        logger.error(f"Error in /api/projects-and-groups: {e}")
+        logger.error(f"Error in /api/projects/search: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/team-data", methods=['GET'])
-def get_team_data():
+# --- Project Windows ---
+# Projects are filtered by group and name and paged on the server, so clients only download (and render) the
+# projects they show. PROJECTS_PAGE_SIZE is the window sent with /api/bootstrap.
+PROJECTS_PAGE_SIZE = io.fetch_env_variable_or_default(config, 'PROJECTS_PAGE_SIZE', 100, int)
+PROJECT_WINDOW_ARGS = ('group', 'name', 'offset', 'limit')
+
+
+def project_window(args):
+    """
+    Reads the group, name, offset and limit query parameters of a window of projects.
+    Raises ValueError when offset or limit are not non-negative integers.
+    """
+    offset = int(args.get('offset') or 0)
+    limit = int(args['limit']) if args.get('limit') else None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must be non-negative")
+    return {'group': args.get('group'), 'name': args.get('name'), 'offset': offset, 'limit': limit}
+
+
+def filter_projects(tables, project_ids):
+    """
+    Keeps the rows of the sprint data tables that belong to the given projects.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    return {payload_key: table.filter(pc.is_in(table['projectId'],
+                                               value_set=pa.array(project_ids, type=table['projectId'].type)))
+            for payload_key, table in tables.items()}
+
+
+@app.route("/api/projects-and-groups", methods=['GET'])
+def get_projects_and_groups():
+    """
+    Returns the project groups and the projects matching the optional group and name filters, windowed by the
+    optional offset and limit parameters, with the number of matching projects as total.
+    """
     if not bigquery_client:
         return jsonify({"error": "BigQuery client not initialized"}), 500
 
+    try:
+        window = project_window(request.args)
+    except ValueError:
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+
+    try:
+        catalog = cached_reference('projects-and-groups', load_projects_and_groups)
+        result = catalog.window(**window)
+        result['projectGroups'] = catalog.groups
+        return jsonify(result)
+    except NotFound:
+        logger.error(f"Table not found: {PROJECTS_TABLE}")
+        return jsonify({"error": f"Table not found: {PROJECTS_TABLE}"}), 500
+    except Exception as e:
+        logger.error(f"Error in /api/projects-and-groups: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+def load_team_data():
     members_query = f"""
         SELECT person_name_str_i as id, person_name_str_i as name, person_chapter_str_d as team, person_team_str_d as subteam, person_workDaysTotal_float_i as expectedDays
         FROM {TEAM_MEMBERS_TABLE}
         ORDER BY person_chapter_str_d, person_team_str_d, person_name_str_i
     """
-    teams_query = f"""
-        SELECT DISTINCT person_chapter_str_d as team
-        FROM {TEAM_MEMBERS_TABLE}
-        WHERE person_chapter_str_d IS NOT NULL
-        ORDER BY person_chapter_str_d
-    """
+    results = fetch_results('team-data', {'members': members_query},
+                            lambda: refresh_reference('team-data', load_team_data))
+    team_members = results['members'].to_pylist()
+    # Teams are derived from the fetched members instead of a second scan, with "All Teams" first
+    teams = sorted_distinct((member['team'] for member in team_members), first='All Teams')
+
+    logger.info(f"Fetched {len(team_members)} team members and {len(teams) - 1} teams.")
+    return {
+        'teamMembers': team_members,
+        'teams': teams,
+    }
+
+
+@app.route("/api/team-data", methods=['GET'])
+def get_team_data():
+    if not bigquery_client:
+        return jsonify({"error": "BigQuery client not initialized"}), 500
+
     try:
-        # Fetch team members
-        members_job = bigquery_client.query(members_query)
-        team_members = [dict(row) for row in members_job.result()]
-
-        # Fetch teams
-        teams_job = bigquery_client.query(teams_query)
-        # Prepend "All Teams"
-        teams = ['All Teams'] + [row.team for row in teams_job.result()]
-
-        logger.info(f"Fetched {len(team_members)} team members and {len(teams) - 1} teams.")
-        return jsonify({
-            'teamMembers': team_members,
-            'teams': teams,
-        })
+        return jsonify(cached_reference('team-data', load_team_data))
     except NotFound:
         logger.error(f"Table not found: {TEAM_MEMBERS_TABLE}")
         return jsonify({"error": f"Table not found: {TEAM_MEMBERS_TABLE}"}), 500
@@ -148,17 +569,11 @@ def get_team_data():
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/sprint-data", methods=['GET'])
-def get_sprint_data():
-    if not bigquery_client:
-        return jsonify({"error": "BigQuery client not initialized"}), 500
-
-    sprints_str = request.args.get('sprints', '')
-    if not sprints_str:
-        return jsonify({"error": "No sprints provided"}), 400
-
-    sprints_list = sprints_str.split(',')
-    logger.info(f"Serving data for /api/sprint-data for sprints: {sprints_list}")
+def sprint_data_queries(sprints_list):
+    """
+    Returns the assignments and project cases queries of a list of sprints, by sprint data payload key.
+    """
+    from google.cloud import bigquery
 
     job_config = bigquery.QueryJobConfig(
         query_parameters=[
@@ -167,7 +582,7 @@ def get_sprint_data():
     )
 
     assignments_query = f"""
-        SELECT sprint, project_id as projectId, person_name as memberID, assignment as days
+        SELECT sprint, project_id as projectId, person_name as memberId, assignment as days
         FROM {ASSIGNMENTS_TABLE}
         WHERE sprint IN UNNEST(@sprints)
     """
@@ -176,21 +591,202 @@ def get_sprint_data():
         FROM {PROJECT_CASES_TABLE}
         WHERE sprint IN UNNEST(@sprints)
     """
+    return {
+        'assignments': (assignments_query, job_config),
+        'projectCases': (project_cases_query, job_config),
+    }
+
+
+def load_sprint_data(sprints_list):
+    import pyarrow as pa
+
+    # After a cold start, sprints persisted by the previous instance are served at once and reloaded in background
+    version = queries_version(sprint_data_queries([]))
+    persisted = {}
+    if result_cache is not None:
+        for sprint in sprints_list:
+            tables = result_cache.take(f'sprint-data/{sprint}', version)
+            if tables is not None:
+                persisted[sprint] = tables
+    if persisted:
+        revalidate_in_background('sprint-data', lambda: assignment_store.reconcile(list(persisted)))
+
+    parts = list(persisted.values())
+    missing = [sprint for sprint in sprints_list if sprint not in persisted]
+    if missing:
+        # Fetch assignments and project cases concurrently, as Arrow tables so no per-row objects are built
+        fetched = query_runner.run(bigquery_client, sprint_data_queries(missing), as_arrow=True)
+        if result_cache is not None:
+            for sprint, tables in split_by_sprint(fetched, missing).items():
+                result_cache.write(f'sprint-data/{sprint}', tables, version)
+        parts.append(fetched)
+    results = {payload_key: pa.concat_tables([part[payload_key] for part in parts], promote_options='permissive')
+               for payload_key in ('assignments', 'projectCases')}
+
+    logger.info(f"Fetched {results['assignments'].num_rows} assignments and "
+                f"{results['projectCases'].num_rows} project cases.")
+    return results
+
+
+def split_by_sprint(results, sprints_list):
+    """
+    Splits the sprint data tables of several sprints into the tables of each sprint.
+    """
+    import pyarrow.compute as pc
+
+    split = {sprint: {} for sprint in sprints_list}
+    for payload_key, table in results.items():
+        for sprint in sprints_list:
+            split[sprint][payload_key] = (table.filter(pc.equal(table['sprint'], sprint)) if table.num_rows
+                                          else table)
+    return split
+
+
+def stream_sprint_data(sprints_list, project_ids=None):
+    """
+    Returns a generator of the /api/sprint-data JSON document that holds at most one BigQuery result page at a time.
+    Both jobs run through the query runner and are awaited before returning, so query errors and its deadline
+    surface before the response starts. Pending write-behind edits replace the rows they shadow and are sent at the
+    end of their list. When project_ids is given, only the rows of those projects are sent.
+    """
+    from app_name.planner.matrix import CELL_KINDS
+
+    results = query_runner.run(bigquery_client, sprint_data_queries(sprints_list), page_size=SPRINT_DATA_PAGE_SIZE)
+    sprints = set(sprints_list)
+    projects = set(project_ids) if project_ids is not None else None
+
+    def visible(row):
+        return projects is None or row['projectId'] in projects
+
+    def pages(kind, result):
+        pending = {edit_key(kind, row): row for row in pending_edits(kind) if row['sprint'] in sprints and visible(row)}
+        for page in result.pages:
+            yield [dict(row) for row in page if edit_key(kind, row) not in pending and visible(row)]
+        yield list(pending.values())
+
+    return iter_json_document({payload_key: pages(kind, results[payload_key])
+                               for kind, (_, payload_key) in CELL_KINDS.items()})
+
+
+def pending_edits(kind):
+    """
+    Returns the edits still waiting in the write-behind buffer, so reloaded sprints keep showing them.
+    """
+    return write_buffer.pending_rows(kind) if write_buffer is not None else []
+
+
+# --- Resident Sprint Data ---
+# Sprint cells are loaded from BigQuery once per sprint, patched in place by accepted edits and reloaded after
+# SPRINT_DATA_MAX_AGE_SECONDS (or on demand through /api/sprint-data/reconcile) to pick up external changes.
+# Every accepted edit gets a version in the change log, so clients can ask for the cells changed since theirs.
+# Versions are seeded with the creation time of the log, so each process creates its own on first use (or in
+# start_background_services): a log created in a preloading gunicorn master would give every worker the same seed.
+def create_change_log():
+    return ChangeLog(max_entries=io.fetch_env_variable_or_default(config, 'CHANGE_LOG_MAX_ENTRIES', 10000, int))
+
+
+change_log = LazyProxy(create_change_log, name='change_log')
+
+
+def create_assignment_store():
+    # Imported on first use, since it loads numpy and pyarrow
+    from app_name.planner.matrix import AssignmentStore
+
+    return AssignmentStore(
+        loader=load_sprint_data,
+        pending=pending_edits,
+        on_reload=lambda sprints: change_log.reset(),
+        max_age=io.fetch_env_variable_or_default(config, 'SPRINT_DATA_MAX_AGE_SECONDS', 900, float),
+    )
+
+
+assignment_store = LazyProxy(create_assignment_store, name='assignment_store')
+
+
+def resident_tables(sprints):
+    """
+    Returns the sprint data of the given sprints as Arrow tables. Sprints older than SPRINT_DATA_MAX_AGE_SECONDS are
+    refreshed, and served as they are when the refresh does not finish before the read deadline.
+    """
+    expired = assignment_store.expired(sprints)
+    if expired:
+        revalidator.get(('sprint-data',) + tuple(sorted(expired)), lambda: assignment_store.refresh(list(expired)),
+                        stale=(None, max(expired.values())), timeout=read_timeout())
+    return assignment_store.tables(sprints, reload_expired=False)
+
+
+# Response layouts of /api/sprint-data: rows as objects (default), one array per column, or an Arrow IPC stream
+SPRINT_DATA_FORMATS = {'json': to_records, 'columnar': to_columns, 'arrow': to_ipc_stream}
+# Rows per BigQuery page when /api/sprint-data streams its response (stream=true)
+SPRINT_DATA_PAGE_SIZE = io.fetch_env_variable_or_default(config, 'SPRINT_DATA_PAGE_SIZE', 5000, int)
+
+
+@app.route("/api/sprint-data", methods=['GET'])
+def get_sprint_data():
+    if not bigquery_client:
+        return jsonify({"error": "BigQuery client not initialized"}), 500
+
+    from app_name.planner.matrix import CELL_KINDS, cells_table
+
+    sprints_str = request.args.get('sprints', '')
+    if not sprints_str:
+        return jsonify({"error": "No sprints provided"}), 400
+
+    response_format = request.args.get('format', 'json')
+    if response_format not in SPRINT_DATA_FORMATS:
+        return jsonify({"error": f"Unknown format '{response_format}'. Use one of {list(SPRINT_DATA_FORMATS)}"}), 400
+
+    stream = to_bool(request.args.get('stream', False))
+    if stream and response_format != 'json':
+        return jsonify({"error": "Streaming is only available for the json format"}), 400
 
     try:
-        # Fetch assignments
-        assign_job = bigquery_client.query(assignments_query, job_config=job_config)
-        assignments = [dict(row) for row in assign_job.result()]
-
-        # Fetch project cases
-        pc_job = bigquery_client.query(project_cases_query, job_config=job_config)
-        project_cases = [dict(row) for row in pc_job.result()]
-
-        logger.info(f"Fetched {len(assignments)} assignments and {len(project_cases)} project cases.")
-        return jsonify({
-            'assignments': assignments,
-            'projectCases': project_cases
-        })
+        since = int(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({"error": "since must be an integer version"}), 400
+
+    # With any of group, name, offset or limit only the cells of a window of the matching projects are sent
+    try:
+        window = project_window(request.args) if any(arg in request.args for arg in PROJECT_WINDOW_ARGS) else None
+    except ValueError:
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+
+    sprints_list = sprints_str.split(',')
+    logger.info(f"Serving data for /api/sprint-data for sprints: {sprints_list} as {response_format}"
+                f"{' (streamed)' if stream else ''}")
+
+    try:
+        # Read before the snapshot: edits landing meanwhile are sent again by the next delta, never lost
+        version, changes = change_log.since(since, sprints_list) if since is not None else (change_log.version, None)
+        headers = {'X-Data-Version': str(version), 'X-Data-Delta': 'true' if changes is not None else 'false'}
+        page = None
+        if window is not None:
+            page = cached_reference('projects-and-groups', load_projects_and_groups).window(**window)
+            headers['X-Total-Count'] = str(page['total'])
+
+        if changes is not None:
+            tables = {payload_key: cells_table(kind, changes[payload_key])
+                      for kind, (_, payload_key) in CELL_KINDS.items()}
+        elif stream:
+            # Bypasses the resident store so memory stays flat however many sprints are requested
+            project_ids = [project['id'] for project in page['projects']] if page is not None else None
+            return Response(stream_sprint_data(sprints_list, project_ids), mimetype='application/json',
+                            headers=headers)
+        else:
+            tables = resident_tables(sprints_list)
+        if page is not None:
+            tables = filter_projects(tables, [project['id'] for project in page['projects']])
+
+        if response_format == 'arrow':
+            with telemetry.phase('row_conversion'):
+                body = to_ipc_stream(tables)
+            return Response(body, mimetype=ARROW_STREAM_MIMETYPE, headers=headers)
+        with telemetry.phase('row_conversion'):
+            payload = SPRINT_DATA_FORMATS[response_format](tables)
+        payload.update(version=version, delta=changes is not None)
+        if page is not None:
+            payload.update(projects=page['projects'], totalProjects=page['total'])
+        return jsonify(payload), 200, headers
     except NotFound:
         logger.error(f"Table not found: {ASSIGNMENTS_TABLE} or {PROJECT_CASES_TABLE}")
         return jsonify({"error": "One or more data tables not found."}), 500
@@ -199,50 +795,301 @@ def get_sprint_data():
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/assignment", methods=['POST'])
-def update_assignment():
+@app.route("/api/capacity-summary", methods=['GET'])
+def get_capacity_summary():
+    """
+    Returns the capacity totals (per member, team, subteam and project, grand totals and differences) of the
+    selected sprints for the projects matching the optional group and name filters.
+    """
     if not bigquery_client:
         return jsonify({"error": "BigQuery client not initialized"}), 500
 
-    assignment = request.json
-    logger.info(f"Updating assignment: {assignment}")
+    sprints_str = request.args.get('sprints', '')
+    if not sprints_str:
+        return jsonify({"error": "No sprints provided"}), 400
+
+    # Imported on first use, since it loads pandas
+    from app_name.planner.capacity import summarize_capacity
+
+    sprints_list = sprints_str.split(',')
+    try:
+        catalog = cached_reference('projects-and-groups', load_projects_and_groups)
+        team_data = cached_reference('team-data', load_team_data)
+        sprint_data = {payload_key: table.to_pylist() for payload_key, table in resident_tables(sprints_list).items()}
+        # The catalog applies the filters, so the totals cover the same projects as the windows of /api/sprint-data
+        projects = [catalog.projects[position]
+                    for position in catalog.positions(request.args.get('group'), request.args.get('name'))]
+        return jsonify(summarize_capacity(
+            team_data['teamMembers'], projects, sprint_data['assignments'], sprint_data['projectCases'], sprints_list,
+        ))
+    except NotFound as e:
+        logger.error(f"Table not found in /api/capacity-summary: {e}")
+        return jsonify({"error": "One or more data tables not found."}), 500
+    except Exception as e:
+        logger.error(f"Error in /api/capacity-summary: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/bootstrap", methods=['GET'])
+def get_bootstrap():
+    """
+    Returns everything the planner needs for its first render in a single payload: reference data, the first
+    PROJECTS_PAGE_SIZE projects plus their assignments in the default (first upcoming) sprint. The response
+    carries a content hash ETag, so a revalidation with If-None-Match is answered with an empty 304 when nothing
+    changed.
+    """
+    if not bigquery_client:
+        return jsonify({"error": "BigQuery client not initialized"}), 500
+
+    try:
+        sprints = upcoming_sprints()
+        catalog = cached_reference('projects-and-groups', load_projects_and_groups)
+        page = catalog.window(limit=PROJECTS_PAGE_SIZE)
+        team_data = cached_reference('team-data', load_team_data)
+        selected_sprints = sprints[:1]
+        if selected_sprints:
+            tables = filter_projects(resident_tables(selected_sprints),
+                                     [project['id'] for project in page['projects']])
+            sprint_data = {payload_key: table.to_pylist() for payload_key, table in tables.items()}
+        else:
+            sprint_data = {'assignments': [], 'projectCases': []}
+    except NotFound as e:
+        logger.error(f"Table not found in /api/bootstrap: {e}")
+        return jsonify({"error": "One or more data tables not found."}), 500
+    except Exception as e:
+        logger.error(f"Error in /api/bootstrap: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    response = jsonify({
+        'sprints': sprints,
+        'projects': page['projects'],
+        'totalProjects': page['total'],
+        'projectsLimit': PROJECTS_PAGE_SIZE,
+        'projectGroups': catalog.groups,
+        'teamMembers': team_data['teamMembers'],
+        'teams': team_data['teams'],
+        'selectedSprints': selected_sprints,
+        'assignments': sprint_data['assignments'],
+        'projectCases': sprint_data['projectCases'],
+    })
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+    # Let the browser keep the payload but revalidate it on every load
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+# --- Cell Edits ---
+# Each kind of editable cell maps the JSON fields sent by the planner to the columns of its table.
+EDIT_TARGETS = {
+    'assignment': {
+        'table': ASSIGNMENTS_TABLE,
+        'key_field': 'memberId',
+        'columns': {'sprint': 'sprint', 'projectId': 'project_id', 'memberId': 'person_name', 'days': 'assignment'},
+    },
+    'project_case': {
+        'table': PROJECT_CASES_TABLE,
+        'key_field': 'subteam',
+        'columns': {'sprint': 'sprint', 'projectId': 'project_id', 'subteam': 'team', 'days': 'assignment'},
+    },
+}
+BATCH_MAX_ROWS = io.fetch_env_variable_or_default(config, 'BATCH_MAX_ROWS', 500, int)
+
+
+def parse_edit(kind, edit):
+    """
+    Validates an edited cell and returns it normalized. Raises ValueError when a key field is missing.
+    """
+    key_field = EDIT_TARGETS[kind]['key_field']
+    if not isinstance(edit, dict):
+        raise ValueError("Edit must be a JSON object")
+    missing = [field for field in ('sprint', 'projectId', key_field) if edit.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
 
     # Ensure days is an integer
     try:
-        days = int(assignment.get('days', 0))
-    except ValueError:
+        days = int(edit.get('days', 0))
+    except (TypeError, ValueError):
         days = 0
 
+    return {
+        'sprint': str(edit['sprint']),
+        'projectId': int(edit['projectId']),
+        key_field: str(edit[key_field]),
+        'days': days,
+    }
+
+
+def edit_key(kind, row):
+    return row['sprint'], row['projectId'], row[EDIT_TARGETS[kind]['key_field']]
+
+
+def merge_edits(kind, rows):
+    """
+    Upserts a list of normalized edits into the table of their kind with a single MERGE ... USING UNNEST(@rows).
+    Later edits of the same cell win, since MERGE rejects several source rows matching one target row.
+    """
+    from google.cloud import bigquery
+
+    target = EDIT_TARGETS[kind]
+    columns = target['columns']
+    key_field = target['key_field']
+    rows = list({edit_key(kind, row): row for row in rows}.values())
+
     merge_query = f"""
-        MERGE INTO {ASSIGNMENTS_TABLE} T
+        MERGE INTO {target['table']} T
         USING (
             SELECT
-                @sprint AS sprint,
-                @project_id AS projectId,
-                @person_name AS memberId
+                r.sprint AS {columns['sprint']},
+                r.projectId AS {columns['projectId']},
+                r.{key_field} AS {columns[key_field]},
+                r.days AS {columns['days']}
+            FROM UNNEST(@rows) AS r
         ) S
-        ON T.sprint = S.sprint AND T.projectId = S.projectId AND T.memberId = S.memberId
+        ON T.{columns['sprint']} = S.{columns['sprint']}
+            AND T.{columns['projectId']} = S.{columns['projectId']}
+            AND T.{columns[key_field]} = S.{columns[key_field]}
         WHEN MATCHED THEN
-            UPDATE SET T.days = @days
+            UPDATE SET T.{columns['days']} = S.{columns['days']}
         WHEN NOT MATCHED THEN
-            INSERT (sprint, projectId, memberId, days)
-            VALUES (@sprint, @projectId, @memberId, @days)
+            INSERT ({columns['sprint']}, {columns['projectId']}, {columns[key_field]}, {columns['days']})
+            VALUES (S.{columns['sprint']}, S.{columns['projectId']}, S.{columns[key_field]}, S.{columns['days']})
     """
 
     job_config = bigquery.QueryJobConfig(
         query_parameters=[
-            bigquery.ScalarQueryParameter("sprint", "STRING", assignment.get('sprint')),
-            bigquery.ScalarQueryParameter("projectId", "INT64", int(assignment.get('projectId', 0))),
-            bigquery.ScalarQueryParameter("memberId", "STRING", assignment.get('memberId')),
-            bigquery.ScalarQueryParameter("days", "INT64", days),
+            bigquery.ArrayQueryParameter("rows", "STRUCT", [
+                bigquery.StructQueryParameter(
+                    None,
+                    bigquery.ScalarQueryParameter("sprint", "STRING", row['sprint']),
+                    bigquery.ScalarQueryParameter("projectId", "INT64", row['projectId']),
+                    bigquery.ScalarQueryParameter(key_field, "STRING", row[key_field]),
+                    bigquery.ScalarQueryParameter("days", "INT64", row['days']),
+                ) for row in rows
+            ])
         ]
     )
 
+    query_job = bigquery_client.query(merge_query, job_config=job_config)
+    query_job.result()  # Wait for the job to complete
+    logger.info(f"Merged {len(rows)} {kind} edits in one job.")
+    return len(rows)
+
+
+# --- Write-Behind Buffer ---
+# When enabled, edits are acknowledged once they are in the local journal and merged in the background. The journal
+# is only as durable as its disk, so it is opt-in and the app refuses to start when the journal is not writable.
+WRITE_BEHIND_ENABLED = io.fetch_env_variable_or_default(config, 'WRITE_BEHIND_ENABLED', False, to_bool)
+write_buffer = WriteBehindBuffer(
+    journal_path=io.fetch_env_variable_or_default(config, 'WRITE_BEHIND_JOURNAL', 'logs/edits.journal'),
+    flush_fn=merge_edits,
+    key_fn=edit_key,
+    flush_interval=io.fetch_env_variable_or_default(config, 'WRITE_BEHIND_FLUSH_SECONDS', 2.0, float),
+) if WRITE_BEHIND_ENABLED else None
+if write_buffer is not None:
+    write_buffer.check_journal()
+
+
+# --- Live Edits ---
+# Accepted edits are pushed to the planners that have the same sprints open (one topic per sprint). Each open stream
+# holds a server thread, so at most EVENTS_MAX_SUBSCRIBERS are open at once (further planners are told to poll) and
+# each one is closed after EVENTS_MAX_STREAM_SECONDS, when the browser reconnects and catches up with a delta.
+event_broker = EventBroker(
+    max_backlog=io.fetch_env_variable_or_default(config, 'EVENTS_MAX_BACKLOG', 100, int),
+    max_subscribers=io.fetch_env_variable_or_default(config, 'EVENTS_MAX_SUBSCRIBERS', 4, int),
+)
+EVENTS_KEEPALIVE_SECONDS = io.fetch_env_variable_or_default(config, 'EVENTS_KEEPALIVE_SECONDS', 15, float)
+EVENTS_MAX_STREAM_SECONDS = io.fetch_env_variable_or_default(config, 'EVENTS_MAX_STREAM_SECONDS', 300, float)
+EVENTS_RETRY_AFTER_SECONDS = 60
+
+
+def publish_edits(kind, rows, version, origin=None):
+    """
+    Publishes saved edits on the topic of their sprint. The last edit has the given change version.
+    """
+    first_version = version - len(rows) + 1
+    for offset, row in enumerate(rows):
+        event_broker.publish(row['sprint'], {'kind': kind, 'row': row, 'version': first_version + offset,
+                                             'origin': origin})
+
+
+def save_edits(kind, rows, origin=None):
+    """
+    Persists normalized edits, through the write-behind buffer when enabled. Returns 'queued' or 'merged'.
+    The edits are then published to the other planners; origin identifies the client that made them.
+    """
+    if write_buffer is not None:
+        write_buffer.submit(kind, rows)
+        outcome = 'queued'
+    else:
+        merge_edits(kind, rows)
+        outcome = 'merged'
+    assignment_store.apply(kind, rows)
+    publish_edits(kind, rows, change_log.record(kind, rows), origin)
+    return outcome
+
+
+def apply_batch(kind, edits, origin=None):
+    """
+    Validates a list of edits, saves the valid ones together and returns a result per input row.
+    """
+    results, valid = [], []
+    for index, edit in enumerate(edits):
+        try:
+            row = parse_edit(kind, edit)
+            results.append({'index': index, 'status': 'ok', 'row': row})
+            valid.append(row)
+        except (ValueError, TypeError) as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+
+    if valid:
+        try:
+            outcome = save_edits(kind, valid, origin)
+        except Exception as e:
+            logger.error(f"Error merging {kind} batch: {e}")
+            for result in results:
+                if result['status'] == 'ok':
+                    result.update(status='error', error=str(e))
+            return results, 500
+        for result in results:
+            if result['status'] == 'ok':
+                result['status'] = outcome
+    return results, 200
+
+
+def update_cells(kind, edits_payload, endpoint):
+    if not bigquery_client:
+        return jsonify({"error": "BigQuery client not initialized"}), 500
+
+    edits = edits_payload.get('rows') if isinstance(edits_payload, dict) else edits_payload
+    if not isinstance(edits, list) or not edits:
+        return jsonify({"error": "Expected a non-empty JSON array of edits"}), 400
+    if len(edits) > BATCH_MAX_ROWS:
+        return jsonify({"error": f"Too many edits in one batch (max {BATCH_MAX_ROWS})"}), 400
+
+    logger.info(f"Updating {len(edits)} cells through {endpoint}")
+    results, status = apply_batch(kind, edits, request.args.get('client'))
+    return jsonify({
+        'results': results,
+        'merged': sum(1 for result in results if result['status'] == 'merged'),
+        'queued': sum(1 for result in results if result['status'] == 'queued'),
+    }), status
+
+
+@app.route("/api/assignment", methods=['POST'])
+def update_assignment():
+    if not bigquery_client:
+        return jsonify({"error": "BigQuery client not initialized"}), 500
+
+    assignment = request.json
+    logger.info(f"Updating assignment: {assignment}")
+
     try:
-        query_job = bigquery_client.query(merge_query, job_config=job_config)
-        query_job.result()  # Wait for the job to complete
-        logger.info(f"Successfully merged assignment: {assignment}")
+        outcome = save_edits('assignment', [parse_edit('assignment', assignment)], request.args.get('client'))
+        logger.info(f"Successfully {outcome} assignment: {assignment}")
         return jsonify(assignment)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error in /api/assignment: {e}")
         return jsonify({"error": str(e)}), 500
@@ -257,45 +1104,114 @@ def update_project_case():
     logger.info(f"Updating project case: {project_case}")
 
     try:
-        days = int(project_case.get('days', 0))
-    except ValueError:
-        days = 0
+        outcome = save_edits('project_case', [parse_edit('project_case', project_case)],
+                             request.args.get('client'))
+        logger.info(f"Successfully {outcome} project case: {project_case}")
+        return jsonify(project_case)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in /api/project-case: {e}")
+        return jsonify({"error": str(e)}), 500
 
-    merge_query = f"""
-        MERGE INTO {PROJECT_CASES_TABLE} T
-        USING (
-            SELECT
-                @sprint AS sprint,
-                @projectId AS projectId,
-                @subteam AS subteam
-        ) S
-        ON T.sprint = S.sprint AND T.projectId = S.projectId AND T.subteam = S.subteam
-        WHEN MATCHED THEN
-            UPDATE SET T.days = @days
-        WHEN NOT MATCHED THEN
-            INSERT (sprint, projectId, subteam, days)
-            VALUES (@sprint, @projectId, @subteam, @days)
+
+@app.route("/api/assignments:batch", methods=['POST'])
+def update_assignments_batch():
+    return update_cells('assignment', request.get_json(silent=True), '/api/assignments:batch')
+
+
+@app.route("/api/project-cases:batch", methods=['POST'])
+def update_project_cases_batch():
+    return update_cells('project_case', request.get_json(silent=True), '/api/project-cases:batch')
+
+
+def iter_events(subscription, client_id=None):
+    """
+    Yields the server-sent events of a subscription until the client disconnects or EVENTS_MAX_STREAM_SECONDS
+    have passed. Edits made by the subscribing client itself are skipped, a 'resync' event is sent when the bounded
+    backlog dropped events, and a comment line is sent every EVENTS_KEEPALIVE_SECONDS to keep idle connections open.
     """
+    expires_at = time.monotonic() + EVENTS_MAX_STREAM_SECONDS
+    try:
+        yield 'retry: 5000\n\n'
+        while time.monotonic() < expires_at:
+            events, overflowed = subscription.get(timeout=min(EVENTS_KEEPALIVE_SECONDS,
+                                                              max(expires_at - time.monotonic(), 0)))
+            if overflowed:
+                yield 'event: resync\ndata: {}\n\n'
+            chunks = [f"id: {event['version']}\nevent: {event['kind']}\ndata: {json.dumps(event['row'])}\n\n"
+                      for event in events if client_id is None or event['origin'] != client_id]
+            yield ''.join(chunks) if chunks else ': keepalive\n\n'
+    finally:
+        event_broker.unsubscribe(subscription)
 
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("sprint", "STRING", project_case.get('sprint')),
-            bigquery.ScalarQueryParameter("projectId", "INT64", int(project_case.get('projectId', 0))),
-            bigquery.ScalarQueryParameter("subteam", "STRING", project_case.get('subteam')),
-            bigquery.ScalarQueryParameter("days", "INT64", days),
-        ]
-    )
+
+@app.route("/api/events", methods=['GET'])
+def get_events():
+    """
+    Server-sent events stream of the edits accepted for the given sprints. Each event is named after the kind of
+    cell ('assignment' or 'project_case'), carries the edited row as data and the change version as id. Answers 503
+    with Retry-After when EVENTS_MAX_SUBSCRIBERS streams are already open, so the planner polls instead.
+    """
+    sprints_str = request.args.get('sprints', '')
+    if not sprints_str:
+        return jsonify({"error": "No sprints provided"}), 400
 
     try:
-        query_job = bigquery_client.query(merge_query, job_config=job_config)
-        query_job.result()  # Wait for the job to complete
-        logger.info(f"Successfully merged project case: {project_case}")
-        return jsonify(project_case)
+        subscription = event_broker.subscribe(sprints_str.split(','))
+    except SubscriberLimitReached as e:
+        logger.warning(f"Refused /api/events stream: {e}")
+        return jsonify({"error": "Too many live edit streams, poll /api/sprint-data instead"}), 503, {
+            'Retry-After': str(EVENTS_RETRY_AFTER_SECONDS)}
+    return Response(iter_events(subscription, request.args.get('client')), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route("/api/cache/stats", methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'reference': reference_cache.stats(),
+        'sprintData': assignment_store.memory_report(),
+        'events': event_broker.stats(),
+        'jobStats': job_stats.stats() if job_stats is not None and job_stats.resolved else None,
+        'resultCache': result_cache.stats() if result_cache is not None else None,
+        'sharedCache': shared_cache.stats() if shared_cache is not None else None,
+        'revalidation': revalidator.stats(),
+        'queryCoalescing': query_coalescing.stats() if query_coalescing is not None else None,
+    })
+
+
+@app.route("/metrics", methods=['GET'])
+def get_metrics():
+    return Response(telemetry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route("/api/sprint-data/reconcile", methods=['POST'])
+def reconcile_sprint_data():
+    validate_token(request, config)
+    if not bigquery_client:
+        return jsonify({"error": "BigQuery client not initialized"}), 500
+
+    sprints_str = request.args.get('sprints', '')
+    try:
+        changed = assignment_store.reconcile(sprints_str.split(',') if sprints_str else None)
+        logger.info(f"Reconciled resident sprint data with BigQuery: {changed} cells changed.")
+        return jsonify({'changed': changed})
     except Exception as e:
-        logger.error(f"Error in /api/project-case: {e}")
+        logger.error(f"Error in /api/sprint-data/reconcile: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/cache/invalidate", methods=['POST'])
+def invalidate_cache():
+    validate_token(request, config)
+    name = request.args.get('name')
+    removed = invalidate_reference_cache(name)
+    if name in (None, 'sprints'):
+        removed += int(sprint_calendar.invalidate())
+    return jsonify({'invalidated': removed})
+
+
 @app.route("/", methods=['GET'])
 def index() -> Response:
     """
@@ -304,6 +1220,58 @@ def index() -> Response:
     return render_template('index.html')
 
 
+# --- Warmup ---
+# Lazily created resources are prewarmed in background when the serving process starts its background services, so
+# the instance starts listening without waiting for them. App Engine warmup requests (inbound_services: warmup)
+# create them before user traffic.
+LAZY_RESOURCES = [resource for resource in (bigquery_client, job_stats, sprint_calendar, assignment_store)
+                  if resource is not None]
+
+
+@app.route("/_ah/warmup", methods=['GET'])
+def warmup():
+    for resource in LAZY_RESOURCES:
+        resource.resolve()
+    return jsonify({resource.name: resource.init_seconds for resource in LAZY_RESOURCES})
+
+
+PREWARM_ON_START = io.fetch_env_variable_or_default(config, 'PREWARM_ON_START', True, to_bool)
+services_lock = threading.Lock()
+services_started = False
+
+
+def start_background_services(workers=1):
+    """
+    Starts the background work of the serving process: its change log, telemetry flushes, write-behind flushes
+    (replaying the journal) and the creation of the lazy resources when PREWARM_ON_START. Importing the module does
+    not start them: the entry points call it once the process serves, i.e. main(), the gunicorn workers
+    (post_worker_init in gunicorn.conf.py, after the fork when the app is preloaded) and the ASGI lifespan startup.
+    Calling it more than once has no effect.
+
+    Args:
+        workers (int): The number of processes serving the app (default is 1).
+
+    Raises:
+        RuntimeError: If write-behind is enabled and more than one process serves the app. The workers would share
+            the journal, each compacting away the edits of the others and replaying them on start.
+    """
+    global services_started
+    if write_buffer is not None and workers > 1:
+        raise RuntimeError(f"Write-behind needs a single worker, not {workers}: the workers would share the journal "
+                           f"{write_buffer.journal_path}")
+    with services_lock:
+        if services_started:
+            return
+        services_started = True
+    change_log.resolve()
+    telemetry.start()
+    if write_buffer is not None:
+        write_buffer.start()
+    if PREWARM_ON_START:
+        for lazy_resource in LAZY_RESOURCES:
+            lazy_resource.prewarm()
+
+
 def main():
     host = io.fetch_env_variable(config, 'HOST')
     port = io.fetch_env_variable(config, 'PORT')
@@ -317,6 +1285,7 @@ def main():
                     root_process_type="FLASK", status="RUNNING", script_start_ts=SCRIPT_START_TS)
     monitoring.write_metric(metric)
 
+    start_background_services()
     app.run(host=host, port=port)
 
 
@@ -0,0 +1,3 @@
+"""
+Capacity planning domain logic: aggregations and data structures over sprints, projects and people
+"""
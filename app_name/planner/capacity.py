@@ -0,0 +1,121 @@
+"""
+This module provides the capacity aggregations shown by the planner (per member, team, subteam, project and grand
+totals, plus differences) computed with vectorized pandas group-bys instead of nested loops in the browser.
+
+Functions:
+    summarize_capacity(...): Aggregates assignments and project cases of a set of sprints.
+"""
+import pandas as pd
+
+MEMBER_COLUMNS = ['id', 'team', 'subteam', 'expectedDays']
+PROJECT_COLUMNS = ['id', 'name', 'project_group']
+ASSIGNMENT_COLUMNS = ['sprint', 'projectId', 'memberId', 'days']
+PROJECT_CASE_COLUMNS = ['sprint', 'projectId', 'subteam', 'days']
+
+
+def _frame(records, columns):
+    """
+    Builds a DataFrame with the given columns from a list of dicts, ignoring any other key.
+
+    Args:
+        records (list): The rows as dicts.
+        columns (list): The columns to keep.
+
+    Returns:
+        pd.DataFrame: The DataFrame, with numeric 'days'/'expectedDays' columns when present.
+    """
+    df = pd.DataFrame.from_records(records, columns=columns) if records else pd.DataFrame(columns=columns)
+    for column in ('days', 'expectedDays'):
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype(float)
+    return df
+
+
+def _totals(series):
+    """
+    Converts a numeric Series into a plain dict of floats.
+
+    Args:
+        series (pd.Series): The totals indexed by key.
+
+    Returns:
+        dict: The totals by key.
+    """
+    return {key: float(value) for key, value in series.items()}
+
+
+def summarize_capacity(team_members, projects, assignments, project_cases, sprints):
+    """
+    Aggregates the assignments and project cases of the given projects of a set of sprints.
+
+    Args:
+        team_members (list): The team members as dicts with id, team, subteam and expectedDays.
+        projects (list): The projects to total, as dicts with id, name and project_group. Callers apply the project
+            filters (see ProjectCatalog.positions).
+        assignments (list): The assignments as dicts with sprint, projectId, memberId and days.
+        project_cases (list): The project cases as dicts with sprint, projectId, subteam and days.
+        sprints (list): The selected sprints.
+
+    Returns:
+        dict: The totals by member, team, subteam and project, and the grand totals.
+    """
+    members = _frame(team_members, MEMBER_COLUMNS)
+    project_ids = _frame(projects, PROJECT_COLUMNS)['id'].to_numpy()
+
+    assigned = _frame(assignments, ASSIGNMENT_COLUMNS)
+    assigned = assigned[assigned['sprint'].isin(sprints) & assigned['projectId'].isin(project_ids)]
+    cases = _frame(project_cases, PROJECT_CASE_COLUMNS)
+    cases = cases[cases['sprint'].isin(sprints) & cases['projectId'].isin(project_ids)]
+
+    # Attach the team of each member, and every team a subteam belongs to
+    member_teams = members[['id', 'team']].drop_duplicates('id').rename(columns={'id': 'memberId'})
+    assigned = assigned.merge(member_teams, on='memberId', how='left')
+    subteam_teams = members[['team', 'subteam']].dropna().drop_duplicates()
+    team_cases = cases.merge(subteam_teams, on='subteam', how='inner')
+    all_subteams = sorted(members['subteam'].dropna().unique())
+
+    # Per member
+    per_member = assigned.groupby('memberId')['days'].sum()
+    member_assigned = members['id'].map(per_member).fillna(0.0)
+    member_totals = {
+        member_id: {'assigned': float(total), 'expected': float(expected), 'difference': float(expected - total)}
+        for member_id, total, expected in zip(members['id'], member_assigned, members['expectedDays'])
+    }
+
+    # Per team and subteam
+    per_team = assigned.dropna(subset=['team']).groupby('team')['days'].sum()
+    per_team = per_team.reindex(sorted(members['team'].dropna().unique()), fill_value=0.0)
+    per_subteam = cases.groupby('subteam')['days'].sum().reindex(all_subteams, fill_value=0.0)
+
+    # Per sprint and project, in total and per team
+    keys = ['sprint', 'projectId']
+    project_frame = pd.concat([
+        assigned.groupby(keys)['days'].sum().rename('assigned'),
+        cases.groupby(keys)['days'].sum().rename('expected'),
+    ], axis=1).fillna(0.0)
+    team_frame = pd.concat([
+        assigned.dropna(subset=['team']).groupby(keys + ['team'])['days'].sum().rename('assigned'),
+        team_cases.groupby(keys + ['team'])['days'].sum().rename('expected'),
+    ], axis=1).fillna(0.0)
+    team_frame['difference'] = team_frame['assigned'] - team_frame['expected']
+
+    # One dict of team totals per project, built per group instead of per row
+    team_totals = team_frame.reset_index(level='team')
+    teams_by_project = {key: group.set_index('team').to_dict('index')
+                        for key, group in team_totals.groupby(level=keys)}
+    project_totals = project_frame.reset_index().to_dict('records')
+    for project in project_totals:
+        project['teams'] = teams_by_project.get((project['sprint'], project['projectId']), {})
+
+    return {
+        'sprints': list(sprints),
+        'members': member_totals,
+        'teams': _totals(per_team),
+        'subteams': _totals(per_subteam),
+        'projects': project_totals,
+        'totals': {
+            'assigned': float(per_team.sum()),
+            'expected': float(per_subteam.sum()),
+            'visibleProjects': int(len(project_ids)),
+        },
+    }
@@ -0,0 +1,111 @@
+"""
+This module provides the ChangeLog class, a bounded in-memory log of planner cell edits with monotonically
+increasing versions, used to send clients only the cells that changed since the version they already have.
+
+Classes:
+    ChangeLog: Bounded log of cell edits that answers "what changed since version N" or asks for a full snapshot.
+"""
+import threading
+import time
+from collections import deque
+
+
+class ChangeLog(object):
+    """
+    ChangeLog assigns every recorded edit the next version number and keeps the most recent edits. Versions start
+    at the creation time in microseconds, so versions handed out by an earlier process (or another worker) are
+    recognised as unknown and answered with a full snapshot instead of a wrong delta.
+
+    Attributes:
+        max_entries (int): The number of edits kept before the oldest ones are compacted away.
+        version (int): The version of the latest recorded edit.
+    """
+
+    def __init__(self, max_entries=10000, clock=time.time):
+        """
+        Initializes the ChangeLog with the given parameters.
+
+        Args:
+            max_entries (int): The number of edits kept (default is 10000).
+            clock (callable): Function returning the current time in seconds, used to seed the versions.
+        """
+        self.max_entries = max_entries
+        self.version = int(clock() * 1e6)
+        self._floor = self.version
+        self._entries = deque()
+        self._lock = threading.Lock()
+
+    def record(self, kind, rows):
+        """
+        Records edits of one kind, one version per edit.
+
+        Args:
+            kind (str): 'assignment' or 'project_case'.
+            rows (list): The edits, as dicts with sprint, projectId, the column field and days.
+
+        Returns:
+            int: The version of the last recorded edit.
+        """
+        with self._lock:
+            for row in rows:
+                self.version += 1
+                self._entries.append((self.version, kind, row))
+            while len(self._entries) > self.max_entries:
+                self._floor = self._entries.popleft()[0]
+            return self.version
+
+    def reset(self):
+        """
+        Forgets every recorded edit and moves to a new version, so any version issued before gets a full snapshot.
+        Used when cells change outside the log, e.g. when sprints are reloaded from the source.
+
+        Returns:
+            int: The new version.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.version += 1
+            self._floor = self.version
+            return self.version
+
+    def since(self, version, sprints=None):
+        """
+        Returns the cells edited after a version, the latest value of each cell only.
+
+        Args:
+            version (int): The version the client already has.
+            sprints (list, optional): The sprints of interest. Every sprint when not provided.
+
+        Returns:
+            tuple: The current version and the changed 'assignments' and 'projectCases' rows. The rows are None
+                when the version is older than the compacted log or was not issued by this log, in which case a
+                full snapshot is needed.
+        """
+        # Imported here, since the matrix module loads numpy and pyarrow
+        from app_name.planner.matrix import CELL_KINDS
+
+        sprints = None if sprints is None else set(sprints)
+        with self._lock:
+            current = self.version
+            if version < self._floor or version > current:
+                return current, None
+            changes = {kind: {} for kind in CELL_KINDS}
+            # Entries are in version order, so walking back from the newest stops at the client version
+            for entry_version, kind, row in reversed(self._entries):
+                if entry_version <= version:
+                    break
+                if sprints is None or row['sprint'] in sprints:
+                    key = (row['sprint'], row['projectId'], row[CELL_KINDS[kind][0]])
+                    changes[kind].setdefault(key, row)
+        return current, {payload_key: list(reversed(list(changes[kind].values())))
+                         for kind, (_, payload_key) in CELL_KINDS.items()}
+
+    def stats(self):
+        """
+        Returns the log counters.
+
+        Returns:
+            dict: A dictionary with the current version, the oldest version a delta can start from and the entries.
+        """
+        with self._lock:
+            return {'version': self.version, 'floor': self._floor, 'entries': len(self._entries)}
@@ -0,0 +1,528 @@
+"""
+This module provides a resident, sparse representation of the planner cells (sprint x project x member
+assignments and sprint x project x subteam cases) so that sprint data is read from BigQuery once and then served
+and patched in memory.
+
+Classes:
+    Codebook: Bidirectional mapping between values (project ids, member names, subteams) and integer codes.
+    SparseCells: Growable COO matrix with O(1) in-place updates and an on-demand CSR view.
+    AssignmentStore: Per-sprint sparse matrices loaded once, patched on writes and reconciled on demand.
+
+Functions:
+    cells_table(kind, rows): Builds the Arrow table of a list of cells, with the schema used by AssignmentStore.
+"""
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+CELL_KINDS = {
+    # kind: (field of the column dimension, name of the row list in the sprint data payload)
+    'assignment': ('memberId', 'assignments'),
+    'project_case': ('subteam', 'projectCases'),
+}
+
+
+class Codebook(object):
+    """
+    Codebook assigns consecutive integer codes to values, so matrices can be indexed by int32 arrays.
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._array = None
+        self.values = []
+
+    def encode(self, value):
+        """
+        Returns the code of a value, assigning a new one if the value has not been seen.
+
+        Args:
+            value (hashable): The value to encode.
+
+        Returns:
+            int: The code of the value.
+        """
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+            self._array = None
+        return code
+
+    def encode_column(self, column):
+        """
+        Encodes an Arrow column, looking up each distinct value once instead of once per row.
+
+        Args:
+            column (pa.ChunkedArray): The column to encode. It must not contain nulls.
+
+        Returns:
+            np.ndarray: The int32 codes of the column values.
+        """
+        encoded = column.combine_chunks().dictionary_encode() if len(column) else pa.array([]).dictionary_encode()
+        mapping = np.array([self.encode(value) for value in encoded.dictionary.to_pylist()], dtype=np.int32)
+        indices = encoded.indices.to_numpy(zero_copy_only=False)
+        return mapping[indices] if len(mapping) else np.empty(0, dtype=np.int32)
+
+    def decode(self, codes):
+        """
+        Returns the values of an array of codes.
+
+        Args:
+            codes (np.ndarray): The codes to decode.
+
+        Returns:
+            np.ndarray: The values, as an object array.
+        """
+        if self._array is None:
+            self._array = np.empty(len(self.values), dtype=object)
+            self._array[:] = self.values
+        return self._array[codes]
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return 2 * 8 * len(self.values)
+
+
+class SparseCells(object):
+    """
+    SparseCells stores the non-empty cells of a matrix as COO arrays (rows, cols, data) plus a position index,
+    so a cell can be inserted or overwritten in place. A CSR view is built when row-ordered access is needed.
+    """
+
+    def __init__(self, capacity=64):
+        """
+        Initializes an empty matrix.
+
+        Args:
+            capacity (int): The initial number of cells allocated (default is 64).
+        """
+        self.rows = np.empty(capacity, dtype=np.int32)
+        self.cols = np.empty(capacity, dtype=np.int32)
+        self.data = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+        self._positions = None
+
+    @classmethod
+    def from_arrays(cls, rows, cols, data):
+        """
+        Builds a matrix from COO arrays. When a cell appears more than once, its last value wins.
+
+        Args:
+            rows (np.ndarray): The row codes.
+            cols (np.ndarray): The column codes.
+            data (np.ndarray): The cell values.
+
+        Returns:
+            SparseCells: The matrix.
+        """
+        keys = (rows.astype(np.int64) << 32) | cols.astype(np.int64)
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - last)
+        cells = cls(capacity=max(len(keep), 64))
+        cells.size = len(keep)
+        cells.rows[:cells.size] = rows[keep]
+        cells.cols[:cells.size] = cols[keep]
+        cells.data[:cells.size] = data[keep]
+        return cells
+
+    @property
+    def positions(self):
+        """
+        Index of cell positions by (row, col), built on the first in-place update.
+        """
+        if self._positions is None:
+            self._positions = {(int(row), int(col)): position for position, (row, col)
+                               in enumerate(zip(self.rows[:self.size], self.cols[:self.size]))}
+        return self._positions
+
+    def set(self, row, col, value):
+        """
+        Sets the value of a cell, inserting it if it does not exist.
+
+        Args:
+            row (int): The row code.
+            col (int): The column code.
+            value (float): The cell value.
+        """
+        position = self.positions.get((row, col))
+        if position is None:
+            if self.size == len(self.data):
+                self._grow()
+            position = self.positions[(row, col)] = self.size
+            self.rows[position] = row
+            self.cols[position] = col
+            self.size += 1
+        self.data[position] = value
+
+    def get(self, row, col, default=0.0):
+        position = self.positions.get((row, col))
+        return default if position is None else float(self.data[position])
+
+    def to_csr(self, n_rows):
+        """
+        Returns the matrix in CSR form.
+
+        Args:
+            n_rows (int): The number of rows of the matrix.
+
+        Returns:
+            tuple: (indptr, indices, data) arrays, with cells of each row ordered by column.
+        """
+        rows, cols, data = self.rows[:self.size], self.cols[:self.size], self.data[:self.size]
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return indptr, cols[order], data[order]
+
+    def column_totals(self, n_cols):
+        """
+        Returns the sum of every column.
+
+        Args:
+            n_cols (int): The number of columns of the matrix.
+
+        Returns:
+            np.ndarray: The column sums.
+        """
+        return np.bincount(self.cols[:self.size], weights=self.data[:self.size], minlength=n_cols)
+
+    @property
+    def nbytes(self):
+        # Arrays plus an estimate of the position index (a dict entry with a tuple key is about 100 bytes)
+        return self.rows.nbytes + self.cols.nbytes + self.data.nbytes + 100 * len(self._positions or ())
+
+    def _grow(self):
+        capacity = max(2 * len(self.data), 64)
+        self.rows = np.resize(self.rows, capacity)
+        self.cols = np.resize(self.cols, capacity)
+        self.data = np.resize(self.data, capacity)
+
+
+class AssignmentStore(object):
+    """
+    AssignmentStore keeps the cells of each loaded sprint in two SparseCells matrices indexed by shared codebooks.
+    Sprints are loaded on first read, writes patch the loaded sprints in place, and reconcile() reloads them from
+    the source of truth. The loader never runs holding the lock, so writes and reads of other sprints are not held
+    up by a load: readers keep reading the resident cells until the loaded ones replace them, and edits applied
+    while a load runs are applied again on top of the loaded cells.
+
+    Attributes:
+        max_age (float): Seconds after which a loaded sprint is reloaded on read (None keeps it forever).
+    """
+
+    def __init__(self, loader, max_age=None, pending=None, on_reload=None, clock=time.monotonic):
+        """
+        Initializes the AssignmentStore with the given parameters.
+
+        Args:
+            loader (callable): Function called as loader(sprints) returning a dict with the 'assignments' and
+                'projectCases' of those sprints, as Arrow tables or lists of dicts.
+            max_age (float, optional): Seconds after which a loaded sprint is reloaded on read.
+            pending (callable, optional): Function called as pending(kind) returning accepted edits not yet in
+                the source, which are applied on top of every load.
+            on_reload (callable, optional): Function called as on_reload(sprints) after resident sprints are
+                replaced by a new load, since their cells may have changed outside this store.
+            clock (callable): Function returning the current time in seconds (default is time.monotonic).
+        """
+        self.max_age = max_age
+        self._loader = loader
+        self._pending = pending
+        self._on_reload = on_reload
+        self._clock = clock
+        self._projects = Codebook()
+        self._columns = {kind: Codebook() for kind in CELL_KINDS}
+        self._sprints = {}
+        self._loaded_at = {}
+        # Edits applied while loads fetch their rows, applied again on top of the fetched rows
+        self._refresh_journals = []
+        self._lock = threading.RLock()
+
+    def get(self, sprints):
+        """
+        Returns the sprint data of the given sprints, loading the ones not resident yet.
+
+        Args:
+            sprints (list): The sprint names.
+
+        Returns:
+            dict: The 'assignments' and 'projectCases' rows of the sprints.
+        """
+        return {payload_key: table.to_pylist() for payload_key, table in self.tables(sprints).items()}
+
+    def tables(self, sprints, reload_expired=True):
+        """
+        Returns the sprint data of the given sprints as Arrow tables, loading the ones not resident yet.
+
+        Args:
+            sprints (list): The sprint names.
+            reload_expired (bool): Whether resident sprints older than max_age are reloaded first (default is
+                True). When False they are returned as they are, e.g. while refresh() reloads them.
+
+        Returns:
+            dict: The 'assignments' and 'projectCases' tables of the sprints.
+        """
+        sprints = list(dict.fromkeys(sprints))
+        with self._lock:
+            missing = [sprint for sprint in sprints if sprint not in self._sprints]
+        if reload_expired:
+            missing += list(self.expired(sprints))
+        if missing:
+            self._load(missing)
+        with self._lock:
+            return {payload_key: self._table(kind, sprints) for kind, (_, payload_key) in CELL_KINDS.items()}
+
+    def expired(self, sprints):
+        """
+        Returns the resident sprints loaded more than max_age seconds ago.
+
+        Args:
+            sprints (list): The sprint names.
+
+        Returns:
+            dict: The seconds since each expired sprint was loaded, by sprint.
+        """
+        if self.max_age is None:
+            return {}
+        with self._lock:
+            now = self._clock()
+            ages = {sprint: now - self._loaded_at[sprint] for sprint in dict.fromkeys(sprints)
+                    if sprint in self._sprints}
+        return {sprint: age for sprint, age in ages.items() if age >= self.max_age}
+
+    def refresh(self, sprints):
+        """
+        Reloads sprints while reads keep being answered from the resident cells. Edits applied meanwhile are
+        applied again on top of the new cells.
+
+        Args:
+            sprints (list): The sprints to reload.
+        """
+        self._load(sprints)
+
+    def apply(self, kind, rows):
+        """
+        Patches loaded sprints with accepted edits. Edits of sprints that are not resident are ignored, since they
+        will be read from the source when the sprint is loaded.
+
+        Args:
+            kind (str): 'assignment' or 'project_case'.
+            rows (list): The edits, as dicts with sprint, projectId, the column field and days.
+
+        Returns:
+            int: The number of cells patched.
+        """
+        with self._lock:
+            for journal in self._refresh_journals:
+                journal.append((kind, rows))
+            return self._apply(kind, rows)
+
+    def reconcile(self, sprints=None):
+        """
+        Reloads resident sprints from the source and reports how many cells differed.
+
+        Args:
+            sprints (list, optional): The sprints to reload. Every resident sprint when not provided.
+
+        Returns:
+            int: The number of cells whose value changed, appeared or disappeared.
+        """
+        with self._lock:
+            sprints = [sprint for sprint in (sprints or list(self._sprints)) if sprint in self._sprints]
+        if not sprints:
+            return 0
+        return self._load(sprints, count_changes=True)
+
+    def invalidate(self, sprints=None):
+        """
+        Drops resident sprints so they are loaded again on the next read.
+
+        Args:
+            sprints (list, optional): The sprints to drop. Every sprint when not provided.
+        """
+        with self._lock:
+            for sprint in (list(self._sprints) if sprints is None else sprints):
+                self._sprints.pop(sprint, None)
+                self._loaded_at.pop(sprint, None)
+
+    def memory_report(self):
+        """
+        Returns the number of resident sprints and cells and the memory they use.
+
+        Returns:
+            dict: The memory report.
+        """
+        with self._lock:
+            cells = {kind: sum(matrices[kind].size for matrices in self._sprints.values()) for kind in CELL_KINDS}
+            matrix_bytes = sum(matrix.nbytes for matrices in self._sprints.values() for matrix in matrices.values())
+            codebook_bytes = self._projects.nbytes + sum(codebook.nbytes for codebook in self._columns.values())
+            return {
+                'sprints': sorted(self._sprints),
+                'assignmentCells': cells['assignment'],
+                'projectCaseCells': cells['project_case'],
+                'projects': len(self._projects),
+                'members': len(self._columns['assignment']),
+                'subteams': len(self._columns['project_case']),
+                'bytes': matrix_bytes + codebook_bytes,
+            }
+
+    def _load(self, sprints, count_changes=False):
+        """
+        Loads sprints from the source without holding the lock, then replaces any resident copy under it and applies
+        again the edits applied while the loader ran. Returns the number of cells the load changed when
+        count_changes, 0 otherwise.
+        """
+        journal = []
+        with self._lock:
+            self._refresh_journals.append(journal)
+        try:
+            data = self._loader(sprints)
+        except Exception:
+            with self._lock:
+                self._refresh_journals.remove(journal)
+            raise
+        with self._lock:
+            # Removed in the same critical section as the replacement, so no edit falls between the two
+            self._refresh_journals.remove(journal)
+            before = {kind: self._cells(kind, sprints) for kind in CELL_KINDS} if count_changes else None
+            self._replace(sprints, data)
+            for kind, rows in journal:
+                self._apply(kind, rows)
+            if not count_changes:
+                return 0
+            changed = 0
+            for kind in CELL_KINDS:
+                after = self._cells(kind, sprints)
+                changed += sum(1 for key in before[kind].keys() | after.keys()
+                               if before[kind].get(key) != after.get(key))
+            return changed
+
+    def _replace(self, sprints, data):
+        """
+        Replaces the resident copy of sprints with loaded data and applies the pending edits.
+        Must be called holding the lock.
+        """
+        reloaded = [sprint for sprint in sprints if sprint in self._sprints]
+        fresh = {}
+        for kind, (column_field, payload_key) in CELL_KINDS.items():
+            table = data[payload_key]
+            if not isinstance(table, pa.Table):
+                table = pa.Table.from_pylist(table, schema=_schema(column_field, pa.float64()))
+            elif table.num_rows == 0:
+                table = _schema(column_field, pa.float64()).empty_table()
+            table = table.select(['sprint', 'projectId', column_field, 'days']).drop_null()
+            sprint_column = table['sprint'].to_numpy()
+            project_codes = self._projects.encode_column(table['projectId'])
+            column_codes = self._columns[kind].encode_column(table[column_field])
+            days = table['days'].to_numpy().astype(np.float64)
+            for sprint in sprints:
+                mask = sprint_column == sprint
+                fresh.setdefault(sprint, {})[kind] = SparseCells.from_arrays(
+                    project_codes[mask], column_codes[mask], days[mask])
+
+        now = self._clock()
+        for sprint, matrices in fresh.items():
+            self._sprints[sprint] = matrices
+            self._loaded_at[sprint] = now
+        if self._pending is not None:
+            for kind in CELL_KINDS:
+                self._apply(kind, self._pending(kind))
+        if reloaded and self._on_reload is not None:
+            self._on_reload(reloaded)
+
+    def _apply(self, kind, rows):
+        """
+        Patches the resident sprints with edits. Must be called holding the lock.
+        """
+        column_field = CELL_KINDS[kind][0]
+        patched = 0
+        for row in rows:
+            matrices = self._sprints.get(row['sprint'])
+            if matrices is None:
+                continue
+            matrices[kind].set(self._projects.encode(row['projectId']),
+                               self._columns[kind].encode(row[column_field]), row['days'])
+            patched += 1
+        return patched
+
+    def _table(self, kind, sprints):
+        """
+        Decodes the cells of the resident sprints into an Arrow table, in CSR (project, column) order per sprint.
+        Days are returned as integers when every value is whole.
+        """
+        column_field = CELL_KINDS[kind][0]
+        parts = {'sprint': [], 'projectId': [], column_field: [], 'days': []}
+        for sprint in sprints:
+            matrix = self._sprints.get(sprint, {}).get(kind)
+            if matrix is None or matrix.size == 0:
+                continue
+            indptr, indices, data = matrix.to_csr(len(self._projects))
+            project_codes = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            parts['sprint'].append(np.full(matrix.size, sprint, dtype=object))
+            parts['projectId'].append(self._projects.decode(project_codes))
+            parts[column_field].append(self._columns[kind].decode(indices))
+            parts['days'].append(data)
+
+        days = np.concatenate(parts['days']) if parts['days'] else np.empty(0)
+        days_type = _days_type(days)
+        schema = _schema(column_field, days_type)
+        if not parts['days']:
+            return schema.empty_table()
+        return pa.table({
+            'sprint': pa.array(np.concatenate(parts['sprint']), type=pa.string()),
+            'projectId': pa.array(np.concatenate(parts['projectId']), type=pa.int64()),
+            column_field: pa.array(np.concatenate(parts[column_field]), type=pa.string()),
+            'days': pc.cast(pa.array(days), days_type),
+        }, schema=schema)
+
+    def _cells(self, kind, sprints):
+        """
+        Returns the cells of resident sprints as a dict of (sprint, projectId, column value) to days.
+        """
+        table = self._table(kind, sprints).to_pydict()
+        return dict(zip(zip(table['sprint'], table['projectId'], table[CELL_KINDS[kind][0]]), table['days']))
+
+
+def _schema(column_field, days_type):
+    """
+    Returns the Arrow schema of a kind of cell.
+
+    Args:
+        column_field (str): The field of the column dimension ('memberId' or 'subteam').
+        days_type (pa.DataType): The type of the days column.
+
+    Returns:
+        pa.Schema: The schema.
+    """
+    return pa.schema([('sprint', pa.string()), ('projectId', pa.int64()), (column_field, pa.string()),
+                      ('days', days_type)])
+
+
+def _days_type(days):
+    """
+    Returns int64 when every value of the days array is whole, float64 otherwise.
+    """
+    return pa.int64() if np.array_equal(days, np.floor(days)) else pa.float64()
+
+
+def cells_table(kind, rows):
+    """
+    Builds the Arrow table of a list of cells, with the schema used by AssignmentStore.tables().
+
+    Args:
+        kind (str): 'assignment' or 'project_case'.
+        rows (list): The cells, as dicts with sprint, projectId, the column field and days.
+
+    Returns:
+        pa.Table: The cells table.
+    """
+    column_field = CELL_KINDS[kind][0]
+    table = pa.Table.from_pylist(rows, schema=_schema(column_field, pa.float64()))
+    days_type = _days_type(table['days'].to_numpy())
+    return table.set_column(3, 'days', pc.cast(table['days'], days_type))
@@ -0,0 +1,128 @@
+"""
+This module provides the ProjectCatalog class, an in-memory index of the projects that evaluates the group and
+name filters of the planner on the server and returns only the window of projects a client renders.
+
+Classes:
+    ProjectCatalog: Name-ordered project index with per-group positions and windowed, filtered lookups.
+"""
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app_name.planner.project_search import fold
+from app_name.utils.python import sorted_distinct
+
+ALL_GROUPS = 'All Groups'
+
+
+class ProjectCatalog(object):
+    """
+    ProjectCatalog keeps the projects in name order together with the positions of the projects of each group
+    and their folded names (lowercased, without accents) as an Arrow array, so a filter is a dictionary lookup
+    plus one vectorized substring match instead of a scan in Python. The positions matching each filter are
+    memoized, so paging through the results of a filter costs a slice.
+
+    Attributes:
+        projects (list): The projects as dicts with id, name and project_group, ordered by name.
+        groups (list): The distinct project groups, preceded by 'All Groups'.
+    """
+
+    def __init__(self, projects, max_memoized=256):
+        """
+        Initializes the ProjectCatalog with the given parameters.
+
+        Args:
+            projects (list): The projects as dicts with id, name and project_group, ordered by name.
+            max_memoized (int): The number of filters whose matching positions are kept (default is 256).
+        """
+        self.projects = list(projects)
+        self.groups = sorted_distinct((project['project_group'] for project in self.projects), first=ALL_GROUPS)
+        self.max_memoized = max_memoized
+        self._ids = np.array([project['id'] for project in self.projects])
+        self._folded_names = pa.array([fold(project['name']) for project in self.projects], type=pa.string())
+        group_positions = {}
+        for position, project in enumerate(self.projects):
+            group_positions.setdefault(project['project_group'], []).append(position)
+        self._group_positions = {group: np.array(positions, dtype=np.int64)
+                                 for group, positions in group_positions.items()}
+        self._memoized = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.projects)
+
+    def positions(self, group=None, name=None):
+        """
+        Returns the positions of the projects in the group whose name contains the filter, ignoring case and
+        accents.
+
+        Args:
+            group (str, optional): The project group. None or 'All Groups' means every group.
+            name (str, optional): The substring the project name must contain.
+
+        Returns:
+            np.ndarray: The positions of the matching projects, in name order.
+        """
+        group = None if group in (None, '', ALL_GROUPS) else group
+        name = fold(name)
+        key = (group, name)
+        with self._lock:
+            positions = self._memoized.get(key)
+        if positions is not None:
+            return positions
+
+        if group is None:
+            positions = np.arange(len(self.projects), dtype=np.int64)
+        else:
+            positions = self._group_positions.get(group, np.array([], dtype=np.int64))
+        if name and len(positions):
+            matches = pc.match_substring(self._folded_names.take(positions), name).to_numpy(zero_copy_only=False)
+            positions = positions[matches]
+
+        with self._lock:
+            if len(self._memoized) >= self.max_memoized:
+                self._memoized.clear()
+            self._memoized[key] = positions
+        return positions
+
+    def ids(self, group=None, name=None, offset=0, limit=None):
+        """
+        Returns the ids of the projects in a window of the filtered projects.
+
+        Args:
+            group (str, optional): The project group filter.
+            name (str, optional): The project name filter.
+            offset (int): The number of matching projects skipped (default is 0).
+            limit (int, optional): The maximum number of projects returned. Every match when not provided.
+
+        Returns:
+            list: The project ids, in name order.
+        """
+        return self._ids[self._window(self.positions(group, name), offset, limit)].tolist()
+
+    def window(self, group=None, name=None, offset=0, limit=None):
+        """
+        Returns a window of the filtered projects.
+
+        Args:
+            group (str, optional): The project group filter.
+            name (str, optional): The project name filter.
+            offset (int): The number of matching projects skipped (default is 0).
+            limit (int, optional): The maximum number of projects returned. Every match when not provided.
+
+        Returns:
+            dict: The projects of the window, the number of matching projects (total), offset and limit.
+        """
+        positions = self.positions(group, name)
+        return {
+            'projects': [self.projects[position] for position in self._window(positions, offset, limit)],
+            'total': len(positions),
+            'offset': offset,
+            'limit': limit,
+        }
+
+    @staticmethod
+    def _window(positions, offset, limit):
+        return positions[offset:] if limit is None else positions[offset:offset + limit]
@@ -0,0 +1,274 @@
+"""
+This module provides the ProjectSearchIndex class, an in-memory search index over the project names and codes used
+by /api/projects/search, so a keystroke in the planner costs a few dictionary lookups instead of a scan of every
+project name.
+
+Classes:
+    ProjectSearchIndex: Token prefix and trigram index with accent folding, ranking and incremental updates.
+
+Functions:
+    fold(text): Lowercases a text and strips its accents.
+    tokenize(text): Splits a folded text into alphanumeric tokens.
+    trigrams(text): Returns the trigrams of a folded text.
+"""
+import bisect
+import collections
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+# Minimum share of the query trigrams a name must contain to be returned as an approximate match
+MIN_SIMILARITY = 0.5
+# Position given to the tokens of the project code, after any word of the name
+CODE_POSITION = 10
+# Number of ranked queries kept until the index changes
+MAX_MEMOIZED = 1024
+
+
+def fold(text):
+    """
+    Lowercases a text and strips its accents and diacritics, so 'Gestión' and 'gestion' are the same.
+
+    Args:
+        text (str): The text to fold. None is treated as an empty text.
+
+    Returns:
+        str: The folded text.
+    """
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text):
+    """
+    Splits a folded text into alphanumeric tokens.
+
+    Args:
+        text (str): The folded text.
+
+    Returns:
+        list: The tokens, in order.
+    """
+    return TOKEN_PATTERN.findall(text)
+
+
+def trigrams(text):
+    """
+    Returns the trigrams of a folded text, with its tokens joined by single spaces.
+
+    Args:
+        text (str): The folded text.
+
+    Returns:
+        set: The trigrams.
+    """
+    normalized = ' '.join(tokenize(text))
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+class ProjectSearchIndex(object):
+    """
+    ProjectSearchIndex keeps, for every project, its folded name, the name tokens plus its code, and the trigrams
+    of the name. Tokens are kept sorted, so the projects with a token starting with a prefix are found with a
+    binary search; trigrams find names containing the query anywhere and names close to it (typos).
+
+    Results are ranked by how the query matches: exact code, exact name, name prefix, word prefixes, substring and
+    finally trigram similarity, then by name.
+
+    Attributes:
+        size (int): The number of indexed projects.
+    """
+
+    def __init__(self, projects=()):
+        """
+        Initializes the ProjectSearchIndex with the given parameters.
+
+        Args:
+            projects (iterable): The projects as dicts with id, name and project_group.
+        """
+        self._documents = {}
+        self._token_postings = {}
+        self._codes = {}
+        self._trigram_postings = {}
+        self._sorted_tokens = []
+        self._name_ranks = {}
+        self._memoized = {}
+        self._lock = threading.Lock()
+        self.update(projects)
+
+    @property
+    def size(self):
+        return len(self._documents)
+
+    def update(self, projects):
+        """
+        Brings the index in line with a new list of projects, re-indexing only the projects that were added,
+        removed or renamed.
+
+        Args:
+            projects (iterable): The projects as dicts with id, name and project_group.
+
+        Returns:
+            dict: The number of projects added, removed and updated.
+        """
+        projects = {project['id']: project for project in projects}
+        counts = {'added': 0, 'removed': 0, 'updated': 0}
+        with self._lock:
+            for project_id in [project_id for project_id in self._documents if project_id not in projects]:
+                self._remove(project_id)
+                counts['removed'] += 1
+            for project_id, project in projects.items():
+                document = self._documents.get(project_id)
+                if document is None:
+                    self._add(project)
+                    counts['added'] += 1
+                elif document['name'] != project['name']:
+                    self._remove(project_id)
+                    self._add(project)
+                    counts['updated'] += 1
+                else:
+                    # Unchanged names keep their postings; other fields (e.g. the group) are just replaced
+                    document['project'] = project
+            if counts['added'] or counts['removed'] or counts['updated']:
+                self._sorted_tokens = sorted(self._token_postings)
+                # Ties are broken by name; ordinals make the comparisons integer ones
+                self._name_ranks = {project_id: rank for rank, project_id in enumerate(
+                    sorted(self._documents, key=lambda project_id: self._documents[project_id]['folded']))}
+                self._memoized.clear()
+        return counts
+
+    def search(self, query, limit=20):
+        """
+        Returns the projects matching a query, best matches first.
+
+        Args:
+            query (str): The text typed by the user: words of the name (or their beginnings) or a project code.
+            limit (int): The maximum number of projects returned (default is 20).
+
+        Returns:
+            list: The matching projects as dicts with id, name, project_group and score.
+        """
+        phrase = ' '.join(tokenize(fold(query)))
+        if not phrase:
+            return []
+
+        with self._lock:
+            # Users typing the same words get the same answer until the index changes
+            ranked = self._memoized.get((phrase, limit))
+            if ranked is None:
+                ranked = self._rank(phrase, limit)
+                if len(self._memoized) >= MAX_MEMOIZED:
+                    self._memoized.clear()
+                self._memoized[(phrase, limit)] = ranked
+            return [dict(self._documents[project_id]['project'], score=round(score, 3)) for project_id, score in ranked]
+
+    def _rank(self, phrase, limit):
+        """
+        Returns the (project id, score) of the best matches of a folded query.
+        """
+        scores = {}
+        for project_id, position in self._prefix_matches(phrase.split(' ')).items():
+            if position == 0:
+                folded = self._documents[project_id]['folded']
+                scores[project_id] = 90.0 if folded == phrase else 80.0 if folded.startswith(phrase) else 60.0
+            else:
+                # Names whose first matched word comes earlier rank higher
+                scores[project_id] = 60.0 - position
+        for project_id in self._codes.get(phrase, ()):
+            scores[project_id] = 100.0
+
+        query_trigrams = trigrams(phrase)
+        if query_trigrams and len(scores) < limit:
+            for project_id, similarity in self._trigram_matches(query_trigrams).items():
+                if project_id in scores:
+                    continue
+                if phrase in self._documents[project_id]['folded']:
+                    scores[project_id] = 40.0
+                elif similarity >= MIN_SIMILARITY:
+                    scores[project_id] = 20.0 * similarity
+        name_ranks = self._name_ranks
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], name_ranks[item[0]]))
+
+    def _prefix_matches(self, query_tokens):
+        """
+        Returns the projects having, for every query token, a token that starts with it, with the position in the
+        name of the first word matching the first query token.
+        """
+        matches = None
+        for query_token in query_tokens:
+            start = bisect.bisect_left(self._sorted_tokens, query_token)
+            end = bisect.bisect_left(self._sorted_tokens, query_token + '\uffff', lo=start)
+            if matches is None:
+                matches = {}
+                for token in self._sorted_tokens[start:end]:
+                    for project_id, position in self._token_postings[token].items():
+                        if position < matches.get(project_id, CODE_POSITION + 1):
+                            matches[project_id] = position
+            else:
+                token_matches = set()
+                for token in self._sorted_tokens[start:end]:
+                    token_matches.update(self._token_postings[token])
+                matches = {project_id: position for project_id, position in matches.items()
+                           if project_id in token_matches}
+            if not matches:
+                break
+        return matches
+
+    def _trigram_matches(self, query_trigrams):
+        """
+        Returns the share of the query trigrams found in each project name reaching MIN_SIMILARITY.
+        """
+        postings = sorted((self._trigram_postings.get(trigram, ()) for trigram in query_trigrams), key=len)
+        required = math.ceil(MIN_SIMILARITY * len(postings))
+        counts = collections.Counter()
+        for seen, trigram_postings in enumerate(postings):
+            if seen <= len(postings) - required:
+                counts.update(trigram_postings)
+            else:
+                # A name missing every rarer trigram can no longer reach the threshold, so the most common
+                # trigrams only count for the names already found
+                for project_id in counts:
+                    if project_id in trigram_postings:
+                        counts[project_id] += 1
+        return {project_id: count / len(postings) for project_id, count in counts.items()}
+
+    def _add(self, project):
+        project_id = project['id']
+        name_tokens = tokenize(fold(project['name']))
+        folded = ' '.join(name_tokens)
+        code = ' '.join(tokenize(fold(project_id)))
+        name_trigrams = trigrams(folded)
+        self._documents[project_id] = {'project': project, 'name': project['name'], 'folded': folded,
+                                       'code': code, 'trigrams': name_trigrams}
+        # Each token keeps the position of its first word in the name, the code tokens rank after every word
+        positions = {token: CODE_POSITION for token in code.split(' ') if token}
+        for position, token in reversed(list(enumerate(name_tokens))):
+            positions[token] = min(position, CODE_POSITION - 1)
+        for token, position in positions.items():
+            self._token_postings.setdefault(token, {})[project_id] = position
+        self._codes.setdefault(code, set()).add(project_id)
+        for trigram in name_trigrams:
+            self._trigram_postings.setdefault(trigram, set()).add(project_id)
+
+    def _remove(self, project_id):
+        document = self._documents.pop(project_id)
+        for token in set(document['folded'].split(' ')) | set(document['code'].split(' ')):
+            self._discard(self._token_postings, token, project_id)
+        self._discard(self._codes, document['code'], project_id)
+        for trigram in document['trigrams']:
+            self._discard(self._trigram_postings, trigram, project_id)
+
+    @staticmethod
+    def _discard(postings, key, project_id):
+        entries = postings.get(key)
+        if entries is None:
+            return
+        if isinstance(entries, dict):
+            entries.pop(project_id, None)
+        else:
+            entries.discard(project_id)
+        if not entries:
+            del postings[key]
@@ -0,0 +1,153 @@
+"""
+This module provides the SprintCalendar class, an in-memory index of the sprint calendar (sprints with their first
+and last working day and number of working days) loaded once per day instead of scanning the calendar table on
+every request.
+
+Classes:
+    SprintCalendar: Date-ordered sprint index that reloads when the local date rolls over.
+"""
+import datetime
+import threading
+
+import numpy as np
+import pytz
+
+
+class SprintCalendar(object):
+    """
+    SprintCalendar keeps the sprints ordered by start date in parallel NumPy arrays, so date filters are vectorized.
+    The index is loaded on first use and reloaded on the first use after midnight in its timezone, which is when the
+    set of upcoming sprints changes. Callers passing allow_stale keep using the previous index while they reload it
+    themselves (see expired() and expired_for()).
+
+    Attributes:
+        timezone (pytz.timezone): The timezone that defines the current date.
+        loaded_for (datetime.date): The date the index was loaded on (None before the first load).
+    """
+
+    def __init__(self, loader, timezone='UTC', clock=None):
+        """
+        Initializes the SprintCalendar with the given parameters.
+
+        Args:
+            loader (callable): Function without arguments returning the sprints as a list of dicts (or an Arrow
+                table) with sprint, start_date, end_date and working_days. Dates may be dates or ISO strings.
+            timezone (str): The timezone that defines the current date (default is 'UTC').
+            clock (callable, optional): Function returning the current aware datetime. Uses the system clock.
+        """
+        self.timezone = pytz.timezone(timezone)
+        self.loaded_for = None
+        self._loader = loader
+        self._clock = clock or (lambda: datetime.datetime.now(pytz.utc))
+        self._names = np.array([], dtype=object)
+        self._starts = np.array([], dtype='datetime64[D]')
+        self._ends = np.array([], dtype='datetime64[D]')
+        self._working_days = np.array([], dtype=np.int64)
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def today(self):
+        """
+        Returns the current date in the calendar timezone.
+        """
+        return self._clock().astimezone(self.timezone).date()
+
+    def expired(self):
+        """
+        Returns whether the index was not loaded today, so the next use without allow_stale reloads it.
+        """
+        return self.loaded_for != self.today()
+
+    def expired_for(self):
+        """
+        Returns the seconds since the index expired at midnight (0 while it is current), or None when there is no
+        index to serve.
+        """
+        loaded_for = self.loaded_for
+        if loaded_for is None:
+            return None
+        midnight = self.timezone.localize(datetime.datetime.combine(loaded_for + datetime.timedelta(days=1),
+                                                                    datetime.time()))
+        return max((self._clock() - midnight).total_seconds(), 0.0)
+
+    def upcoming(self, today=None, allow_stale=False):
+        """
+        Returns the sprints that still have working days after today, in chronological order.
+
+        Args:
+            today (datetime.date, optional): The reference date. The current date when not provided.
+            allow_stale (bool): Whether an index loaded on an earlier day is used instead of being reloaded
+                (default is False). The sprints are still those upcoming after today.
+
+        Returns:
+            list: The sprint names.
+        """
+        names, _, ends, _ = self._index(allow_stale)
+        today = np.datetime64(today or self.today(), 'D')
+        return names[ends > today].tolist()
+
+    def describe(self, sprints=None, allow_stale=False):
+        """
+        Returns the dates and working days of sprints.
+
+        Args:
+            sprints (list, optional): The sprint names. Every sprint when not provided.
+            allow_stale (bool): Whether an index loaded on an earlier day is used instead of being reloaded
+                (default is False).
+
+        Returns:
+            list: One dict per known sprint with sprint, startDate, endDate (ISO dates) and workingDays.
+        """
+        names, starts, ends, working_days = self._index(allow_stale)
+        positions = self._index_positions(allow_stale)
+        selected = range(len(names)) if sprints is None else [positions[s] for s in sprints if s in positions]
+        return [{'sprint': names[i], 'startDate': str(starts[i]), 'endDate': str(ends[i]),
+                 'workingDays': int(working_days[i])} for i in selected]
+
+    def refresh(self):
+        """
+        Reloads the index from the source.
+        """
+        rows = self._loader()
+        if hasattr(rows, 'to_pylist'):
+            rows = rows.to_pylist()
+        # Dates arrive as dates from BigQuery and as ISO strings from the local data source
+        rows = sorted(rows, key=lambda row: (str(row['start_date'])[:10], row['sprint']))
+        names = np.array([row['sprint'] for row in rows], dtype=object)
+        starts = np.array([str(row['start_date'])[:10] for row in rows], dtype='datetime64[D]')
+        ends = np.array([str(row['end_date'])[:10] for row in rows], dtype='datetime64[D]')
+        working_days = np.array([row['working_days'] for row in rows], dtype=np.int64)
+        today = self.today()
+        with self._lock:
+            self._names, self._starts, self._ends, self._working_days = names, starts, ends, working_days
+            self._positions = {name: position for position, name in enumerate(names)}
+            self.loaded_for = today
+
+    def invalidate(self):
+        """
+        Drops the index, so it is reloaded on the next use.
+
+        Returns:
+            bool: Whether the index was loaded.
+        """
+        with self._lock:
+            loaded, self.loaded_for = self.loaded_for is not None, None
+        return loaded
+
+    def _index(self, allow_stale=False):
+        """
+        Returns the index arrays, loading them first if they were not loaded today (or, with allow_stale, ever).
+        """
+        if self.expired() and not (allow_stale and self.loaded_for is not None):
+            with self._refresh_lock:
+                # Another thread may have reloaded the index while this one waited
+                if self.expired():
+                    self.refresh()
+        with self._lock:
+            return self._names, self._starts, self._ends, self._working_days
+
+    def _index_positions(self, allow_stale=False):
+        self._index(allow_stale)
+        with self._lock:
+            return self._positions
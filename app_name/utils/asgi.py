@@ -0,0 +1,221 @@
+"""
+This module provides an ASGI adapter for the WSGI (Flask) application, so the service can run on an asyncio server
+(e.g. `gunicorn -k uvicorn.workers.UvicornWorker app_name.asgi:app`) and wait on BigQuery without pinning a thread
+per request.
+
+The endpoints are not rewritten as coroutines. A GET or HEAD request runs in a small thread pool with a dict of
+ready query results bound (see app_name.utils.query_runner). When it needs queries whose results are not ready,
+the runner submits their jobs and aborts the attempt with JobsPending; the adapter then awaits the jobs on the
+event loop and runs the request again, which finds the results ready. Threads only do the CPU work of a request,
+so how many requests wait on BigQuery at once is no longer bounded by the number of threads. Other methods (edits)
+run once, blocking their thread, as under gthread. Every attempt carries the arrival time of the request in the
+environ (REQUEST_STARTED), so time budgets counted from it span the replays. A streamed body stops, and its
+iterable is closed, as soon as the client disconnects.
+
+Classes:
+    AsgiAdapter: ASGI 3 application serving a WSGI application, replaying reads until their queries are ready.
+
+Functions:
+    wsgi_environ(scope, body): Builds the WSGI environ of an ASGI HTTP request.
+"""
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from app_name.utils.query_runner import JobsPending, bind_results, unbind_results
+
+# Methods whose requests can be run again safely
+REPLAYABLE_METHODS = ('GET', 'HEAD')
+
+# WSGI environ key holding the monotonic time the request arrived at, the same in every replay of the request
+REQUEST_STARTED = 'asgi_adapter.request_started'
+
+
+def wsgi_environ(scope, body):
+    """
+    Builds the WSGI environ of an ASGI HTTP request.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+        body (bytes): The request body.
+
+    Returns:
+        dict: The WSGI environ.
+    """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': unquote(scope['path'], errors='surrogateescape').encode('utf-8', 'surrogateescape')
+        .decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsgiAdapter(object):
+    """
+    AsgiAdapter serves a WSGI application over ASGI. Reads are replayed until the queries they need are ready, so
+    they wait on the event loop instead of a thread; the response body is sent as the application yields it, so
+    streamed responses (e.g. server-sent events) keep streaming.
+
+    Attributes:
+        threads (int): The threads running the application code.
+        max_attempts (int): The times a read is suspended before its last attempt blocks like under WSGI.
+    """
+
+    def __init__(self, app, runner, threads=8, stream_threads=64, max_attempts=8, on_startup=None):
+        """
+        Initializes the AsgiAdapter with the given parameters.
+
+        Args:
+            app (callable): The WSGI application.
+            runner (QueryRunner): The runner whose pending jobs are awaited.
+            threads (int): The threads running the application code (default is 8).
+            stream_threads (int): The threads reading the bodies of streamed responses (default is 64).
+            max_attempts (int): The times a read is suspended before it runs blocking (default is 8). Bounds the
+                replays of a request whose queries change on every attempt.
+            on_startup (callable, optional): Called without arguments (in a thread) when the server starts the
+                application, i.e. on the lifespan startup event.
+        """
+        self.app = app
+        self.runner = runner
+        self.threads = threads
+        self.max_attempts = max_attempts
+        self.on_startup = on_startup
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+        self._stream_executor = ThreadPoolExecutor(max_workers=stream_threads, thread_name_prefix='asgi-stream')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise NotImplementedError(f"Unsupported ASGI scope type {scope['type']}")
+
+        started = time.monotonic()
+        body = await self._read_body(receive)
+        loop = asyncio.get_running_loop()
+        ready = {} if scope['method'] in REPLAYABLE_METHODS else None
+        for attempt in range(self.max_attempts + 1):
+            if attempt == self.max_attempts:
+                # Last resort for reads whose queries keep changing: run blocking, as under WSGI
+                ready = None
+            try:
+                environ = wsgi_environ(scope, body)
+                environ[REQUEST_STARTED] = started
+                status, headers, iterable = await loop.run_in_executor(self._executor, self._call, environ, ready)
+                break
+            except JobsPending as pending:
+                ready.update(await self.runner.wait_async(pending))
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        if scope['method'] == 'HEAD':
+            await loop.run_in_executor(self._stream_executor, _close, iterable)
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await self._send_body(loop, iterable, send, receive)
+
+    def _call(self, environ, ready):
+        """
+        Runs the application until it returns its response iterable, with the ready results bound.
+
+        Returns:
+            tuple: The status code, the ASGI headers and the response iterable.
+        """
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        token = bind_results(ready)
+        try:
+            iterable = self.app(environ, start_response)
+        finally:
+            unbind_results(token)
+        return response['status'], response['headers'], iterable
+
+    async def _send_body(self, loop, iterable, send, receive):
+        """
+        Sends the chunks of the response iterable as it yields them, until it is exhausted or the client
+        disconnects. On a disconnect the chunk being produced is dropped and the iterable closed, which releases
+        what it holds (e.g. the event subscription of a server-sent events stream) and its stream thread.
+        """
+        iterator = iter(iterable)
+        done = object()
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while True:
+                chunk = loop.run_in_executor(self._stream_executor, next, iterator, done)
+                await asyncio.wait((chunk, disconnected), return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    # A generator cannot be closed while it runs, so the chunk in progress is awaited first
+                    await asyncio.wait((chunk,))
+                    return
+                chunk = chunk.result()
+                if chunk is done:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await loop.run_in_executor(self._stream_executor, _close, iterable)
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.on_startup is not None:
+                    await asyncio.get_running_loop().run_in_executor(self._executor, self.on_startup)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _close(iterable):
+    if hasattr(iterable, 'close'):
+        iterable.close()
@@ -0,0 +1,160 @@
+"""
+This module provides the TTLCache class, a thread-safe in-process cache used to keep reference data (sprints,
+projects, people) between requests instead of querying BigQuery on every page load.
+
+Classes:
+    TTLCache: Size-bounded LRU cache whose entries expire after a per-entry time-to-live.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """
+    Thread-safe, size-bounded cache with per-entry time-to-live and least-recently-used eviction. Expired entries
+    can be kept for a grace period, during which lookups miss but get_stale() still returns them, so a caller can
+    serve the last good value while it is reloaded.
+
+    Attributes:
+        max_entries (int): The maximum number of entries kept before evicting the least recently used one.
+        default_ttl (float): The time-to-live in seconds used when no ttl is given on insertion.
+        grace (float): The seconds an expired entry is kept for get_stale().
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that found no fresh entry.
+        evictions (int): The number of entries dropped because the cache was full.
+    """
+
+    def __init__(self, max_entries=128, default_ttl=300, grace=0, clock=time.monotonic):
+        """
+        Initializes the TTLCache with the given parameters.
+
+        Args:
+            max_entries (int): The maximum number of entries (default is 128).
+            default_ttl (float): The default time-to-live in seconds (default is 300).
+            grace (float): The seconds an expired entry is kept for get_stale() (default is 0).
+            clock (callable): Function returning the current time in seconds (default is time.monotonic).
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.grace = grace
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored under the key if it has not expired.
+
+        Args:
+            key (hashable): The cache key.
+            default (object): The value returned when the key is missing or expired (default is None).
+
+        Returns:
+            object: The cached value or the default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self._clock()
+            if entry is None or entry[1] <= now:
+                if entry is not None and entry[1] + self.grace <= now:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value under the key, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (hashable): The cache key.
+            value (object): The value to store.
+            ttl (float, optional): The time-to-live in seconds. Uses default_ttl when not provided.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            now = self._clock()
+            self._entries[key] = (value, now + ttl, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_stale(self, key):
+        """
+        Returns the value stored under the key even if it has expired, as long as it is within the grace period.
+        Does not count as a lookup.
+
+        Args:
+            key (hashable): The cache key.
+
+        Returns:
+            tuple: The value and the seconds since it was stored, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self._clock()
+            if entry is None or entry[1] + self.grace <= now:
+                return None
+            return entry[0], now - entry[2]
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Returns the cached value for the key, calling the loader and caching its result on a miss.
+        Exceptions raised by the loader are propagated and nothing is cached.
+
+        Args:
+            key (hashable): The cache key.
+            loader (callable): Function without arguments that produces the value.
+            ttl (float, optional): The time-to-live in seconds for the loaded value.
+
+        Returns:
+            object: The cached or freshly loaded value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key=None):
+        """
+        Removes an entry from the cache, or every entry when no key is given.
+
+        Args:
+            key (hashable, optional): The cache key to remove.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        with self._lock:
+            if key is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            return 1 if self._entries.pop(key, None) is not None else 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: A dictionary with hits, misses, evictions, hit ratio and current entries.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
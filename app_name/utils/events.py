@@ -0,0 +1,174 @@
+"""
+This module provides a small in-process publish/subscribe broker used to push planner edits to the browsers
+that have the same sprints open.
+
+Classes:
+    Subscription: A client's bounded backlog of events of the topics it subscribed to.
+    EventBroker: Fans published events out to the subscriptions of their topic.
+    SubscriberLimitReached: Raised when a subscription would exceed the broker's subscriber limit.
+"""
+import threading
+from collections import deque
+
+
+class SubscriberLimitReached(RuntimeError):
+    """
+    Raised by EventBroker.subscribe() when the broker already has its maximum number of subscriptions.
+    """
+
+
+class Subscription(object):
+    """
+    Subscription buffers the events of its topics until the client reads them. The backlog is bounded: when a slow
+    client falls behind, the oldest events are dropped and the subscription is flagged as overflowed, so the client
+    knows it must resynchronize instead of receiving an unbounded queue.
+
+    Attributes:
+        topics (frozenset): The topics the subscription receives.
+        max_backlog (int): The maximum number of undelivered events kept.
+        overflowed (bool): Whether events were dropped since the last read.
+    """
+
+    def __init__(self, topics, max_backlog=100):
+        """
+        Initializes the Subscription with the given parameters.
+
+        Args:
+            topics (iterable): The topics the subscription receives.
+            max_backlog (int): The maximum number of undelivered events kept (default is 100).
+        """
+        self.topics = frozenset(topics)
+        self.max_backlog = max_backlog
+        self.overflowed = False
+        self._events = deque()
+        self._condition = threading.Condition()
+
+    def put(self, event):
+        """
+        Adds an event to the backlog, dropping the oldest one if the backlog is full.
+
+        Args:
+            event (object): The event.
+        """
+        with self._condition:
+            if len(self._events) >= self.max_backlog:
+                self._events.popleft()
+                self.overflowed = True
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Waits for events and returns every buffered one.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait.
+
+        Returns:
+            tuple: The list of events (empty on timeout) and whether events were dropped before them.
+        """
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            events, self._events = list(self._events), deque()
+            overflowed, self.overflowed = self.overflowed, False
+            return events, overflowed
+
+
+class EventBroker(object):
+    """
+    EventBroker keeps the subscriptions of each topic and delivers every published event to them without blocking
+    the publisher on slow clients.
+
+    Attributes:
+        max_backlog (int): The backlog size of new subscriptions.
+        max_subscribers (int): The maximum number of subscriptions at once (None for no limit).
+        published (int): The number of events published.
+        rejected (int): The number of subscriptions refused because of the limit.
+    """
+
+    def __init__(self, max_backlog=100, max_subscribers=None):
+        """
+        Initializes the EventBroker with the given parameters.
+
+        Args:
+            max_backlog (int): The backlog size of new subscriptions (default is 100).
+            max_subscribers (int, optional): The maximum number of subscriptions at once, e.g. to keep streams
+                holding a server thread each from taking every thread. No limit when not provided.
+        """
+        self.max_backlog = max_backlog
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.rejected = 0
+        self._topics = {}
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        """
+        Creates a subscription to the given topics.
+
+        Args:
+            topics (iterable): The topics.
+
+        Returns:
+            Subscription: The new subscription.
+
+        Raises:
+            SubscriberLimitReached: If the broker already has max_subscribers subscriptions.
+        """
+        subscription = Subscription(topics, self.max_backlog)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscriptions) >= self.max_subscribers:
+                self.rejected += 1
+                raise SubscriberLimitReached(f"The limit of {self.max_subscribers} subscriptions is reached")
+            self._subscriptions.add(subscription)
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Removes a subscription from every topic.
+
+        Args:
+            subscription (Subscription): The subscription.
+        """
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def publish(self, topic, event):
+        """
+        Delivers an event to the subscriptions of a topic.
+
+        Args:
+            topic (hashable): The topic.
+            event (object): The event.
+
+        Returns:
+            int: The number of subscriptions the event was delivered to.
+        """
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+            self.published += 1
+        for subscription in subscribers:
+            subscription.put(event)
+        return len(subscribers)
+
+    def stats(self):
+        """
+        Returns the broker counters.
+
+        Returns:
+            dict: A dictionary with the number of topics, subscriptions, published events and refused
+                subscriptions.
+        """
+        with self._lock:
+            return {'topics': len(self._topics), 'subscriptions': len(self._subscriptions),
+                    'published': self.published, 'rejected': self.rejected}
@@ -7,6 +7,7 @@
     Date last modified: 09/02/2021
     Python Version: 3.8
 """
+import functools
 import os
 import pkgutil
 import time
@@ -88,5 +89,30 @@ def load_config_by_env():
         config_file = "config.yaml"
     else:
         config_file = f"config_{env}.yaml"
-    config = yaml.safe_load(pkgutil.get_data("data", config_file))
-    return config
+    return dict(_read_packaged_config(config_file))
+
+
+@functools.lru_cache(maxsize=None)
+def _read_packaged_config(config_file):
+    """
+    Parses a config file of the data package once per process: the logger and the app both load it at import.
+    """
+    return yaml.safe_load(pkgutil.get_data("data", config_file))
+
+
+def fetch_env_variable_or_default(config: dict, var: str, default=None, cast=None, group=None):
+    """
+    Tries to fetch a var from environment or config file, falling back to a default value when it is not set
+    :param config: dict the config file YAML content
+    :param var: str var name.
+    :param default: value returned when the var is neither in the environment nor in the config file.
+    :param cast: (optional) callable used to convert the value (environment values are always strings).
+    :param group: (optional) str var grouping name name.
+    :return: var value
+    """
+    try:
+        value = fetch_env_variable(config, var, group)
+    except KeyError:
+        return default
+
+    return cast(value) if cast is not None and value is not None else value
@@ -0,0 +1,236 @@
+"""
+This module records the statistics of every BigQuery job (bytes processed and billed, slot time, cache hits, queue
+and execution time) as Metric records, so expensive or uncached queries can be found in the metrics sink.
+
+Classes:
+    JobStatsCollector: Turns finished jobs into Metric records and writes them through Monitoring in the background.
+    TrackedJob: Wraps a QueryJob and reports it to the collector once its result is fetched.
+    JobStatsClient: Wraps a BigQuery client so every job it submits is tracked.
+
+Functions:
+    job_statistics(job): Returns the statistics of a finished job.
+    operation_type(sql): Returns 'write' for DML statements and 'read' otherwise.
+"""
+import json
+import queue
+import re
+import threading
+
+from app_name.utils.logger import logger
+from app_name.utils.telemetry import current_endpoint
+
+WRITE_STATEMENT_PATTERN = re.compile(r'^\s*(MERGE|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+def operation_type(sql):
+    """
+    Returns the Metric operation type of a statement.
+
+    Args:
+        sql (str): The statement.
+
+    Returns:
+        str: 'write' for MERGE, INSERT, UPDATE and DELETE statements, 'read' otherwise.
+    """
+    return 'write' if WRITE_STATEMENT_PATTERN.match(sql) else 'read'
+
+
+def job_statistics(job):
+    """
+    Returns the statistics of a finished job. Statistics the job does not expose are None.
+
+    Args:
+        job (google.cloud.bigquery.QueryJob): The job.
+
+    Returns:
+        dict: The bytes processed and billed, slot milliseconds, cache hit, and queue and execution milliseconds.
+    """
+    created, started, ended = (getattr(job, name, None) for name in ('created', 'started', 'ended'))
+    return {
+        'bytes_processed': getattr(job, 'total_bytes_processed', None),
+        'bytes_billed': getattr(job, 'total_bytes_billed', None),
+        'slot_millis': getattr(job, 'slot_millis', None),
+        'cache_hit': getattr(job, 'cache_hit', None),
+        'queue_ms': _milliseconds(created, started),
+        'execution_ms': _milliseconds(started, ended),
+    }
+
+
+def _milliseconds(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds() * 1000, 3)
+
+
+class JobStatsCollector(object):
+    """
+    JobStatsCollector writes one Metric per finished job. Writing goes through a bounded queue drained by a
+    background thread, so requests never wait on the metrics sink; when the queue is full, records are dropped
+    and counted instead.
+
+    Attributes:
+        monitoring (Monitoring): The sink the records are written to.
+        metric (Metric): The base metric (environment, process and script) every record is derived from.
+        max_pending (int): The maximum number of records waiting to be written.
+        emitted (int): The number of records written.
+        dropped (int): The number of records dropped because the queue was full or the sink failed.
+    """
+
+    def __init__(self, monitoring, metric, max_pending=1000):
+        """
+        Initializes the JobStatsCollector with the given parameters.
+
+        Args:
+            monitoring (Monitoring): The sink the records are written to.
+            metric (Metric): The base metric every record is derived from.
+            max_pending (int): The maximum number of records waiting to be written (default is 1000).
+        """
+        self.monitoring = monitoring
+        self.metric = metric
+        self.max_pending = max_pending
+        self.emitted = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._worker = threading.Thread(target=self._run, name='job-stats', daemon=True)
+        self._worker.start()
+
+    def track(self, job, sql, function_name=None):
+        """
+        Wraps a submitted job so it is recorded when its result is fetched.
+
+        Args:
+            job (google.cloud.bigquery.QueryJob): The submitted job.
+            sql (str): The statement of the job.
+            function_name (str, optional): The endpoint that submitted the job. The current endpoint by default.
+
+        Returns:
+            TrackedJob: The wrapped job.
+        """
+        return TrackedJob(job, self, operation_type(sql), function_name or current_endpoint())
+
+    def record(self, job, operation, function_name, rows, status='DONE', error=None):
+        """
+        Queues the Metric record of a finished job.
+
+        Args:
+            job (google.cloud.bigquery.QueryJob): The finished job.
+            operation (str): 'read' or 'write'.
+            function_name (str): The endpoint that submitted the job.
+            rows (int): The result rows, or the affected rows of a write.
+            status (str): 'DONE' or 'FAILED' (default is 'DONE').
+            error (Exception, optional): The error of a failed job.
+        """
+        values = {
+            'operation_type': operation,
+            'function_name': function_name,
+            'rows': rows,
+            'status': status,
+            'var1': getattr(job, 'job_id', None),
+        }
+        try:
+            # The statistics are read by the background thread, off the request path
+            self._queue.put_nowait((job, values, error))
+        except queue.Full:
+            self.dropped += 1
+
+    def join(self):
+        """
+        Waits until every queued record is written.
+        """
+        self._queue.join()
+
+    def stats(self):
+        """
+        Returns the collector counters.
+
+        Returns:
+            dict: A dictionary with the written, dropped and pending records.
+        """
+        return {'emitted': self.emitted, 'dropped': self.dropped, 'pending': self._queue.qsize()}
+
+    def _run(self):
+        while True:
+            job, values, error = self._queue.get()
+            try:
+                statistics = job_statistics(job)
+                if error is not None:
+                    statistics['error'] = str(error)
+                values['message'] = json.dumps(statistics, default=str)
+                self.monitoring.write_metric(self.metric, new_values=values)
+                self.emitted += 1
+            except Exception as e:
+                self.dropped += 1
+                logger.error(f"Failed to write job statistics of {values.get('var1')}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class TrackedJob(object):
+    """
+    TrackedJob behaves as the wrapped QueryJob and records it the first time its result is fetched.
+    """
+
+    def __init__(self, job, collector, operation, function_name):
+        """
+        Initializes the TrackedJob with the given parameters.
+
+        Args:
+            job (google.cloud.bigquery.QueryJob): The wrapped job.
+            collector (JobStatsCollector): The collector the job is recorded by.
+            operation (str): 'read' or 'write'.
+            function_name (str): The endpoint that submitted the job.
+        """
+        self._job = job
+        self._collector = collector
+        self._operation = operation
+        self._function_name = function_name
+        self._recorded = False
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)
+
+    def result(self, *args, **kwargs):
+        """
+        Waits for the job like QueryJob.result() and records its statistics.
+        """
+        try:
+            result = self._job.result(*args, **kwargs)
+        except Exception as e:
+            # A timeout leaves the job running, so it is only recorded once it really failed
+            if not isinstance(e, TimeoutError):
+                self._record(None, 'FAILED', e)
+            raise
+        rows = getattr(self._job, 'num_dml_affected_rows', None) if self._operation == 'write' else None
+        self._record(rows if rows is not None else getattr(result, 'total_rows', None), 'DONE')
+        return result
+
+    def _record(self, rows, status, error=None):
+        if not self._recorded:
+            self._recorded = True
+            self._collector.record(self._job, self._operation, self._function_name, rows, status, error)
+
+
+class JobStatsClient(object):
+    """
+    JobStatsClient behaves as the wrapped BigQuery client and tracks every job submitted with query().
+    """
+
+    def __init__(self, client, collector):
+        """
+        Initializes the JobStatsClient with the given parameters.
+
+        Args:
+            client (google.cloud.bigquery.Client): The wrapped client.
+            collector (JobStatsCollector): The collector the jobs are recorded by.
+        """
+        self._client = client
+        self._collector = collector
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def query(self, query, job_config=None, **kwargs):
+        """
+        Submits a query like Client.query() and returns the tracked job.
+        """
+        return self._collector.track(self._client.query(query, job_config=job_config, **kwargs), query)
@@ -0,0 +1,106 @@
+"""
+This module provides helpers to defer expensive initialization (clients, heavy imports, sub-applications) from import
+time to first use, so a new instance can start serving sooner.
+
+Classes:
+    LazyProxy: Stands in for an object that is created by a factory the first time it is used.
+    LazyMount: WSGI middleware that sends the requests under some path prefixes to an application created lazily.
+"""
+import threading
+import time
+
+
+class LazyProxy(object):
+    """
+    LazyProxy creates its target with the factory on first use, once, even when several threads use it at the same
+    time, and then forwards every attribute access to it. Its truth value is the truth value of the target, so a
+    factory returning None (e.g. a client that could not be created) makes the proxy falsy.
+
+    Attributes:
+        name (str): The name of the target, used in logs and stats.
+        init_seconds (float): The seconds the factory took (None until it ran).
+    """
+
+    def __init__(self, factory, name=None):
+        """
+        Initializes the LazyProxy with the given parameters.
+
+        Args:
+            factory (callable): Function without arguments that creates the target.
+            name (str, optional): The name of the target.
+        """
+        self.name = name
+        self.init_seconds = None
+        self._factory = factory
+        self._target = None
+        self._resolved = False
+        self._lock = threading.Lock()
+
+    @property
+    def resolved(self):
+        """
+        Whether the target has been created.
+        """
+        return self._resolved
+
+    def resolve(self):
+        """
+        Returns the target, creating it on the first call. Exceptions raised by the factory are propagated and the
+        next call tries again.
+
+        Returns:
+            object: The target.
+        """
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    start = time.perf_counter()
+                    self._target = self._factory()
+                    self.init_seconds = time.perf_counter() - start
+                    self._resolved = True
+        return self._target
+
+    def prewarm(self):
+        """
+        Creates the target in a background thread, so a later first use finds it ready (or waits less).
+        Failures are left for the first use to raise.
+        """
+        def run():
+            try:
+                self.resolve()
+            except Exception:
+                pass
+
+        threading.Thread(target=run, name=f'prewarm-{self.name or "resource"}', daemon=True).start()
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __bool__(self):
+        return bool(self.resolve())
+
+
+class LazyMount(object):
+    """
+    LazyMount is a WSGI middleware that dispatches the requests whose path starts with one of the prefixes to an
+    application created on the first such request. Every other request goes to the wrapped application, which
+    never pays for creating the mounted one.
+    """
+
+    def __init__(self, app, prefixes, factory):
+        """
+        Initializes the LazyMount with the given parameters.
+
+        Args:
+            app (callable): The wrapped WSGI application.
+            prefixes (tuple): The path prefixes served by the mounted application.
+            factory (callable): Function without arguments that creates the mounted WSGI application.
+        """
+        self.app = app
+        self.prefixes = tuple(prefixes)
+        self.mounted = LazyProxy(factory, name='mount')
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(self.prefixes):
+            return self.mounted.resolve()(environ, start_response)
+        return self.app(environ, start_response)
@@ -0,0 +1,397 @@
+"""
+This module provides an offline stand-in for the BigQuery client backed by SQLite, so the service can run, be
+profiled and be load-tested without GCP credentials. It accepts the queries the service sends to BigQuery
+(backtick table names, @named and UNNEST(@array) parameters, CURRENT_DATE() and MERGE) and returns
+google.cloud.bigquery.Row objects, and it can seed a database with generated data shaped like the real tables.
+
+Classes:
+    LocalBigQueryClient: Drop-in replacement of bigquery.Client.query() running on a SQLite database.
+    LocalQueryJob: Job returned by LocalBigQueryClient.query(), executed when its result is requested.
+    LocalRowIterator: Result rows with the pages and to_arrow() accessors of a BigQuery RowIterator.
+
+Functions:
+    seed_database(client, sprints=12, projects=200, members=80, seed=0): Creates and fills the planner tables.
+"""
+import datetime
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+from google.api_core.exceptions import BadRequest, NotFound
+
+# `project.dataset.table` is stored as the SQLite table dataset__table
+TABLE_PATTERN = re.compile(r'`(?:[\w-]+\.)?(\w+)\.(\w+)`')
+MERGE_PATTERN = re.compile(
+    r'^\s*MERGE\s+(?:INTO\s+)?(?P<table>\w+)\s+(?:AS\s+)?(?P<target>\w+)\s+'
+    r'USING\s*\((?P<source>.*)\)\s*(?:AS\s+)?(?P<alias>\w+)\s+'
+    r'ON\s+(?P<on>.*?)\s+'
+    r'WHEN\s+MATCHED\s+THEN\s+UPDATE\s+SET\s+(?P<set>.*?)\s+'
+    r'WHEN\s+NOT\s+MATCHED\s+THEN\s+INSERT\s*\((?P<columns>[^)]*)\)\s*VALUES\s*\((?P<values>[^)]*)\)\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL)
+
+SCHEMA = {
+    'sprints__luce_calendarSprint': 'calendar_date_date_i TEXT, calendar_sprint_str_i TEXT',
+    'projects__luce_projects': 'project_code_int_i INTEGER, project_name_str_i TEXT, project_bussinesLine_str_d TEXT',
+    'people__luce_people': 'person_name_str_i TEXT, person_chapter_str_d TEXT, person_team_str_d TEXT, '
+                           'person_workDaysTotal_float_i REAL',
+    'capacity_planner_app__people_assignment': 'sprint TEXT, project_id INTEGER, person_name TEXT, assignment INTEGER',
+    'capacity_planner_app__project_assignment': 'sprint TEXT, project_id INTEGER, team TEXT, assignment INTEGER',
+}
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS calendar_date ON sprints__luce_calendarSprint (calendar_date_date_i)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS people_assignment_cell '
+    'ON capacity_planner_app__people_assignment (sprint, project_id, person_name)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS project_assignment_cell '
+    'ON capacity_planner_app__project_assignment (sprint, project_id, team)',
+]
+
+
+class LocalRowIterator(list):
+    """
+    LocalRowIterator is the list of result rows, with the accessors of google.cloud.bigquery.table.RowIterator used
+    by the service.
+
+    Attributes:
+        schema (list): The result column names.
+        page_size (int): The number of rows per page.
+    """
+
+    def __init__(self, rows, schema, page_size=None):
+        super().__init__(rows)
+        self.schema = schema
+        self.page_size = page_size
+
+    @property
+    def total_rows(self):
+        return len(self)
+
+    @property
+    def pages(self):
+        """
+        Yields the rows in pages of page_size rows (a single page when no page size was requested).
+        """
+        size = self.page_size or max(len(self), 1)
+        for start in range(0, len(self), size):
+            yield self[start:start + size]
+
+    def to_arrow(self, **kwargs):
+        """
+        Returns the rows as a pyarrow.Table with one column per result column.
+        """
+        columns = list(zip(*(row.values() for row in self))) if self else [()] * len(self.schema)
+        return pa.table({name: pa.array(list(values)) for name, values in zip(self.schema, columns)})
+
+
+class LocalQueryJob(object):
+    """
+    LocalQueryJob holds a submitted query. Like a BigQuery job, it runs in the background from the caller's point of
+    view: it is done once the client's simulated latency has passed since submission, and the statement is executed
+    when result() is first called.
+
+    Attributes:
+        job_id (str): A unique id of the job.
+        query (str): The submitted SQL.
+        state (str): 'PENDING' until executed, then 'DONE'.
+        total_bytes_processed (int): An estimate of the bytes of the returned rows.
+        cache_hit (bool): Always False.
+    """
+
+    def __init__(self, client, query, job_config=None):
+        self.job_id = uuid.uuid4().hex
+        self.query = query
+        self.state = 'PENDING'
+        self.total_bytes_processed = 0
+        self.cache_hit = False
+        self.created = datetime.datetime.now(datetime.timezone.utc)
+        self.started = None
+        self.ended = None
+        self._client = client
+        self._job_config = job_config
+        self._result = None
+        self._cancelled = False
+        self._ready_at = time.monotonic() + client.latency
+
+    def result(self, timeout=None, page_size=None, **kwargs):
+        """
+        Executes the query if it has not run yet and returns its rows.
+
+        Args:
+            timeout (float, optional): Accepted for compatibility with QueryJob.result(); not enforced.
+            page_size (int, optional): The number of rows per page of the returned iterator.
+
+        Returns:
+            LocalRowIterator: The result rows.
+        """
+        if self._result is None:
+            # Waits for the rest of the simulated latency, like waiting on a running job
+            time.sleep(max(self._ready_at - time.monotonic(), 0))
+            self.started = datetime.datetime.now(datetime.timezone.utc)
+            rows, schema = self._client._execute(self.query, self._job_config)
+            self._result = (rows, schema)
+            self.total_bytes_processed = sum(len(repr(row)) for row in rows)
+            self.ended = datetime.datetime.now(datetime.timezone.utc)
+            self.state = 'DONE'
+        rows, schema = self._result
+        return LocalRowIterator(rows, schema, page_size)
+
+    def cancel(self):
+        self._cancelled = True
+        return True
+
+    def done(self):
+        return self.state == 'DONE' or time.monotonic() >= self._ready_at
+
+
+class LocalBigQueryClient(object):
+    """
+    LocalBigQueryClient answers BigQuery queries from a SQLite database, translating the BigQuery dialect used by the
+    service. Each thread gets its own connection; file databases use WAL so readers do not block the writer.
+
+    Attributes:
+        path (str): The SQLite database path (':memory:' for a private in-memory database).
+        latency (float): Seconds added to every query to mimic BigQuery's job round trip.
+        project (str): A project name, for compatibility with bigquery.Client.
+    """
+
+    def __init__(self, path=':memory:', latency=0.0):
+        """
+        Initializes the LocalBigQueryClient with the given parameters.
+
+        Args:
+            path (str): The SQLite database path (default is ':memory:').
+            latency (float): Seconds added to every query (default is 0.0).
+        """
+        self.path = path
+        self.latency = latency
+        self.project = 'local'
+        if path == ':memory:':
+            # A named shared-cache database, kept alive by the first connection, is visible to every thread
+            self._uri = f"file:local-bigquery-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._uri = f"file:{path}"
+        self._local = threading.local()
+        self._keepalive = self._connection()
+        if path != ':memory:':
+            self._keepalive.execute('PRAGMA journal_mode=WAL')
+        self._write_lock = threading.Lock()
+
+    def query(self, query, job_config=None, **kwargs):
+        """
+        Submits a query.
+
+        Args:
+            query (str): The BigQuery SQL.
+            job_config (bigquery.QueryJobConfig, optional): The job configuration with the query parameters.
+
+        Returns:
+            LocalQueryJob: The job.
+        """
+        return LocalQueryJob(self, query, job_config)
+
+    def has_tables(self):
+        """
+        Returns whether every planner table exists in the database.
+        """
+        names = {row[0] for row in self._connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return set(SCHEMA) <= names
+
+    def executemany(self, sql, rows):
+        """
+        Runs a native SQLite statement for every row, in one transaction. Used to seed the database.
+
+        Args:
+            sql (str): The SQLite statement.
+            rows (iterable): The parameters of each execution.
+        """
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.executemany(sql, rows)
+
+    def close(self):
+        """
+        Closes the connection that keeps the database alive.
+        """
+        self._keepalive.close()
+
+    def _connection(self):
+        """
+        Returns the SQLite connection of the current thread, opening it on first use.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._uri, uri=True, timeout=30, check_same_thread=False)
+            if self.path == ':memory:':
+                # Readers of a shared-cache database would otherwise fail with "table is locked" during writes
+                connection.execute('PRAGMA read_uncommitted = 1')
+            self._local.connection = connection
+        return connection
+
+    def _execute(self, query, job_config):
+        """
+        Translates and executes a query.
+
+        Returns:
+            tuple: The list of google.cloud.bigquery.Row results and the list of column names.
+
+        Raises:
+            NotFound: If a table does not exist.
+            BadRequest: If the statement is not valid.
+        """
+        # Imported here, since importing google.cloud.bigquery costs a large share of the service startup
+        from google.cloud.bigquery import Row
+
+        connection = self._connection()
+        sql, parameters, arrays = _translate(query, job_config)
+        match = MERGE_PATTERN.match(sql)
+        try:
+            with self._write_lock if match else _NoLock(), connection:
+                for name, (fields, values) in arrays.items():
+                    connection.execute(f'DROP TABLE IF EXISTS temp.{name}')
+                    connection.execute(f"CREATE TEMP TABLE {name} ({', '.join(fields)})")
+                    connection.executemany(f"INSERT INTO temp.{name} VALUES ({', '.join('?' * len(fields))})",
+                                           values)
+                if match:
+                    _merge(connection, match, parameters)
+                    return [], []
+                cursor = connection.execute(sql, parameters)
+                schema = [column[0] for column in cursor.description or ()]
+                field_to_index = {name: index for index, name in enumerate(schema)}
+                return [Row(values, field_to_index) for values in cursor.fetchall()], schema
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e):
+                raise NotFound(str(e))
+            raise BadRequest(f"{e} in query: {sql}")
+
+
+class _NoLock(object):
+    """
+    Context manager that does nothing, used for statements that only read.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def _translate(query, job_config):
+    """
+    Translates the BigQuery dialect used by the service to SQLite.
+
+    Returns:
+        tuple: The SQL, its named scalar parameters and, for every array parameter, the temporary table that holds
+            it as (column names, rows).
+    """
+    sql = TABLE_PATTERN.sub(lambda match: f'{match.group(1)}__{match.group(2)}', query)
+    sql = re.sub(r'CURRENT_DATE\(\)', "DATE('now')", sql, flags=re.IGNORECASE)
+
+    parameters, arrays = {}, {}
+    for parameter in getattr(job_config, 'query_parameters', None) or []:
+        if hasattr(parameter, 'values'):
+            table = f'_unnest_{parameter.name}'
+            if parameter.array_type == 'STRUCT':
+                fields = list(parameter.values[0].struct_values) if parameter.values else ['value']
+                arrays[table] = (fields, [tuple(value.struct_values[field] for field in fields)
+                                          for value in parameter.values])
+            else:
+                arrays[table] = (['value'], [(value,) for value in parameter.values])
+            sql = re.sub(rf'IN\s+UNNEST\(\s*@{parameter.name}\s*\)', f'IN (SELECT value FROM temp.{table})', sql,
+                         flags=re.IGNORECASE)
+            sql = re.sub(rf'UNNEST\(\s*@{parameter.name}\s*\)', f'temp.{table}', sql, flags=re.IGNORECASE)
+        else:
+            parameters[parameter.name] = parameter.value
+    sql = re.sub(r'@(\w+)', r':\1', sql)
+    return sql, parameters, arrays
+
+
+def _merge(connection, match, parameters):
+    """
+    Runs a translated MERGE as an UPDATE of the matched target rows followed by an INSERT of the unmatched ones,
+    inside the caller's transaction.
+    """
+    table, target, alias = match.group('table'), match.group('target'), match.group('alias')
+    connection.execute('DROP TABLE IF EXISTS temp._merge_source')
+    connection.execute(f"CREATE TEMP TABLE _merge_source AS {match.group('source')}", parameters)
+
+    source = f'temp._merge_source AS {alias}'
+    assignments = re.sub(rf'\b{target}\.(\w+)\s*=', r'\1 =', match.group('set'))
+    connection.execute(f"UPDATE {table} AS {target} SET {assignments} FROM {source} WHERE {match.group('on')}")
+    connection.execute(f"INSERT INTO {table} ({match.group('columns')}) SELECT {match.group('values')} FROM {source} "
+                       f"WHERE NOT EXISTS (SELECT 1 FROM {table} AS {target} WHERE {match.group('on')})")
+
+
+def seed_database(client, sprints=12, projects=200, members=80, seed=0):
+    """
+    Creates the planner tables and fills them with generated data shaped like the real ones: a calendar of 10
+    working days per sprint starting two sprints ago, projects spread over business lines, people spread over
+    chapters and teams, and a few assignments per person and sprint.
+
+    Args:
+        client (LocalBigQueryClient): The client of the database to seed.
+        sprints (int): The number of sprints (default is 12).
+        projects (int): The number of projects (default is 200).
+        members (int): The number of people (default is 80).
+        seed (int): The random seed, so runs are reproducible (default is 0).
+
+    Returns:
+        dict: The number of rows written per table.
+    """
+    rng = random.Random(seed)
+    for table, columns in SCHEMA.items():
+        client.executemany(f'DROP TABLE IF EXISTS {table}', [()])
+        client.executemany(f'CREATE TABLE {table} ({columns})', [()])
+    for index in INDEXES:
+        client.executemany(index, [()])
+
+    start = datetime.date.today() - datetime.timedelta(weeks=4)
+    calendar, sprint_names = [], []
+    for number in range(sprints):
+        sprint_start = start + datetime.timedelta(weeks=2 * number)
+        name = f"{sprint_start.year}-S{sprint_start.isocalendar()[1] // 2 + 1:02d}"
+        sprint_names.append(name)
+        days = (sprint_start + datetime.timedelta(days=offset) for offset in range(14))
+        calendar.extend((day.isoformat(), name) for day in days if day.weekday() < 5)
+
+    lines = ['Retail', 'Banking', 'Energy', 'Public Sector', 'Health', 'Internal']
+    project_rows = [(1000 + number, f"Project {number:04d} {rng.choice(['Alpha', 'Beta', 'Gamma', 'Delta'])}",
+                     rng.choice(lines)) for number in range(projects)]
+
+    chapters = {'Data': ['BI', 'Engineering', 'Science'], 'Development': ['Backend', 'Frontend', 'Mobile'],
+                'Cloud': ['Platform', 'Security']}
+    teams = [(chapter, team) for chapter, chapter_teams in chapters.items() for team in chapter_teams]
+    people = []
+    for number in range(members):
+        chapter, team = teams[number % len(teams)]
+        people.append((f"Person {number:03d}", chapter, team, float(rng.choice([8, 9, 10]))))
+
+    assignments, cases = {}, {}
+    for name in sprint_names:
+        for person, _, team, _ in people:
+            for project in rng.sample(project_rows, k=min(3, len(project_rows))):
+                assignments[(name, project[0], person)] = rng.randint(1, 5)
+                key = (name, project[0], team)
+                cases[key] = cases.get(key, 0) + rng.randint(1, 5)
+
+    client.executemany('INSERT INTO sprints__luce_calendarSprint VALUES (?, ?)', calendar)
+    client.executemany('INSERT INTO projects__luce_projects VALUES (?, ?, ?)', project_rows)
+    client.executemany('INSERT INTO people__luce_people VALUES (?, ?, ?, ?)', people)
+    client.executemany('INSERT INTO capacity_planner_app__people_assignment VALUES (?, ?, ?, ?)',
+                       (key + (days,) for key, days in assignments.items()))
+    client.executemany('INSERT INTO capacity_planner_app__project_assignment VALUES (?, ?, ?, ?)',
+                       (key + (days,) for key, days in cases.items()))
+    return {
+        'sprints__luce_calendarSprint': len(calendar),
+        'projects__luce_projects': len(project_rows),
+        'people__luce_people': len(people),
+        'capacity_planner_app__people_assignment': len(assignments),
+        'capacity_planner_app__project_assignment': len(cases),
+    }
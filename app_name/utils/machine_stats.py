@@ -31,11 +31,15 @@ class MachineStats(object):
         uptime (float): The system uptime in seconds.
     """
 
-    def __init__(self):
+    def __init__(self, refresh=True):
         """
         Initializes the MachineStats instance and refreshes the statistics.
+
+        Args:
+            refresh (bool): Whether to collect the statistics now (default is True). get_stats() always collects them.
         """
-        self.refresh_stats()
+        if refresh:
+            self.refresh_stats()
 
     def refresh_stats(self):
         """
@@ -115,4 +119,5 @@ def stats_log(message, stats_units='GB', machine_stats=None):
     return message + " - Stats: " + machine_stats.stats_to_message(stats_units)
 
 
-machine_stats = MachineStats()
+# Collected on first use: every log() call refreshes the statistics anyway
+machine_stats = MachineStats(refresh=False)
@@ -3,6 +3,8 @@ This module provides utility functions for various operations, including convert
 
 Functions:
     list_to_string(s: list) -> str: Converts a list of elements to a single concatenated string.
+    sorted_distinct(values: iterable, first: str = None) -> list: Returns the sorted distinct non-null values.
+    to_bool(value) -> bool: Converts a config or environment value to a boolean.
 """
 
 
@@ -25,3 +27,34 @@ def list_to_string(s: list) -> str:
         concatenated_list += str(ele)
 
     return concatenated_list
+
+
+def sorted_distinct(values, first=None) -> list:
+    """
+    Returns the sorted distinct non-null values of an iterable, as a SELECT DISTINCT ... WHERE x IS NOT NULL
+    ORDER BY x would.
+
+    Args:
+        values (iterable): The values to process.
+        first (optional): A sentinel value prepended to the result (e.g. 'All Groups').
+
+    Returns:
+        list: The sorted distinct values, preceded by the sentinel when provided.
+    """
+    distinct = sorted({value for value in values if value is not None})
+    return distinct if first is None else [first] + distinct
+
+
+def to_bool(value) -> bool:
+    """
+    Converts a config or environment value to a boolean. Strings such as 'false', '0', 'no' or 'off' are False.
+
+    Args:
+        value: The value to convert (bool, number or string).
+
+    Returns:
+        bool: The boolean value.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() not in ('', '0', 'false', 'no', 'off')
+    return bool(value)
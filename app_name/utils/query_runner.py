@@ -0,0 +1,329 @@
+"""
+This module provides the QueryRunner class, which submits every BigQuery job an endpoint needs at once and waits
+for all of them together on a bounded thread pool, so an endpoint costs about as much as its slowest query.
+
+In asynchronous serving (see app_name.utils.asgi) a request runs with a dict of ready results bound through
+bind_results(). The runner then never blocks: it returns the ready results, or submits the missing jobs and raises
+JobsPending so the server awaits them on its event loop (QueryRunner.wait_async) and runs the request again.
+
+Classes:
+    QueryRunner: Submits a group of queries concurrently and collects their rows under an overall deadline.
+    QueryDeadlineExceeded: Raised when the queries of a group do not finish before the deadline.
+    JobsPending: Raised instead of blocking when a request runs with bound results and some are missing.
+
+Functions:
+    bind_results(results): Binds the ready results of the current request, enabling non-blocking runs.
+    unbind_results(token): Restores the previous binding.
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+from app_name.utils.single_flight import query_key
+
+
+# Results of the queries of the current request by query key, when it runs in asynchronous serving
+_ready_results = contextvars.ContextVar('ready_query_results', default=None)
+
+
+class QueryDeadlineExceeded(TimeoutError):
+    """
+    Raised when a group of queries does not complete before its deadline.
+    """
+
+
+class JobsPending(BaseException):
+    """
+    Raised by QueryRunner.run() instead of waiting, when the request runs with bound results and some are missing.
+    It derives from BaseException so the `except Exception` of the endpoints lets it through to the server.
+
+    Attributes:
+        jobs (dict): The submitted jobs by query key, as (job, fetch options) tuples.
+        expires_at (float): The monotonic time at which the jobs must be done.
+        deadline (float): The time budget in seconds of the jobs.
+    """
+
+    def __init__(self, jobs, expires_at, deadline):
+        super().__init__(f"{len(jobs)} queries pending")
+        self.jobs = jobs
+        self.expires_at = expires_at
+        self.deadline = deadline
+
+
+def bind_results(results):
+    """
+    Binds the ready results of the current request (by query key), so QueryRunner.run() returns them or raises
+    JobsPending instead of blocking.
+
+    Args:
+        results (dict): The ready results. Values may be exceptions, raised when the query is run.
+
+    Returns:
+        contextvars.Token: The token to restore the previous binding with unbind_results().
+    """
+    return _ready_results.set(results)
+
+
+def unbind_results(token):
+    """
+    Restores the binding that preceded bind_results().
+
+    Args:
+        token (contextvars.Token): The token returned by bind_results().
+    """
+    _ready_results.reset(token)
+
+
+class QueryRunner(object):
+    """
+    QueryRunner submits the queries of a request together and waits on their results concurrently.
+
+    Attributes:
+        max_workers (int): The maximum number of threads waiting on query results.
+        deadline (float): The default overall time budget in seconds for a group of queries.
+        telemetry (Telemetry): Records the time spent waiting on jobs and converting their rows, if provided.
+        single_flight (SingleFlight): Coalesces identical queries running at the same time, if provided.
+    """
+
+    def __init__(self, max_workers=8, deadline=60, telemetry=None, single_flight=None):
+        """
+        Initializes the QueryRunner with the given parameters.
+
+        Args:
+            max_workers (int): The maximum number of threads waiting on query results (default is 8).
+            deadline (float): The default time budget in seconds for a group of queries (default is 60).
+            telemetry (Telemetry, optional): Records the 'bigquery_wait' and 'row_conversion' phases of each job.
+            single_flight (SingleFlight, optional): When provided, a query identical (same normalized SQL, job
+                configuration and format) to one already in flight, from this or another request, shares its job
+                and rows instead of submitting a new job.
+        """
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.telemetry = telemetry
+        self.single_flight = single_flight
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query-runner')
+
+    def run(self, client, queries, deadline=None, as_arrow=False, page_size=None):
+        """
+        Submits all queries, waits for their results and returns the fetched rows by query name.
+        The first exception raised by any query (e.g. NotFound) is propagated unchanged.
+
+        Args:
+            client (google.cloud.bigquery.Client): The client used to submit the queries.
+            queries (dict): Mapping of query name to SQL string or to a (SQL, job_config) tuple.
+            deadline (float, optional): Overall time budget in seconds. Uses the runner deadline when not provided.
+            as_arrow (bool): Whether to fetch each result as a pyarrow.Table instead of a list of rows.
+            page_size (int, optional): When provided, the rows are not fetched: each result is the RowIterator of
+                the finished job, downloading page_size rows per page as the caller reads its pages.
+
+        Returns:
+            dict: Mapping of query name to the list of fetched rows (or the Arrow table, or the RowIterator).
+
+        Raises:
+            QueryDeadlineExceeded: If the queries do not finish before the deadline. Pending jobs are cancelled.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        expires_at = time.monotonic() + deadline
+
+        options = {'as_arrow': as_arrow, 'page_size': page_size}
+        ready = _ready_results.get()
+        if ready is not None:
+            return self._run_ready(client, queries, ready, expires_at, deadline, options)
+
+        jobs = {}
+        tasks = {}
+        for name, query in queries.items():
+            sql, job_config = query if isinstance(query, tuple) else (query, None)
+            if self.single_flight is None:
+                jobs[name] = client.query(sql, job_config=job_config)
+                tasks[name] = functools.partial(self._fetch_rows, jobs[name], expires_at, **options)
+            else:
+                # Submitted by the worker, once it knows no identical query is in flight
+                tasks[name] = functools.partial(self._fetch_shared, client, sql, job_config, jobs, name, expires_at,
+                                                options)
+
+        # Each job runs in a copy of the caller context, so its timings keep the endpoint label of the request
+        futures = {self._executor.submit(contextvars.copy_context().run, task): name for name, task in tasks.items()}
+        done, not_done = wait(futures, timeout=max(expires_at - time.monotonic(), 0), return_when=FIRST_EXCEPTION)
+
+        for future in done:
+            if future.exception() is not None:
+                self._cancel(jobs, futures, not_done)
+                raise future.exception()
+        if not_done:
+            self._cancel(jobs, futures, not_done)
+            pending = sorted(futures[future] for future in not_done)
+            raise QueryDeadlineExceeded(f"Queries {pending} did not finish within {deadline} seconds")
+
+        return {futures[future]: future.result() for future in done}
+
+    def _run_ready(self, client, queries, ready, expires_at, deadline, options):
+        """
+        Returns the ready results of the queries, or submits the missing ones and raises JobsPending.
+        """
+        keys = {}
+        for name, query in queries.items():
+            sql, job_config = query if isinstance(query, tuple) else (query, None)
+            keys[name] = (query_key(sql, job_config, **options), sql, job_config)
+        missing = {key: (sql, job_config) for key, sql, job_config in keys.values() if key not in ready}
+        if missing:
+            raise JobsPending({key: (client.query(sql, job_config=job_config), options)
+                               for key, (sql, job_config) in missing.items()}, expires_at, deadline)
+
+        results = {}
+        for name, (key, _, _) in keys.items():
+            if isinstance(ready[key], BaseException):
+                raise ready[key]
+            # Row lists are copied, since a query repeated within the request gets the same result
+            results[name] = list(ready[key]) if _materialized_rows(options) else ready[key]
+        return results
+
+    async def wait_async(self, pending, poll_interval=0.05, max_poll_interval=1.0):
+        """
+        Waits on the event loop for the jobs of a JobsPending and fetches their rows. No thread is held while the
+        jobs run: the executor is only used for the short job status calls and to download the rows.
+
+        Args:
+            pending (JobsPending): The submitted jobs.
+            poll_interval (float): The first seconds between status checks, growing by half each time (default
+                is 0.05).
+            max_poll_interval (float): The longest seconds between status checks (default is 1.0).
+
+        Returns:
+            dict: The rows (or the exception raised by the query) by query key.
+        """
+        loop = asyncio.get_running_loop()
+        waiting = dict(pending.jobs)
+        results = {}
+        while waiting:
+            finished = await loop.run_in_executor(self._executor, _finished_jobs, waiting)
+            for key in finished:
+                job, options = waiting.pop(key)
+                results[key] = loop.run_in_executor(self._executor, _outcome, functools.partial(
+                    self._fetch_rows, job, pending.expires_at, **options))
+            remaining = pending.expires_at - time.monotonic()
+            if waiting and remaining <= 0:
+                for key, (job, _) in waiting.items():
+                    _cancel_job(job)
+                    results[key] = QueryDeadlineExceeded(
+                        f"{len(waiting)} queries did not finish within {pending.deadline} seconds")
+                break
+            if waiting:
+                await asyncio.sleep(min(poll_interval, remaining))
+                poll_interval = min(poll_interval * 1.5, max_poll_interval)
+        return {key: await result if asyncio.isfuture(result) else result for key, result in results.items()}
+
+    def _fetch_rows(self, job, expires_at, as_arrow=False, page_size=None):
+        """
+        Waits for a job and materializes its rows.
+
+        Args:
+            job (google.cloud.bigquery.QueryJob): The submitted job.
+            expires_at (float): The monotonic time at which waiting must stop.
+            as_arrow (bool): Whether to download the result as an Arrow table (default is False).
+            page_size (int, optional): When provided, the RowIterator of the result is returned unread, paged by
+                page_size rows.
+
+        Returns:
+            list | pyarrow.Table | google.cloud.bigquery.table.RowIterator: The rows of the job result.
+        """
+        with self._phase('bigquery_wait'):
+            if page_size is not None:
+                return job.result(page_size=page_size, timeout=max(expires_at - time.monotonic(), 0))
+            result = job.result(timeout=max(expires_at - time.monotonic(), 0))
+        with self._phase('row_conversion'):
+            return result.to_arrow() if as_arrow else list(result)
+
+    def _fetch_shared(self, client, sql, job_config, jobs, name, expires_at, options):
+        """
+        Submits a query and materializes its rows, or waits for the identical query in flight and shares its rows.
+        The job is only recorded in jobs (and cancelled on a deadline) by the caller that submitted it, so a caller
+        giving up never cancels a job other callers wait for.
+
+        Args:
+            client (google.cloud.bigquery.Client): The client used to submit the query.
+            sql (str): The SQL statement.
+            job_config (google.cloud.bigquery.QueryJobConfig): The job configuration, or None.
+            jobs (dict): Mapping of query name to submitted job of the calling run.
+            name (str): The query name.
+            expires_at (float): The monotonic time at which waiting must stop.
+            options (dict): The as_arrow and page_size arguments of _fetch_rows().
+
+        Returns:
+            list | pyarrow.Table | google.cloud.bigquery.table.RowIterator: The rows of the job result.
+        """
+        def submit_and_fetch():
+            jobs[name] = client.query(sql, job_config=job_config)
+            return jobs[name], self._fetch_rows(jobs[name], expires_at, **options)
+
+        (job, rows), shared = self.single_flight.do(query_key(sql, job_config, **options), submit_and_fetch,
+                                                    timeout=max(expires_at - time.monotonic(), 0))
+        if not shared:
+            return rows
+        if options['page_size'] is not None:
+            # An iterator is read once, so each caller pages through the shared job's result with its own
+            return job.result(page_size=options['page_size'], timeout=max(expires_at - time.monotonic(), 0))
+        # Row lists are copied, so a caller changing its list does not change the others'. Arrow tables are immutable
+        return list(rows) if _materialized_rows(options) else rows
+
+    def _phase(self, name):
+        return self.telemetry.phase(name) if self.telemetry is not None else nullcontext()
+
+    @staticmethod
+    def _cancel(jobs, futures, not_done):
+        """
+        Cancels the BigQuery jobs that have not finished yet.
+
+        Args:
+            jobs (dict): Mapping of query name to submitted job.
+            futures (dict): Mapping of future to query name.
+            not_done (set): The futures that have not completed.
+        """
+        for future in not_done:
+            future.cancel()
+            try:
+                jobs[futures[future]].cancel()
+            except Exception:
+                pass
+
+
+def _finished_jobs(jobs):
+    """
+    Returns the keys of the jobs that are done. A job whose status cannot be read counts as done, so fetching its
+    rows raises the error.
+    """
+    finished = []
+    for key, (job, _) in jobs.items():
+        try:
+            if job.done():
+                finished.append(key)
+        except Exception:
+            finished.append(key)
+    return finished
+
+
+def _materialized_rows(options):
+    """
+    Returns whether results fetched with the given options are lists of rows, which callers get a copy of.
+    """
+    return not options['as_arrow'] and options['page_size'] is None
+
+
+def _outcome(function, *args):
+    """
+    Returns the result of a call, or the exception it raised.
+    """
+    try:
+        return function(*args)
+    except Exception as e:
+        return e
+
+
+def _cancel_job(job):
+    try:
+        job.cancel()
+    except Exception:
+        pass
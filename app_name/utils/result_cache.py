@@ -0,0 +1,194 @@
+"""
+This module provides the ResultCache class, a disk tier for query results that outlives the process, so a new
+instance can answer its first requests from the results the previous one fetched instead of waiting on BigQuery.
+
+Classes:
+    ResultCache: Keeps named groups of Arrow tables as memory-mapped Arrow IPC files with version metadata.
+"""
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+# Bumped when the file layout changes, so copies written by an older release are ignored
+FORMAT_VERSION = 1
+
+
+class ResultCache(object):
+    """
+    ResultCache stores each entry (a dict of Arrow tables) as one Arrow IPC file per table plus a JSON file with
+    its metadata. Tables are read through a memory map, so a read costs no copy until the data is used.
+    The metadata carries the version of the queries that produced the entry (copies written by other queries are
+    ignored) and a generation shared by the table files, so an entry caught half written is never read.
+
+    Attributes:
+        directory (str): The directory holding the entries.
+        max_age (float): Seconds after which a persisted entry is ignored (None keeps entries forever).
+        hits (int): The number of entries served from disk.
+        writes (int): The number of entries written.
+    """
+
+    def __init__(self, directory, max_age=None, clock=time.time):
+        """
+        Initializes the ResultCache with the given parameters.
+
+        Args:
+            directory (str): The directory holding the entries. It is created if missing.
+            max_age (float, optional): Seconds after which a persisted entry is ignored.
+            clock (callable): Function returning the current time in seconds (default is time.time).
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.hits = 0
+        self.writes = 0
+        self._clock = clock
+        self._taken = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name, tables, version):
+        """
+        Persists an entry, replacing any previous copy.
+
+        Args:
+            name (str): The entry name.
+            tables (dict): The Arrow tables of the entry by table name.
+            version (str): The version of the queries that produced the tables.
+        """
+        generation = f'{self._clock():.6f}-{os.getpid()}-{threading.get_ident()}'
+        for table_name, table in tables.items():
+            schema_metadata = {b'generation': generation.encode()}
+            self._replace(self._path(name, table_name), lambda sink: _write_table(
+                sink, table.replace_schema_metadata(schema_metadata)))
+        metadata = {'format': FORMAT_VERSION, 'version': version, 'generation': generation,
+                    'written_at': self._clock(), 'tables': sorted(tables)}
+        self._replace(self._path(name), lambda sink: sink.write(json.dumps(metadata).encode()))
+        with self._lock:
+            self.writes += 1
+
+    def read(self, name, version):
+        """
+        Returns a persisted entry if it exists, was produced by the given version and is not older than max_age.
+
+        Args:
+            name (str): The entry name.
+            version (str): The version of the queries the entry must come from.
+
+        Returns:
+            dict: The Arrow tables of the entry by table name, or None.
+        """
+        metadata = self.metadata(name)
+        if metadata is None or metadata.get('version') != version:
+            return None
+        if self.max_age is not None and self._clock() - metadata['written_at'] > self.max_age:
+            return None
+
+        # Imported on first use, so the module can be imported without loading pyarrow
+        import pyarrow as pa
+
+        tables = {}
+        try:
+            for table_name in metadata['tables']:
+                with pa.ipc.open_file(pa.memory_map(self._path(name, table_name))) as reader:
+                    table = reader.read_all()
+                if (table.schema.metadata or {}).get(b'generation') != metadata['generation'].encode():
+                    return None
+                tables[table_name] = table.replace_schema_metadata(None)
+        except (OSError, pa.ArrowInvalid):
+            return None
+        with self._lock:
+            self.hits += 1
+        return tables
+
+    def metadata(self, name):
+        """
+        Returns the metadata of a persisted entry: the version of its queries, its generation, the time it was
+        written at and its table names.
+
+        Args:
+            name (str): The entry name.
+
+        Returns:
+            dict: The metadata, or None when the entry is missing or was written by another file layout.
+        """
+        try:
+            with open(self._path(name), 'rb') as metadata_file:
+                metadata = json.loads(metadata_file.read())
+        except (OSError, ValueError):
+            return None
+        return metadata if metadata.get('format') == FORMAT_VERSION else None
+
+    def remove(self, name):
+        """
+        Removes a persisted entry. Its table files are left to be replaced by the next write.
+
+        Args:
+            name (str): The entry name.
+
+        Returns:
+            bool: Whether the entry existed.
+        """
+        try:
+            os.remove(self._path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def take(self, name, version):
+        """
+        Returns the persisted entry the first time it is asked for in this process, and None afterwards. Used to
+        serve the results of the previous instance while this one fetches its own.
+
+        Args:
+            name (str): The entry name.
+            version (str): The version of the queries the entry must come from.
+
+        Returns:
+            dict: The Arrow tables of the entry by table name, or None.
+        """
+        with self._lock:
+            if name in self._taken:
+                return None
+            self._taken.add(name)
+        return self.read(name, version)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: A dictionary with the entries served from disk, the entries written and the bytes on disk.
+        """
+        size = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                size += entry.stat().st_size
+        with self._lock:
+            return {'hits': self.hits, 'writes': self.writes, 'bytes': size}
+
+    def _path(self, name, table_name=None):
+        suffix = f'.{quote(table_name, safe="")}.arrow' if table_name is not None else '.json'
+        return os.path.join(self.directory, quote(name, safe='') + suffix)
+
+    @staticmethod
+    def _replace(path, write):
+        """
+        Writes a file next to its destination and renames it over, so readers see the old or the new file only.
+        """
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as sink:
+                write(sink)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _write_table(sink, table):
+    import pyarrow as pa
+
+    # Uncompressed, so the file can be memory-mapped and read without decoding
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
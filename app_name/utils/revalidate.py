@@ -0,0 +1,159 @@
+"""
+This module provides stale-while-revalidate reads: a request needing data that has expired starts its refresh in
+the background and waits for it only until its deadline, then serves the last good copy while the refresh
+completes, so a slow BigQuery queue shows up as older data instead of a spinner.
+
+Classes:
+    Revalidator: Runs one background refresh per key, waits for it up to a deadline and backs off after failures.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from app_name.utils.logger import logger
+
+
+class Revalidator(object):
+    """
+    Revalidator coordinates the refreshes of expired data. A caller passes the refresh and, when it has one, the
+    stale copy with its age. Without a copy (or with one older than max_stale_age) the caller waits for the refresh
+    like a plain read. With a copy, the refresh runs in the background and the caller gets its result if it is ready
+    within the deadline, or the stale copy otherwise. A refresh that fails is not retried for a backoff period that
+    doubles with each consecutive failure, while the stale copy keeps being served.
+
+    Attributes:
+        deadline (float): The seconds a caller with a stale copy waits for the refresh.
+        max_stale_age (float): The age in seconds beyond which a stale copy is not served.
+        backoff (float): The seconds before retrying a refresh after its first failure.
+        max_backoff (float): The longest seconds between retries of a failing refresh.
+        refreshes (int): The refreshes that succeeded.
+        failures (int): The refreshes that raised.
+        stale_served (int): The reads answered with a stale copy.
+    """
+
+    def __init__(self, deadline=2.0, max_stale_age=3600.0, backoff=5.0, max_backoff=300.0, on_stale=None,
+                 max_workers=4, clock=time.monotonic):
+        """
+        Initializes the Revalidator with the given parameters.
+
+        Args:
+            deadline (float): The seconds a caller with a stale copy waits for the refresh (default is 2.0).
+            max_stale_age (float): The age in seconds beyond which a stale copy is not served (default is 3600.0).
+            backoff (float): The seconds before retrying after the first failure (default is 5.0).
+            max_backoff (float): The longest seconds between retries (default is 300.0).
+            on_stale (callable, optional): Function called as on_stale(age) when a stale copy is served, e.g. to
+                report its age in the response.
+            max_workers (int): The refreshes running in the background at once (default is 4).
+            clock (callable): Function returning the current time in seconds (default is time.monotonic).
+        """
+        self.deadline = deadline
+        self.max_stale_age = max_stale_age
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.refreshes = 0
+        self.failures = 0
+        self.stale_served = 0
+        self._on_stale = on_stale
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='revalidate')
+        self._in_flight = {}
+        self._failing = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, refresh, stale=None, timeout=None):
+        """
+        Returns fresh data from the refresh, or the stale copy when the refresh is not done in time.
+
+        Args:
+            key (hashable): The key of the data; callers with the same key share one refresh.
+            refresh (callable): Function without arguments reloading the data and returning it.
+            stale (tuple, optional): The stale copy and its age in seconds.
+            timeout (float, optional): The seconds to wait for the refresh. Uses the deadline when not provided.
+
+        Returns:
+            tuple: The result of the refresh and None, or the stale copy and its age.
+
+        Raises:
+            Exception: The exception raised by the refresh, when there is no stale copy to serve.
+        """
+        if stale is None or stale[1] > self.max_stale_age:
+            with self._lock:
+                future = self._in_flight.get(key)
+                inline = future is None
+                if inline:
+                    # Registered like a background refresh, so concurrent callers wait for this one
+                    future = self._in_flight[key] = Future()
+            if not inline:
+                return future.result(), None
+            # Runs in the caller's thread, so the caller's context (e.g. a bound request) applies
+            return self._run(key, refresh, future), None
+
+        with self._lock:
+            failing = self._failing.get(key)
+            backing_off = failing is not None and self._clock() < failing[1]
+            future = self._in_flight.get(key)
+            if future is None and not backing_off:
+                future = self._in_flight[key] = Future()
+                self._executor.submit(self._run, key, refresh, future)
+        if future is None:
+            return self._serve_stale(stale)
+        try:
+            return future.result(timeout=self.deadline if timeout is None else max(timeout, 0.0)), None
+        except FutureTimeoutError:
+            return self._serve_stale(stale)
+        except Exception:
+            # Already logged and backed off by the refresh
+            return self._serve_stale(stale)
+
+    def stats(self):
+        """
+        Returns the revalidation counters.
+
+        Returns:
+            dict: A dictionary with the successful and failed refreshes, the stale reads, the refreshes in flight
+                and the keys backing off.
+        """
+        with self._lock:
+            now = self._clock()
+            return {'refreshes': self.refreshes, 'failures': self.failures, 'staleServed': self.stale_served,
+                    'inFlight': len(self._in_flight),
+                    'backingOff': sum(1 for _, retry_at in self._failing.values() if now < retry_at)}
+
+    def _run(self, key, refresh, future):
+        """
+        Runs a refresh, recording its success or its failure and the time of the next retry, and settles the future
+        it was registered in flight with. Only that future is removed from the refreshes in flight.
+        """
+        try:
+            result = refresh()
+        except Exception as e:
+            with self._lock:
+                attempts = self._failing.get(key, (0, 0))[0] + 1
+                delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+                self._failing[key] = (attempts, self._clock() + delay)
+                self.failures += 1
+                self._done(key, future)
+            logger.error(f"Refresh of {key} failed ({attempts} in a row), retrying in {delay:.0f} seconds: {e}")
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._failing.pop(key, None)
+            self.refreshes += 1
+            self._done(key, future)
+        future.set_result(result)
+        return result
+
+    def _done(self, key, future):
+        """
+        Removes a finished refresh from the refreshes in flight, unless another one took its place. Must be called
+        holding the lock.
+        """
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    def _serve_stale(self, stale):
+        with self._lock:
+            self.stale_served += 1
+        if self._on_stale is not None:
+            self._on_stale(stale[1])
+        return stale
@@ -0,0 +1,90 @@
+"""
+This module provides serializers that turn Arrow tables into HTTP response bodies, so large results can be sent
+without building one dict per row.
+
+Functions:
+    to_records(tables): Returns every table as a list of row dicts (the default JSON layout).
+    to_columns(tables): Returns every table as a dict of column lists (the columnar JSON layout).
+    to_ipc_stream(tables, tag_column='kind'): Serializes the tables into a single Arrow IPC stream.
+    iter_json_document(sections): Yields a JSON object of lists chunk by chunk, from pages of rows.
+"""
+import json
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+
+def to_records(tables):
+    """
+    Returns every table as a list of row dicts.
+
+    Args:
+        tables (dict): Mapping of name to pyarrow.Table.
+
+    Returns:
+        dict: Mapping of name to list of dicts.
+    """
+    return {name: table.to_pylist() for name, table in tables.items()}
+
+
+def to_columns(tables):
+    """
+    Returns every table as a dict of column lists, so keys are sent once per column instead of once per row.
+
+    Args:
+        tables (dict): Mapping of name to pyarrow.Table.
+
+    Returns:
+        dict: Mapping of name to dict of column name to list of values.
+    """
+    return {name: table.to_pydict() for name, table in tables.items()}
+
+
+def to_ipc_stream(tables, tag_column='kind'):
+    """
+    Serializes several tables into one Arrow IPC stream. Since a stream has a single schema, the tables are
+    concatenated with their schemas unified (columns missing from a table are null) and a dictionary-encoded
+    column records the name of the table each row comes from.
+
+    Args:
+        tables (dict): Mapping of name to pyarrow.Table.
+        tag_column (str): The name of the column holding the table name (default is 'kind').
+
+    Returns:
+        bytes: The Arrow IPC stream.
+    """
+    # Imported here, so the module can be imported without loading pyarrow
+    import pyarrow as pa
+
+    tagged = []
+    for name, table in tables.items():
+        tag = pa.DictionaryArray.from_arrays(pa.array([0] * table.num_rows, type=pa.int32()), pa.array([name]))
+        tagged.append(table.add_column(0, tag_column, tag))
+    combined = pa.concat_tables(tagged, promote_options='permissive').unify_dictionaries().combine_chunks()
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, combined.schema) as writer:
+        writer.write_table(combined)
+    return sink.getvalue().to_pybytes()
+
+
+def iter_json_document(sections):
+    """
+    Yields the JSON text of an object whose values are lists, one chunk per page of rows, so the whole document
+    is never held in memory.
+
+    Args:
+        sections (dict): Mapping of key to an iterable of pages, each page being a list of JSON-serializable rows.
+
+    Yields:
+        str: Consecutive chunks of the JSON document.
+    """
+    yield '{'
+    for section_number, (key, pages) in enumerate(sections.items()):
+        yield ('' if section_number == 0 else ',') + json.dumps(key) + ':['
+        separator = ''
+        for page in pages:
+            if page:
+                yield separator + ','.join(json.dumps(row, default=str) for row in page)
+                separator = ','
+        yield ']'
+    yield '}'
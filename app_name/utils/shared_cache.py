@@ -0,0 +1,160 @@
+"""
+This module provides the SharedResultCache class, which lets the processes of one host (e.g. the gunicorn workers of
+an instance) share query results: one process runs the queries and publishes their Arrow tables as files in a shared
+directory, and every process memory-maps them. On a tmpfs such as /dev/shm the files are shared memory, so the rows
+are held once and queried once per TTL no matter how many workers there are.
+
+Classes:
+    SharedResultCache: Arrow results shared by the processes of a host, refreshed by one of them under a file lock.
+"""
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from app_name.utils.result_cache import ResultCache
+
+
+class SharedResultCache(object):
+    """
+    SharedResultCache keeps each entry as the memory-mapped Arrow files of a ResultCache. An entry is fresh for ttl
+    seconds after it was written by any process. The process that finds it stale refreshes it holding an exclusive
+    lock on a file of the entry, while the other processes keep reading the copy being replaced, or wait for the
+    lock when there is no copy yet and then read what it wrote.
+
+    Attributes:
+        directory (str): The directory holding the entries and their lock files.
+        hits (int): The entries read from a fresh copy.
+        stale_hits (int): The stale copies served while another process or thread refreshed them.
+        loads (int): The loaders run by this process.
+    """
+
+    def __init__(self, directory, clock=time.time):
+        """
+        Initializes the SharedResultCache with the given parameters.
+
+        Args:
+            directory (str): The directory holding the entries. It is created if missing.
+            clock (callable): Function returning the current time in seconds (default is time.time).
+        """
+        self.directory = directory
+        self.hits = 0
+        self.stale_hits = 0
+        self.loads = 0
+        self._store = ResultCache(directory, clock=clock)
+        self._clock = clock
+        # flock() does not exclude the threads of one process, so they also take a lock per entry
+        self._thread_locks = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, name, version, loader, ttl):
+        """
+        Returns the tables of an entry, loading and publishing them when no process did so in the last ttl seconds.
+        Exceptions raised by the loader are propagated and nothing is published.
+
+        Args:
+            name (str): The entry name.
+            version (str): The version of the queries of the entry; copies of other versions are ignored.
+            loader (callable): Function without arguments returning the Arrow tables of the entry by table name.
+            ttl (float): Seconds an entry is fresh after it was written.
+
+        Returns:
+            dict: The Arrow tables of the entry by table name.
+        """
+        tables, fresh = self._read(name, version, ttl)
+        if fresh:
+            return self._count('hits', tables)
+
+        with self._refresh_lock(name, blocking=tables is None) as locked:
+            if not locked:
+                # Another worker is refreshing the entry: serve the copy it is about to replace
+                return self._count('stale_hits', tables)
+            # The entry may have been published while this process waited for the lock
+            published, fresh = self._read(name, version, ttl)
+            if fresh:
+                return self._count('hits', published)
+            tables = loader()
+            self._store.write(name, tables, version)
+            return self._count('loads', tables)
+
+    def remaining(self, name, ttl):
+        """
+        Returns the seconds an entry stays fresh, so copies derived from it can expire at the same time.
+
+        Args:
+            name (str): The entry name.
+            ttl (float): Seconds an entry is fresh after it was written.
+
+        Returns:
+            float: The seconds left, 0 when the entry is stale or missing.
+        """
+        metadata = self._store.metadata(name)
+        if metadata is None:
+            return 0.0
+        return max(0.0, metadata['written_at'] + ttl - self._clock())
+
+    def invalidate(self, name):
+        """
+        Drops an entry for every process, so the next one needing it loads it again.
+
+        Args:
+            name (str): The entry name.
+
+        Returns:
+            bool: Whether the entry existed.
+        """
+        return self._store.remove(name)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: A dictionary with the fresh and stale hits and the loads of this process, and the bytes of the
+                shared entries.
+        """
+        size = self._store.stats()['bytes']
+        with self._lock:
+            return {'hits': self.hits, 'staleHits': self.stale_hits, 'loads': self.loads, 'bytes': size}
+
+    def _read(self, name, version, ttl):
+        """
+        Returns the tables of an entry (None when missing) and whether they are fresh.
+        """
+        metadata = self._store.metadata(name)
+        if metadata is None or metadata.get('version') != version:
+            return None, False
+        tables = self._store.read(name, version)
+        return tables, tables is not None and self._clock() - metadata['written_at'] < ttl
+
+    def _count(self, counter, tables):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        return tables
+
+    @contextmanager
+    def _refresh_lock(self, name, blocking):
+        """
+        Holds the lock of an entry for this thread and process. Yields whether it was acquired, which is always the
+        case when blocking.
+        """
+        with self._lock:
+            thread_lock = self._thread_locks.setdefault(name, threading.Lock())
+        if not thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            with open(os.path.join(self.directory, quote(name, safe='') + '.lock'), 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
@@ -0,0 +1,112 @@
+"""
+This module provides request coalescing for identical work running at the same time: the first caller runs it and
+the callers arriving while it runs wait for and share its outcome, so a burst of identical requests costs one
+BigQuery job instead of one per request.
+
+Classes:
+    SingleFlight: Runs one call per key at a time and hands its result (or exception) to every concurrent caller.
+
+Functions:
+    query_key(sql, job_config=None, **options): Returns the coalescing key of a query.
+"""
+import json
+import re
+import threading
+from concurrent.futures import Future
+
+# String literals and quoted identifiers, whose whitespace is significant
+QUOTED_PATTERN = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)""")
+
+
+def query_key(sql, job_config=None, **options):
+    """
+    Returns the coalescing key of a query: its SQL with the whitespace outside literals normalized, the job
+    configuration (query parameters included) and any other option changing the result (e.g. its format).
+
+    Args:
+        sql (str): The SQL statement.
+        job_config (google.cloud.bigquery.QueryJobConfig, optional): The job configuration.
+        **options: Other values that must match for two queries to share a result.
+
+    Returns:
+        str: The key.
+    """
+    parts = QUOTED_PATTERN.split(sql)
+    # Odd parts are the quoted ones
+    normalized = ''.join(part if i % 2 else ' '.join(part.split()) for i, part in enumerate(parts)).strip()
+    config = job_config.to_api_repr() if hasattr(job_config, 'to_api_repr') else job_config
+    return json.dumps([normalized, config, options], sort_keys=True, default=str)
+
+
+class SingleFlight(object):
+    """
+    SingleFlight runs at most one call per key at a time. Callers asking for a key while its call is in flight
+    wait for it and get the same result, or the same exception. Nothing is kept once the call finishes: a caller
+    arriving afterwards starts a new call.
+
+    Attributes:
+        executions (int): The calls that ran.
+        coalesced (int): The callers that shared a call run by another one.
+        errors (int): The calls that raised.
+    """
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, timeout=None):
+        """
+        Runs the function for the key, or waits for the call in flight with the same key.
+
+        Args:
+            key (hashable): The call key.
+            function (callable): Function without arguments doing the work.
+            timeout (float, optional): Seconds a waiting caller waits for the call in flight. Waits indefinitely
+                when not provided. The call itself is never interrupted.
+
+        Returns:
+            tuple: The result of the call and whether it was shared with a call run by another caller.
+
+        Raises:
+            Exception: The exception raised by the call, for every caller sharing it.
+            TimeoutError: If a waiting caller times out.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Future()
+                self.executions += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return call.result(timeout=timeout), True
+
+        try:
+            result = function()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+                self.errors += 1
+            call.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        call.set_result(result)
+        return result, False
+
+    def stats(self):
+        """
+        Returns the coalescing counters.
+
+        Returns:
+            dict: A dictionary with the calls run, the callers coalesced, the calls that raised and the calls in
+                flight.
+        """
+        with self._lock:
+            return {'executions': self.executions, 'coalesced': self.coalesced, 'errors': self.errors,
+                    'inFlight': len(self._calls)}
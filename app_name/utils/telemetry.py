@@ -0,0 +1,326 @@
+"""
+This module provides in-process request telemetry (counters and latency histograms) exposed in the Prometheus text
+format. Recording is lock-free on the hot path: every thread writes to its own shard, and shards are only summed
+when the metrics are scraped. Gunicorn workers periodically write their totals to a shared directory, so a scrape
+served by any worker reports the sum of all of them.
+
+Classes:
+    Telemetry: Registry of counters and histograms with per-thread shards and cross-process aggregation.
+
+Functions:
+    current_endpoint(): Returns the endpoint label of the request being handled in the current context.
+"""
+import atexit
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from app_name.utils.logger import logger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_endpoint = contextvars.ContextVar('telemetry_endpoint', default='none')
+
+
+def current_endpoint():
+    """
+    Returns the endpoint label of the request being handled in the current context ('none' outside requests).
+    Work submitted to other threads keeps the label when it runs in a copy of the submitting context.
+    """
+    return _endpoint.get()
+
+
+class Telemetry(object):
+    """
+    Telemetry keeps counters and histograms keyed by metric name and label values. Each thread records into its own
+    shard without locking; a lock is only taken the first time a thread records and when shards are read.
+
+    Attributes:
+        directory (str): The directory where each process writes its totals (None for a single process).
+        flush_interval (float): The seconds between writes of this process's totals to the directory.
+    """
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        """
+        Initializes the Telemetry with the given parameters.
+
+        Args:
+            directory (str, optional): The directory shared by the worker processes. It is created, and the files
+                of processes that are no longer running removed, by start().
+            flush_interval (float): The seconds between writes of this process's totals (default is 5.0).
+        """
+        self.directory = directory or None
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def counter(self, name, documentation):
+        """
+        Declares a counter.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+        """
+        self._metrics[name] = ('counter', documentation, None)
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        """
+        Declares a histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            buckets (tuple): The upper bounds of the buckets, in ascending order.
+        """
+        self._metrics[name] = ('histogram', documentation, tuple(buckets))
+
+    def inc(self, name, labels, value=1):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The counter name.
+            labels (dict): The label values.
+            value (float): The increment (default is 1).
+        """
+        shard = self._shard()
+        key = (name, tuple(sorted(labels.items())))
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """
+        Records a value in a histogram.
+
+        Args:
+            name (str): The histogram name.
+            labels (dict): The label values.
+            value (float): The observed value.
+        """
+        shard = self._shard()
+        key = (name, tuple(sorted(labels.items())))
+        values = shard.get(key)
+        if values is None:
+            buckets = self._metrics[name][2]
+            # Per bucket counts (plus +Inf), then sum and count
+            values = shard[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+        values[bisect_left(self._metrics[name][2], value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    @contextmanager
+    def endpoint(self, endpoint):
+        """
+        Labels everything recorded in the block (and in contexts copied from it) with the given endpoint.
+        """
+        token = _endpoint.set(endpoint)
+        try:
+            yield
+        finally:
+            _endpoint.reset(token)
+
+    def bind_endpoint(self, endpoint):
+        """
+        Labels what is recorded from now on in the current context with the given endpoint, e.g. in a
+        before_request hook. Returns a token for unbind_endpoint().
+        """
+        return _endpoint.set(endpoint)
+
+    def unbind_endpoint(self, token):
+        _endpoint.reset(token)
+
+    @contextmanager
+    def phase(self, phase, name='app_phase_duration_seconds'):
+        """
+        Times a block and records it in a histogram labelled with the current endpoint and the phase.
+
+        Args:
+            phase (str): The phase label (e.g. 'bigquery_wait').
+            name (str): The histogram name (default is 'app_phase_duration_seconds').
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, {'endpoint': current_endpoint(), 'phase': phase}, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Returns the totals of this process, summed over the thread shards.
+
+        Returns:
+            dict: The values by (name, labels) key; counters are numbers, histograms lists.
+        """
+        with self._lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            for key, value in _items(shard):
+                _accumulate(totals, key, value)
+        return totals
+
+    def flush(self):
+        """
+        Writes the totals of this process to its file in the shared directory.
+        """
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as tmp:
+            json.dump([[name, list(labels), value] for (name, labels), value in self.snapshot().items()], tmp)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """
+        Returns the totals of every process: this process's live values plus the last totals written by the others.
+
+        Returns:
+            dict: The values by (name, labels) key.
+        """
+        totals = self.snapshot()
+        if self.directory:
+            own = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as metrics_file:
+                        entries = json.load(metrics_file)
+                except (OSError, ValueError):
+                    continue
+                for name, labels, value in entries:
+                    _accumulate(totals, (name, tuple(tuple(label) for label in labels)), value)
+        return totals
+
+    def render(self):
+        """
+        Renders the totals of every process in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: The metrics text.
+        """
+        by_name = {}
+        for (name, labels), value in self.collect().items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, documentation, buckets = self._metrics.get(name, ('untyped', '', None))
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(by_name[name]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), value):
+                    cumulative += count
+                    bucket_labels = labels + (('le', '+Inf' if bound == float('inf') else repr(bound)),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def start(self):
+        """
+        Creates the shared directory and starts the background thread writing this process's totals to it. When the
+        directory cannot be written, the totals stay in this process. Calling it more than once, or without a
+        directory, has no effect.
+        """
+        with self._lock:
+            if not self.directory or self._flusher is not None:
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self._remove_stale_files()
+            except OSError as e:
+                logger.warning(f"Metrics directory {self.directory} is not writable, metrics stay in-process: {e}")
+                self.directory = None
+                return
+            self._flusher = threading.Thread(target=self._run, name='telemetry-flush', daemon=True)
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _shard(self):
+        """
+        Returns the shard of the current thread, registering it on first use.
+        """
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _remove_stale_files(self):
+        """
+        Removes the files of processes that are no longer running. Their counts are dropped, which Prometheus
+        handles as a counter reset.
+        """
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+            except ValueError:
+                continue
+            if pid != os.getpid() and not _pid_exists(pid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _items(shard):
+    """
+    Returns a copy of the items of a shard that may be written by its thread meanwhile.
+    """
+    while True:
+        try:
+            return [(key, list(value) if isinstance(value, list) else value) for key, value in list(shard.items())]
+        except RuntimeError:
+            continue
+
+
+def _accumulate(totals, key, value):
+    if isinstance(value, list):
+        current = totals.get(key)
+        totals[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def _pid_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,230 @@
+"""
+This module provides the WriteBehindBuffer class, which acknowledges edits as soon as they are appended to a local
+journal and writes them to the database in the background, coalescing repeated edits of the same key.
+
+Classes:
+    WriteBehindBuffer: Durable write-behind buffer with an fsync'd append-only journal and periodic flushes.
+"""
+import atexit
+import json
+import os
+import threading
+
+from app_name.utils.logger import logger
+
+
+class WriteBehindBuffer(object):
+    """
+    WriteBehindBuffer keeps pending edits in memory, keyed so that later edits of a key replace earlier ones, and
+    mirrors every accepted edit in an append-only journal so that nothing acknowledged is lost if the process dies
+    before the next flush. The journal is compacted after every successful flush and replayed on start.
+
+    Attributes:
+        journal_path (str): The path of the append-only journal file.
+        flush_interval (float): The number of seconds between background flushes.
+        flushed (int): The number of edits written by successful flushes.
+        failed_flushes (int): The number of flushes that raised an error.
+    """
+
+    def __init__(self, journal_path, flush_fn, key_fn, flush_interval=2.0):
+        """
+        Initializes the WriteBehindBuffer with the given parameters.
+
+        Args:
+            journal_path (str): The path of the append-only journal file.
+            flush_fn (callable): Function called as flush_fn(kind, rows) to persist a list of edits of one kind.
+            key_fn (callable): Function called as key_fn(kind, row) returning the coalescing key of an edit.
+            flush_interval (float): The number of seconds between background flushes (default is 2.0).
+        """
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.flushed = 0
+        self.failed_flushes = 0
+        self._flush_fn = flush_fn
+        self._key_fn = key_fn
+        self._pending = {}
+        # The batch of the flush in progress, still pending until flush_fn has written it
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._journal = None
+
+    def start(self):
+        """
+        Replays the journal left by a previous process and starts the background flush thread.
+        Calling it more than once has no effect.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.check_journal()
+            replayed = self._replay()
+            # Rewriting the replayed edits drops a torn last line, so new entries never get appended to it
+            self._compact()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        if replayed:
+            logger.info(f"Replayed {replayed} unflushed edits from {self.journal_path}")
+        atexit.register(self.stop)
+
+    def check_journal(self):
+        """
+        Creates the directory of the journal if missing and checks that the journal can be written, so a buffer that
+        could not keep its edits fails before acknowledging any.
+
+        Raises:
+            OSError: If the directory cannot be created or the journal is not writable.
+        """
+        directory = os.path.dirname(self.journal_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        if not os.access(directory, os.W_OK) or (os.path.exists(self.journal_path)
+                                                 and not os.access(self.journal_path, os.W_OK)):
+            raise OSError(f"Write-behind journal {self.journal_path} is not writable")
+
+    def submit(self, kind, rows):
+        """
+        Durably records a list of edits and queues them for the next flush.
+
+        Args:
+            kind (str): The kind of edit, passed back to flush_fn.
+            rows (list): The edits, as JSON-serializable dicts.
+
+        Returns:
+            int: The number of pending edits after the submission.
+        """
+        self.start()
+        lines = ''.join(json.dumps({'kind': kind, 'row': row}) + '\n' for row in rows)
+        with self._lock:
+            self._journal.write(lines)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            for row in rows:
+                self._pending[(kind, self._key_fn(kind, row))] = (kind, row)
+            return len(self._pending)
+
+    def pending_rows(self, kind):
+        """
+        Returns the edits of a kind that have not been flushed yet, so reads can see their own writes. Edits being
+        flushed count as pending until flush_fn has written them; a newer edit of the same cell supersedes them.
+
+        Args:
+            kind (str): The kind of edit.
+
+        Returns:
+            list: The pending edits of that kind.
+        """
+        with self._lock:
+            pending = {**self._in_flight, **self._pending}
+        return [row for pending_kind, row in pending.values() if pending_kind == kind]
+
+    def flush(self):
+        """
+        Writes all pending edits, one flush_fn call per kind. Edits that fail stay pending (unless they were
+        superseded meanwhile) and are retried on the next flush.
+
+        Returns:
+            int: The number of edits written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = dict(batch)
+            if not batch:
+                return 0
+
+            by_kind = {}
+            for key, (kind, row) in batch.items():
+                by_kind.setdefault(kind, {})[key] = row
+
+            written = 0
+            for kind, rows in by_kind.items():
+                try:
+                    self._flush_fn(kind, list(rows.values()))
+                    written += len(rows)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    logger.error(f"Write-behind flush of {len(rows)} {kind} edits failed: {e}")
+                    with self._lock:
+                        for key, row in rows.items():
+                            self._pending.setdefault(key, (kind, row))
+                with self._lock:
+                    for key in rows:
+                        self._in_flight.pop(key, None)
+
+            with self._lock:
+                self.flushed += written
+                self._compact()
+            return written
+
+    def stop(self):
+        """
+        Stops the background thread and flushes the remaining edits.
+        """
+        if self._thread is None:
+            return
+        atexit.unregister(self.stop)
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+        with self._lock:
+            self._journal.close()
+            self._journal = None
+            self._thread = None
+            self._stop.clear()
+
+    def stats(self):
+        """
+        Returns the buffer counters.
+
+        Returns:
+            dict: A dictionary with pending (including those being flushed), flushed and failed flush counts.
+        """
+        with self._lock:
+            return {'pending': len(self._pending.keys() | self._in_flight.keys()), 'flushed': self.flushed, 'failed_flushes': self.failed_flushes}
+
+    def _run(self):
+        """
+        Background loop flushing the pending edits every flush_interval seconds.
+        """
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush loop error: {e}")
+
+    def _replay(self):
+        """
+        Loads the edits of an existing journal into the pending edits. A torn last line is ignored.
+
+        Returns:
+            int: The number of replayed journal entries.
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+        replayed = 0
+        with open(self.journal_path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._pending[(entry['kind'], self._key_fn(entry['kind'], entry['row']))] = (entry['kind'], entry['row'])
+                replayed += 1
+        return replayed
+
+    def _compact(self):
+        """
+        Atomically rewrites the journal with only the edits still pending. Must be called holding the lock.
+        """
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as tmp:
+            for kind, row in self._pending.values():
+                tmp.write(json.dumps({'kind': kind, 'row': row}) + '\n')
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        if self._journal is not None:
+            self._journal.close()
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
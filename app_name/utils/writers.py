@@ -14,8 +14,6 @@ import logging
 import os
 from abc import ABC, abstractmethod
 
-import pandas as pd
-
 
 class Writer(ABC):
     """
@@ -62,6 +60,9 @@ class ParquetWriter(Writer):
         super().create_base_path()
 
     def write(self, metric):
+        # pandas is imported on first write, so importing the writers does not load it
+        import pandas as pd
+
         df = pd.DataFrame([metric])
         df.to_parquet(self.file_path, index=False, engine='pyarrow', compression='snappy')
 
@@ -76,6 +77,8 @@ class CsvWriter(Writer):
         super().create_base_path()
 
     def write(self, metric):
+        import pandas as pd
+
         df = pd.DataFrame([metric])
         df.to_csv(self.file_path, mode='a', header=not pd.io.common.file_exists(self.file_path), index=False)
 
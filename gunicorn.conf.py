@@ -225,3 +225,54 @@
 #
 # def worker_abort(worker):
 #     worker.log.info("worker received SIGABRT signal")
+
+
+#
+# Planner API
+#
+#   GUNICORN_WORKERS - The number of workers. With more than one,
+#       the app is preloaded and the workers share the reference
+#       results. Unset, the command line and config.yaml decide.
+#
+#   preload_app - The master imports the app once and forks the
+#       workers, which share the imported code copy-on-write and
+#       start faster. On with more than one GUNICORN_WORKERS, or
+#       when GUNICORN_PRELOAD=true; GUNICORN_PRELOAD=false turns
+#       it off.
+#
+#   SHARED_CACHE_DIR - Directory where the workers share the
+#       reference results (projects, people) as memory-mapped Arrow
+#       files. With more than one GUNICORN_WORKERS it defaults to
+#       /dev/shm/capacity-planner (the temporary directory where
+#       /dev/shm does not exist); otherwise config.yaml applies.
+#
+#   post_worker_init - Each worker starts the background services
+#       of the app (change log, metrics and write-behind flushes,
+#       client prewarming) once it has loaded it, after the fork.
+#       The in-memory sprint data, change log and live edit streams
+#       belong to each worker, so edits need a single worker: with
+#       write-behind enabled, more than one worker fails to boot.
+#
+
+import os
+import sys
+import tempfile
+
+worker_count = int(os.environ.get('GUNICORN_WORKERS') or 1)
+if os.environ.get('GUNICORN_WORKERS'):
+    workers = worker_count
+
+preload_flag = os.environ.get('GUNICORN_PRELOAD', '').strip().lower()
+preload_app = preload_flag in ('true', '1', 'yes', 'on') if preload_flag else worker_count > 1
+
+if worker_count > 1:
+    os.environ.setdefault('SHARED_CACHE_DIR', os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'capacity-planner'))
+
+
+def post_worker_init(worker):
+    # The loaded app is the Flask app (main:app) or the ASGI adapter wrapping it; its module starts the services
+    app = getattr(worker.wsgi, 'app', worker.wsgi)
+    module = sys.modules.get(getattr(app, 'import_name', None))
+    if module is not None and hasattr(module, 'start_background_services'):
+        module.start_background_services(workers=worker.cfg.workers)
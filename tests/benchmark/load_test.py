@@ -0,0 +1,429 @@
+"""
+HTTP load benchmark of the planner API as it is deployed: gunicorn serving app_name.main:app, here backed by the
+local SQLite data source with an injected per-query latency instead of BigQuery.
+
+For every gunicorn configuration (workers x threads) the harness seeds a database, boots the server, runs each
+scenario (every endpoint alone, so memory can be attributed to it, plus a realistic mix) with a fixed number of
+concurrent keep-alive clients, and reports p50/p95/p99 latency, requests per second, errors and the peak RSS of
+the gunicorn processes. Results can be saved and compared with a baseline to catch regressions before deploy.
+
+`--modes gthread,asgi` runs every configuration both with the default gthread workers (app_name.main:app) and with
+the asyncio serving mode (app_name.asgi:app on uvicorn workers, WORKERSxTHREADS giving the workers and the
+application threads per worker), to compare how many concurrent requests each sustains while queries are slow.
+
+Usage:
+    python -m tests.benchmark.load_test --configs 1x8,2x4 --duration 15 --clients 16 --latency 0.2
+    python -m tests.benchmark.load_test --configs 1x8 --modes gthread,asgi --clients 64 --latency 0.5
+    python -m tests.benchmark.load_test --output baseline.json
+    python -m tests.benchmark.load_test --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+from app_name.utils.local_bigquery import LocalBigQueryClient, seed_database
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENDPOINTS = ['bootstrap', 'sprint-data', 'capacity-summary', 'edit']
+DEFAULT_MIX = 'bootstrap=1,sprint-data=4,capacity-summary=3,edit=2'
+# gunicorn arguments and application of each serving mode
+SERVER_MODES = {
+    'gthread': (['--worker-class', 'gthread'], 'app_name.main:app'),
+    'asgi': (['--worker-class', 'uvicorn.workers.UvicornWorker'], 'app_name.asgi:app'),
+}
+
+
+def percentile(sorted_values, q):
+    """
+    Returns the q-th percentile (0-100) of sorted values, interpolating linearly between closest ranks.
+
+    Args:
+        sorted_values (list): The values, in ascending order.
+        q (float): The percentile.
+
+    Returns:
+        float: The percentile, or 0.0 when there are no values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples, elapsed):
+    """
+    Aggregates request samples per endpoint.
+
+    Args:
+        samples (list): (endpoint, status, latency in seconds) tuples.
+        elapsed (float): The duration of the run in seconds.
+
+    Returns:
+        dict: Per endpoint, the number of requests, errors, requests per second and p50/p95/p99 latency in ms.
+    """
+    by_endpoint = {}
+    for endpoint, status, latency in samples:
+        by_endpoint.setdefault(endpoint, []).append((status, latency))
+    summary = {}
+    for endpoint, results in sorted(by_endpoint.items()):
+        latencies = sorted(latency for _, latency in results)
+        summary[endpoint] = {
+            'requests': len(results),
+            'errors': sum(1 for status, _ in results if status >= 400 or status == 0),
+            'rps': round(len(results) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        }
+    return summary
+
+
+def parse_configs(value):
+    """
+    Parses gunicorn configurations written as WORKERSxTHREADS, separated by commas (e.g. '1x8,2x4').
+
+    Returns:
+        list: (workers, threads) tuples.
+    """
+    configs = []
+    for item in value.split(','):
+        workers, threads = item.lower().split('x')
+        configs.append((int(workers), int(threads)))
+    return configs
+
+
+def parse_modes(value):
+    """
+    Parses serving modes separated by commas (e.g. 'gthread,asgi').
+
+    Returns:
+        list: The modes, in order.
+    """
+    modes = [mode.strip().lower() for mode in value.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in SERVER_MODES]
+    if unknown or not modes:
+        raise ValueError(f"Unknown serving modes {unknown}, expected some of {sorted(SERVER_MODES)}")
+    return modes
+
+
+def parse_mix(value):
+    """
+    Parses a traffic mix written as endpoint=weight pairs separated by commas.
+
+    Returns:
+        dict: The weight of each endpoint.
+
+    Raises:
+        ValueError: If an endpoint is unknown.
+    """
+    mix = {}
+    for item in value.split(','):
+        endpoint, weight = item.split('=')
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{endpoint}'. Use one of {ENDPOINTS}")
+        mix[endpoint] = float(weight)
+    return mix
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares a run with a baseline run and lists the regressions: p95 latency higher, or throughput lower, by more
+    than the tolerance, for the same configuration, scenario and endpoint.
+
+    Args:
+        results (dict): The results of this run, as returned by run_benchmark().
+        baseline (dict): The results of the baseline run.
+        tolerance (float): The allowed relative degradation (e.g. 0.2 for 20%).
+
+    Returns:
+        list: The regressions, as human readable strings.
+    """
+    regressions = []
+    for config, scenarios in results.items():
+        for scenario, measured in scenarios.items():
+            for endpoint, stats in measured['endpoints'].items():
+                reference = baseline.get(config, {}).get(scenario, {}).get('endpoints', {}).get(endpoint)
+                if reference is None:
+                    continue
+                label = f"{config} {scenario} {endpoint}"
+                if reference['p95_ms'] and stats['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+                    regressions.append(f"{label}: p95 {reference['p95_ms']} -> {stats['p95_ms']} ms")
+                if reference['rps'] and stats['rps'] < reference['rps'] * (1 - tolerance):
+                    regressions.append(f"{label}: rps {reference['rps']} -> {stats['rps']}")
+    return regressions
+
+
+class Server(object):
+    """
+    Runs gunicorn with the local data source in a subprocess.
+    """
+
+    def __init__(self, workers, threads, db_path, latency, port=None, mode='gthread'):
+        self.workers = workers
+        self.threads = threads
+        self.mode = mode
+        self.port = port or _free_port()
+        # In asgi mode the threads run the application code, while requests wait on the event loop. Every server gets
+        # its own shared results, so a run never reads the reference data published by a previous one
+        self._env = dict(os.environ, DATA_SOURCE='local', LOCAL_DB_PATH=db_path,
+                         LOCAL_DB_LATENCY_SECONDS=str(latency), WRITE_BEHIND_ENABLED='false', LOG_LEVEL='WARNING',
+                         ASGI_THREADS=str(threads), SHARED_CACHE_DIR=f'{db_path}.shared', GUNICORN_WORKERS=str(workers))
+        self._process = None
+
+    def __enter__(self):
+        worker_args, application = SERVER_MODES[self.mode]
+        command = [sys.executable, '-m', 'gunicorn', '--threads', str(self.threads),
+                   *worker_args, '--bind', f'127.0.0.1:{self.port}', '--log-level', 'warning', application]
+        self._process = subprocess.Popen(command, cwd=ROOT_DIR, env=self._env)
+        self._wait_ready()
+        return self
+
+    def __exit__(self, *args):
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+    def rss(self):
+        """
+        Returns the resident memory in bytes of the gunicorn master and its workers.
+        """
+        try:
+            master = psutil.Process(self._process.pid)
+            return sum(process.memory_info().rss for process in [master] + master.children(recursive=True))
+        except psutil.Error:
+            return 0
+
+    def _wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {self._process.returncode}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+                connection.request('GET', '/api/sprints')
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"gunicorn did not answer within {timeout} seconds")
+
+
+class RssSampler(threading.Thread):
+    """
+    Samples the RSS of a server in the background and keeps the peak.
+    """
+
+    def __init__(self, server, interval=0.25):
+        super().__init__(daemon=True)
+        self.peak = 0
+        self._server = server
+        self._interval = interval
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, self._server.rss())
+            self._done.wait(self._interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, self._server.rss())
+
+
+class Client(threading.Thread):
+    """
+    A keep-alive HTTP client sending requests of the scenario mix until the deadline.
+    """
+
+    def __init__(self, port, reference, mix, deadline, seed):
+        super().__init__(daemon=True)
+        self.samples = []
+        self._port = port
+        self._reference = reference
+        self._endpoints, self._weights = zip(*mix.items())
+        self._deadline = deadline
+        self._rng = random.Random(seed)
+        self._connection = None
+
+    def run(self):
+        while time.monotonic() < self._deadline:
+            endpoint = self._rng.choices(self._endpoints, self._weights)[0]
+            method, path, body = self._request(endpoint)
+            start = time.perf_counter()
+            status = self._send(method, path, body)
+            self.samples.append((endpoint, status, time.perf_counter() - start))
+
+    def _request(self, endpoint):
+        sprints = self._reference['sprints']
+        first = self._rng.randrange(len(sprints))
+        selected = ','.join(sprints[first:first + self._rng.randint(1, 4)])
+        if endpoint == 'bootstrap':
+            return 'GET', '/api/bootstrap', None
+        if endpoint == 'sprint-data':
+            return 'GET', f'/api/sprint-data?sprints={selected}&format=columnar', None
+        if endpoint == 'capacity-summary':
+            return 'GET', f'/api/capacity-summary?sprints={selected}', None
+        edits = [{'sprint': self._rng.choice(sprints), 'projectId': self._rng.choice(self._reference['projects']),
+                  'memberId': self._rng.choice(self._reference['members']), 'days': self._rng.randint(0, 5)}
+                 for _ in range(self._rng.randint(1, 5))]
+        return 'POST', '/api/assignments:batch', json.dumps(edits)
+
+    def _send(self, method, path, body):
+        for attempt in range(2):
+            try:
+                if self._connection is None:
+                    self._connection = http.client.HTTPConnection('127.0.0.1', self._port, timeout=60)
+                headers = {'Content-Type': 'application/json'} if body else {}
+                self._connection.request(method, path, body=body, headers=headers)
+                response = self._connection.getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                # The server may close idle keep-alive connections: reconnect once
+                self._connection.close()
+                self._connection = None
+        return 0
+
+
+def load_reference(port):
+    """
+    Returns the sprints, project ids and member ids the generated requests pick from.
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.request('GET', '/api/bootstrap')
+    bootstrap = json.loads(connection.getresponse().read())
+    return {
+        'sprints': bootstrap['sprints'],
+        'projects': [project['id'] for project in bootstrap['projects']],
+        'members': [member['id'] for member in bootstrap['teamMembers']],
+    }
+
+
+def run_scenario(server, reference, mix, clients, duration, seed):
+    """
+    Runs one scenario against a running server.
+
+    Returns:
+        dict: The per-endpoint summary and the peak RSS in MB.
+    """
+    sampler = RssSampler(server)
+    sampler.start()
+    deadline = time.monotonic() + duration
+    workers = [Client(server.port, reference, mix, deadline, seed + number) for number in range(clients)]
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - start
+    sampler.stop()
+    samples = [sample for worker in workers for sample in worker.samples]
+    return {'endpoints': summarize(samples, elapsed), 'peak_rss_mb': round(sampler.peak / 2 ** 20, 1)}
+
+
+def run_benchmark(configs, mix, clients, duration, latency, warmup, seed, size, modes=('gthread',)):
+    """
+    Runs every scenario against every gunicorn configuration and serving mode.
+
+    Args:
+        configs (list): (workers, threads) tuples.
+        mix (dict): The endpoint weights of the mixed scenario.
+        clients (int): The number of concurrent clients.
+        duration (float): The seconds each scenario runs.
+        latency (float): The seconds added to every local query.
+        warmup (float): The seconds of mixed traffic sent before measuring.
+        seed (int): The random seed of data and traffic.
+        size (dict): The sprints, projects and members of the generated data.
+        modes (iterable): The serving modes, keys of SERVER_MODES (default is gthread only).
+
+    Returns:
+        dict: Results by configuration ('WxT', prefixed by the mode other than gthread, e.g. 'asgi-1x8') and
+            scenario.
+    """
+    scenarios = [(endpoint, {endpoint: 1.0}) for endpoint in ENDPOINTS if endpoint in mix] + [('mixed', mix)]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, (workers, threads) in ((mode, config) for config in configs for mode in modes):
+            label = f'{workers}x{threads}' if mode == 'gthread' else f'{mode}-{workers}x{threads}'
+            db_path = os.path.join(directory, f'planner-{label}.sqlite3')
+            seed_client = LocalBigQueryClient(path=db_path)
+            seed_database(seed_client, seed=seed, **size)
+            seed_client.close()
+
+            results[label] = {}
+            with Server(workers, threads, db_path, latency, mode=mode) as server:
+                reference = load_reference(server.port)
+                if warmup:
+                    run_scenario(server, reference, mix, clients, warmup, seed)
+                for name, scenario_mix in scenarios:
+                    results[label][name] = run_scenario(server, reference, scenario_mix, clients, duration, seed)
+                    _print_scenario(label, name, results[label][name])
+    return results
+
+
+def _print_scenario(config, scenario, result):
+    print(f"\n[{config}] {scenario} - peak RSS {result['peak_rss_mb']} MB")
+    print(f"{'endpoint':<18}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in result['endpoints'].items():
+        print(f"{endpoint:<18}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--configs', default='1x8,2x4,4x2', help='gunicorn WORKERSxTHREADS list (default 1x8,2x4,4x2)')
+    parser.add_argument('--modes', default='gthread', help='serving modes to compare: gthread, asgi (default gthread)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'endpoint weights of the mixed scenario ({DEFAULT_MIX})')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent keep-alive clients (default 16)')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario (default 10)')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of traffic before measuring (default 3)')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds added to every query (default 0.2)')
+    parser.add_argument('--sprints', type=int, default=12, help='generated sprints (default 12)')
+    parser.add_argument('--projects', type=int, default=200, help='generated projects (default 200)')
+    parser.add_argument('--members', type=int, default=80, help='generated people (default 80)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of data and traffic (default 0)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare with the results JSON of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative degradation (default 0.2)')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(parse_configs(args.configs), parse_mix(args.mix), args.clients, args.duration,
+                            args.latency, args.warmup, args.seed,
+                            {'sprints': args.sprints, 'projects': args.projects, 'members': args.members},
+                            parse_modes(args.modes))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
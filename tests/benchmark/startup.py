@@ -0,0 +1,173 @@
+"""
+Startup benchmark of the planner API: how long a new instance takes before it can answer, as paid by the first user
+after App Engine scales to zero.
+
+It imports app_name.main in fresh interpreters with `python -X importtime` and reports the import time of the app
+and of the modules that cost the most (self and cumulative, median over the runs). It then boots gunicorn with the
+local data source and reports the time until the first answer and the latency of the first /api/bootstrap, which
+also pays the lazily created resources. Results can be saved and compared with a baseline like the load benchmark.
+
+Usage:
+    python -m tests.benchmark.startup --runs 5 --top 15
+    python -m tests.benchmark.startup --output startup.json
+    python -m tests.benchmark.startup --baseline startup.json --tolerance 0.2
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from app_name.utils.local_bigquery import LocalBigQueryClient, seed_database
+from tests.benchmark.load_test import ROOT_DIR, Server
+
+IMPORT_SNIPPET = ("import time; start = time.perf_counter(); import app_name.main; "
+                  "print(time.perf_counter() - start)")
+
+
+def parse_importtime(output):
+    """
+    Parses the report written by `python -X importtime` to stderr.
+
+    Args:
+        output (str): The stderr of the interpreter.
+
+    Returns:
+        dict: The self and cumulative import time in milliseconds of each module.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = {'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000}
+    return modules
+
+
+def summarize_imports(runs, top):
+    """
+    Aggregates several import runs.
+
+    Args:
+        runs (list): (total seconds, modules as returned by parse_importtime()) tuples.
+        top (int): The number of modules reported, by median cumulative time.
+
+    Returns:
+        dict: The median and maximum total import time and the most expensive modules.
+    """
+    totals = sorted(total * 1000 for total, _ in runs)
+    names = set().union(*(modules for _, modules in runs))
+    modules = {}
+    for name in names:
+        measured = [run_modules[name] for _, run_modules in runs if name in run_modules]
+        modules[name] = {key: round(statistics.median(sample[key] for sample in measured), 1)
+                         for key in ('self_ms', 'cumulative_ms')}
+    ranked = sorted(modules.items(), key=lambda item: item[1]['cumulative_ms'], reverse=True)
+    return {
+        'total_ms': {'p50': round(statistics.median(totals), 1), 'max': round(totals[-1], 1)},
+        'modules': dict(ranked[:top]),
+    }
+
+
+def measure_imports(runs, top, env=None):
+    """
+    Imports app_name.main in fresh interpreters.
+
+    Args:
+        runs (int): The number of interpreters.
+        top (int): The number of modules reported.
+        env (dict, optional): The environment of the interpreters.
+
+    Returns:
+        dict: The import summary, as returned by summarize_imports().
+    """
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', IMPORT_SNIPPET], cwd=ROOT_DIR,
+                                   env=env, capture_output=True, text=True, check=True)
+        samples.append((float(completed.stdout.strip().splitlines()[-1]), parse_importtime(completed.stderr)))
+    return summarize_imports(samples, top)
+
+
+def measure_server(db_path):
+    """
+    Boots gunicorn (1 worker) and times its first answers.
+
+    Returns:
+        dict: The milliseconds until it answered /api/sprints and the latency of the first /api/bootstrap.
+    """
+    start = time.monotonic()
+    with Server(1, 8, db_path, latency=0) as server:
+        ready = time.monotonic() - start
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+        request_start = time.monotonic()
+        connection.request('GET', '/api/bootstrap')
+        connection.getresponse().read()
+        first_bootstrap = time.monotonic() - request_start
+    return {'ready_ms': round(ready * 1000, 1), 'first_bootstrap_ms': round(first_bootstrap * 1000, 1)}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lists the startup timings that grew by more than the tolerance compared with a baseline run.
+
+    Returns:
+        list: The regressions, as human readable strings.
+    """
+    measured = {'import p50': results['imports']['total_ms']['p50'], **results.get('server', {})}
+    reference = {'import p50': baseline['imports']['total_ms']['p50'], **baseline.get('server', {})}
+    return [f"{name}: {reference[name]} -> {value} ms" for name, value in measured.items()
+            if reference.get(name) and value > reference[name] * (1 + tolerance)]
+
+
+def _print_results(results):
+    imports = results['imports']
+    print(f"import app_name.main: p50 {imports['total_ms']['p50']} ms, max {imports['total_ms']['max']} ms")
+    print(f"{'module':<60}{'self ms':>10}{'cumul. ms':>12}")
+    for name, stats in imports['modules'].items():
+        print(f"{name:<60}{stats['self_ms']:>10}{stats['cumulative_ms']:>12}")
+    if 'server' in results:
+        print(f"\ngunicorn ready after {results['server']['ready_ms']} ms, "
+              f"first /api/bootstrap {results['server']['first_bootstrap_ms']} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters importing the app (default 5)')
+    parser.add_argument('--top', type=int, default=15, help='most expensive modules reported (default 15)')
+    parser.add_argument('--skip-server', action='store_true', help='only measure the import of the app')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare with the results JSON of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative degradation (default 0.2)')
+    args = parser.parse_args(argv)
+
+    # The local data source keeps the runs independent of network access and credentials
+    env = dict(os.environ, DATA_SOURCE='local', LOG_LEVEL='WARNING')
+    results = {'imports': measure_imports(args.runs, args.top, env)}
+    if not args.skip_server:
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, 'planner.sqlite3')
+            seed_client = LocalBigQueryClient(path=db_path)
+            seed_database(seed_client)
+            seed_client.close()
+            results['server'] = measure_server(db_path)
+    _print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
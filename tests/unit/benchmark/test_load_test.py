@@ -0,0 +1,38 @@
+import pytest
+
+from tests.benchmark.load_test import compare, parse_configs, parse_mix, parse_modes, percentile, summarize
+
+
+def test_percentile_interpolates():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([1, 2, 3, 4], 100) == 4
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize_per_endpoint():
+    samples = [('edit', 200, 0.1), ('edit', 500, 0.3), ('bootstrap', 200, 0.2)]
+    summary = summarize(samples, elapsed=2)
+    assert summary['edit'] == {'requests': 2, 'errors': 1, 'rps': 1.0, 'p50_ms': 200.0, 'p95_ms': 290.0,
+                               'p99_ms': 298.0}
+    assert summary['bootstrap']['requests'] == 1
+
+
+def test_parse_arguments():
+    assert parse_configs('1x8,2X4') == [(1, 8), (2, 4)]
+    assert parse_mix('edit=2,bootstrap=1') == {'edit': 2.0, 'bootstrap': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix('unknown=1')
+    assert parse_modes('gthread, ASGI') == ['gthread', 'asgi']
+    with pytest.raises(ValueError):
+        parse_modes('eventlet')
+
+
+def test_compare_reports_regressions():
+    def result(p95, rps):
+        return {'1x8': {'mixed': {'endpoints': {'edit': {'p95_ms': p95, 'rps': rps}}, 'peak_rss_mb': 100}}}
+
+    assert compare(result(110, 95), result(100, 100), tolerance=0.2) == []
+    assert compare(result(130, 70), result(100, 100), tolerance=0.2) == [
+        '1x8 mixed edit: p95 100 -> 130 ms',
+        '1x8 mixed edit: rps 100 -> 70',
+    ]
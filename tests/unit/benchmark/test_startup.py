@@ -0,0 +1,28 @@
+from tests.benchmark.startup import compare, parse_importtime, summarize_imports
+
+REPORT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   yaml
+import time:      2000 |       5000 | app_name.main
+"""
+
+
+def test_parse_importtime():
+    assert parse_importtime(REPORT) == {'yaml': {'self_ms': 0.12, 'cumulative_ms': 0.12},
+                                        'app_name.main': {'self_ms': 2.0, 'cumulative_ms': 5.0}}
+
+
+def test_summarize_imports_takes_medians():
+    modules = parse_importtime(REPORT)
+    slower = {name: {key: value * 3 for key, value in stats.items()} for name, stats in modules.items()}
+    summary = summarize_imports([(0.5, modules), (0.7, modules), (0.6, slower)], top=1)
+    assert summary['total_ms'] == {'p50': 600.0, 'max': 700.0}
+    assert summary['modules'] == {'app_name.main': {'self_ms': 2.0, 'cumulative_ms': 5.0}}
+
+
+def test_compare_reports_slower_startup():
+    def result(import_ms, ready_ms):
+        return {'imports': {'total_ms': {'p50': import_ms}}, 'server': {'ready_ms': ready_ms}}
+
+    assert compare(result(500, 900), result(450, 1000), tolerance=0.2) == []
+    regressions = compare(result(700, 1300), result(450, 1000), tolerance=0.2)
+    assert regressions == ['import p50: 450 -> 700 ms', 'ready_ms: 1000 -> 1300 ms']
@@ -0,0 +1,74 @@
+import pytest
+
+from app_name.planner.capacity import summarize_capacity
+
+
+@pytest.fixture
+def team_members():
+    return [
+        {'id': 'Ana', 'team': 'Data', 'subteam': 'BI', 'expectedDays': 10},
+        {'id': 'Luis', 'team': 'Data', 'subteam': 'ML', 'expectedDays': 8},
+        {'id': 'Eva', 'team': 'Cloud', 'subteam': 'Ops', 'expectedDays': 5},
+    ]
+
+
+@pytest.fixture
+def projects():
+    return [
+        {'id': 1, 'name': 'Alpha', 'project_group': 'Retail'},
+        {'id': 2, 'name': 'Beta', 'project_group': 'Banking'},
+    ]
+
+
+@pytest.fixture
+def assignments():
+    return [
+        {'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3},
+        {'sprint': 'S1', 'projectId': 1, 'memberId': 'Eva', 'days': 2},
+        {'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 4},
+        {'sprint': 'S2', 'projectId': 1, 'memberId': 'Luis', 'days': 6},
+    ]
+
+
+@pytest.fixture
+def project_cases():
+    return [
+        {'sprint': 'S1', 'projectId': 1, 'subteam': 'BI', 'days': 5},
+        {'sprint': 'S1', 'projectId': 1, 'subteam': 'Ops', 'days': 1},
+    ]
+
+
+def test_summarize_capacity_totals(team_members, projects, assignments, project_cases):
+    summary = summarize_capacity(team_members, projects, assignments, project_cases, ['S1'])
+    assert summary['members']['Ana'] == {'assigned': 7.0, 'expected': 10.0, 'difference': 3.0}
+    assert summary['members']['Luis']['assigned'] == 0.0
+    assert summary['teams'] == {'Cloud': 2.0, 'Data': 7.0}
+    assert summary['subteams'] == {'BI': 5.0, 'ML': 0.0, 'Ops': 1.0}
+    assert summary['totals']['assigned'] == 9.0
+    assert summary['totals']['expected'] == 6.0
+
+
+def test_summarize_capacity_project_totals(team_members, projects, assignments, project_cases):
+    summary = summarize_capacity(team_members, projects, assignments, project_cases, ['S1'])
+    alpha = next(p for p in summary['projects'] if p['projectId'] == 1)
+    assert alpha['assigned'] == 5.0
+    assert alpha['expected'] == 6.0
+    assert alpha['teams']['Data'] == {'assigned': 3.0, 'expected': 5.0, 'difference': -2.0}
+    assert alpha['teams']['Cloud'] == {'assigned': 2.0, 'expected': 1.0, 'difference': 1.0}
+
+
+def test_summarize_capacity_totals_only_the_given_projects(team_members, projects, assignments, project_cases):
+    banking = [project for project in projects if project['project_group'] == 'Banking']
+    summary = summarize_capacity(team_members, banking, assignments, project_cases, ['S1'])
+    assert summary['members']['Ana']['assigned'] == 4.0
+    assert summary['subteams']['BI'] == 0.0
+    no_match = summarize_capacity(team_members, [], assignments, project_cases, ['S1'])
+    assert no_match['sprints'] == ['S1']
+    assert no_match['projects'] == []
+    assert no_match['totals']['assigned'] == 0.0
+
+
+def test_summarize_capacity_handles_empty_data(team_members, projects):
+    summary = summarize_capacity(team_members, projects, [], [], ['S1'])
+    assert summary['projects'] == []
+    assert summary['totals']['assigned'] == 0.0
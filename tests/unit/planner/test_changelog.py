@@ -0,0 +1,52 @@
+import pytest
+
+from app_name.planner.changelog import ChangeLog
+
+
+@pytest.fixture
+def log():
+    return ChangeLog(max_entries=3, clock=lambda: 1)
+
+
+def assignment(project_id, days, sprint='S1'):
+    return {'sprint': sprint, 'projectId': project_id, 'memberId': 'Ana', 'days': days}
+
+
+def test_versions_start_at_the_clock_and_increase(log):
+    assert log.version == 1000000
+    assert log.record('assignment', [assignment(1, 1), assignment(2, 1)]) == 1000002
+
+
+def test_since_returns_latest_value_of_changed_cells(log):
+    start = log.version
+    log.record('assignment', [assignment(1, 1)])
+    middle = log.record('project_case', [{'sprint': 'S1', 'projectId': 1, 'subteam': 'BI', 'days': 4}])
+    log.record('assignment', [assignment(1, 2)])
+    version, changes = log.since(start)
+    assert version == log.version
+    assert changes['assignments'] == [assignment(1, 2)]
+    assert changes['projectCases'] == [{'sprint': 'S1', 'projectId': 1, 'subteam': 'BI', 'days': 4}]
+    assert log.since(middle)[1] == {'assignments': [assignment(1, 2)], 'projectCases': []}
+    assert log.since(log.version)[1] == {'assignments': [], 'projectCases': []}
+
+
+def test_since_filters_sprints(log):
+    start = log.version
+    log.record('assignment', [assignment(1, 1, 'S1'), assignment(1, 1, 'S2')])
+    assert log.since(start, ['S2'])[1]['assignments'] == [assignment(1, 1, 'S2')]
+
+
+def test_since_needs_snapshot_after_compaction_or_for_unknown_versions(log):
+    start = log.version
+    log.record('assignment', [assignment(project_id, 1) for project_id in range(4)])
+    assert log.since(start)[1] is None
+    assert log.since(start + 1)[1] is not None
+    assert log.since(log.version + 1)[1] is None
+
+
+def test_reset_invalidates_issued_versions(log):
+    log.record('assignment', [assignment(1, 1)])
+    issued = log.version
+    assert log.reset() == issued + 1
+    assert log.since(issued)[1] is None
+    assert log.stats() == {'version': issued + 1, 'floor': issued + 1, 'entries': 0}
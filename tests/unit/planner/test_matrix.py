@@ -0,0 +1,185 @@
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from app_name.planner.matrix import AssignmentStore, SparseCells
+
+
+@pytest.fixture
+def source():
+    return {
+        'assignments': [
+            {'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 3},
+            {'sprint': 'S1', 'projectId': 1, 'memberId': 'Luis', 'days': 2},
+            {'sprint': 'S2', 'projectId': 1, 'memberId': 'Ana', 'days': 1},
+        ],
+        'projectCases': [
+            {'sprint': 'S1', 'projectId': 1, 'subteam': 'BI', 'days': 5},
+        ],
+    }
+
+
+@pytest.fixture
+def loader(mocker, source):
+    def load(sprints):
+        return {key: [row for row in rows if row['sprint'] in sprints] for key, rows in source.items()}
+    return mocker.MagicMock(side_effect=load)
+
+
+@pytest.fixture
+def store(loader):
+    return AssignmentStore(loader)
+
+
+def test_sparse_cells_set_overwrites_in_place():
+    cells = SparseCells(capacity=1)
+    cells.set(0, 1, 2.0)
+    cells.set(1, 0, 3.0)
+    cells.set(0, 1, 5.0)
+    assert cells.size == 2
+    assert cells.get(0, 1) == 5.0
+    assert cells.get(1, 1) == 0.0
+
+
+def test_sparse_cells_to_csr_and_column_totals():
+    cells = SparseCells()
+    cells.set(1, 0, 1.0)
+    cells.set(0, 2, 2.0)
+    cells.set(0, 1, 4.0)
+    indptr, indices, data = cells.to_csr(3)
+    assert indptr.tolist() == [0, 2, 3, 3]
+    assert indices.tolist() == [1, 2, 0]
+    assert data.tolist() == [4.0, 2.0, 1.0]
+    assert np.array_equal(cells.column_totals(3), [1.0, 4.0, 2.0])
+
+
+def test_sparse_cells_from_arrays_keeps_last_duplicate():
+    cells = SparseCells.from_arrays(np.array([0, 1, 0]), np.array([1, 0, 1]), np.array([2.0, 3.0, 5.0]))
+    assert cells.size == 2
+    assert cells.get(0, 1) == 5.0
+    cells.set(1, 0, 4.0)
+    assert cells.size == 2
+
+
+def test_tables_loads_arrow_and_keeps_types(mocker):
+    assignments = pa.table({'sprint': ['S1', 'S1'], 'projectId': [2, 1], 'memberId': ['Ana', 'Ana'],
+                            'days': [1.5, 2.0]})
+    cases = pa.table({'sprint': pa.array([], pa.string()), 'projectId': pa.array([], pa.int64()),
+                      'subteam': pa.array([], pa.string()), 'days': pa.array([], pa.int64())})
+    store = AssignmentStore(mocker.MagicMock(return_value={'assignments': assignments, 'projectCases': cases}))
+    tables = store.tables(['S1'])
+    assert tables['assignments'].to_pydict() == {'sprint': ['S1', 'S1'], 'projectId': [2, 1],
+                                                 'memberId': ['Ana', 'Ana'], 'days': [1.5, 2.0]}
+    assert tables['projectCases'].num_rows == 0
+    assert tables['projectCases'].schema.field('days').type == pa.int64()
+
+
+def test_load_applies_pending_edits(loader):
+    pending = {'assignment': [{'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 8}], 'project_case': []}
+    store = AssignmentStore(loader, pending=pending.get)
+    rows = {(row['projectId'], row['memberId']): row['days'] for row in store.get(['S1'])['assignments']}
+    assert rows == {(1, 'Luis'): 2, (2, 'Ana'): 8}
+
+
+def test_reload_of_resident_sprints_is_reported(loader, mocker):
+    on_reload = mocker.MagicMock()
+    store = AssignmentStore(loader, on_reload=on_reload)
+    store.get(['S1'])
+    on_reload.assert_not_called()
+    store.reconcile()
+    on_reload.assert_called_once_with(['S1'])
+
+
+def test_get_loads_each_sprint_once(store, loader):
+    first = store.get(['S1'])
+    assert len(first['assignments']) == 2
+    assert first['projectCases'] == [{'sprint': 'S1', 'projectId': 1, 'subteam': 'BI', 'days': 5}]
+    store.get(['S1', 'S2'])
+    store.get(['S2', 'S1'])
+    assert [call.args[0] for call in loader.call_args_list] == [['S1'], ['S2']]
+
+
+def test_get_reloads_sprints_older_than_max_age(loader, mocker):
+    clock = mocker.MagicMock(return_value=0)
+    store = AssignmentStore(loader, max_age=10, clock=clock)
+    store.get(['S1'])
+    clock.return_value = 5
+    store.get(['S1'])
+    clock.return_value = 10
+    store.get(['S1'])
+    assert loader.call_count == 2
+
+
+def test_expired_sprints_can_be_read_while_they_refresh(loader, source, mocker):
+    clock = mocker.MagicMock(return_value=0)
+    store = AssignmentStore(loader, max_age=10, clock=clock)
+    store.tables(['S1'])
+    clock.return_value = 12
+    assert store.expired(['S1', 'S2']) == {'S1': 12}
+    assert store.tables(['S1'], reload_expired=False)['assignments'].num_rows == 2
+    assert loader.call_count == 1
+
+    source['assignments'].append({'sprint': 'S1', 'projectId': 3, 'memberId': 'Eva', 'days': 4})
+
+    def load_with_concurrent_edit(sprints):
+        # An edit accepted while the rows are fetched, which the fetched rows do not contain
+        store.apply('assignment', [{'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 8}])
+        return {key: [row for row in rows if row['sprint'] in sprints] for key, rows in source.items()}
+
+    loader.side_effect = load_with_concurrent_edit
+    store.refresh(['S1'])
+    rows = {(row['projectId'], row['memberId']): row['days'] for row in store.get(['S1'])['assignments']}
+    assert rows == {(1, 'Luis'): 2, (2, 'Ana'): 8, (3, 'Eva'): 4}
+    assert store.expired(['S1']) == {}
+
+
+def test_cold_loads_do_not_block_writes_or_resident_reads(loader, source, store):
+    store.get(['S1'])
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_load(sprints):
+        loading.set()
+        release.wait(5)
+        return {key: [row for row in rows if row['sprint'] in sprints] for key, rows in source.items()}
+
+    loader.side_effect = slow_load
+    reader = threading.Thread(target=store.get, args=(['S2'],))
+    reader.start()
+    assert loading.wait(5)
+    # Both are answered while S2 is loading; the S2 edit is applied again on top of the loaded cells
+    assert store.apply('assignment', [{'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 6},
+                                      {'sprint': 'S2', 'projectId': 1, 'memberId': 'Ana', 'days': 9}]) == 1
+    assert len(store.get(['S1'])['assignments']) == 2
+    release.set()
+    reader.join(5)
+    assert store.get(['S2'])['assignments'] == [{'sprint': 'S2', 'projectId': 1, 'memberId': 'Ana', 'days': 9}]
+
+
+def test_apply_patches_resident_sprints_only(store):
+    store.get(['S1'])
+    patched = store.apply('assignment', [
+        {'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 7},
+        {'sprint': 'S1', 'projectId': 3, 'memberId': 'Eva', 'days': 1},
+        {'sprint': 'S9', 'projectId': 3, 'memberId': 'Eva', 'days': 1},
+    ])
+    assert patched == 2
+    rows = {(row['projectId'], row['memberId']): row['days'] for row in store.get(['S1'])['assignments']}
+    assert rows == {(1, 'Luis'): 2, (2, 'Ana'): 7, (3, 'Eva'): 1}
+
+
+def test_reconcile_reports_changed_cells(store, source):
+    store.get(['S1'])
+    store.apply('assignment', [{'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 9}])
+    assert store.reconcile() == 1
+    assert store.reconcile() == 0
+
+
+def test_memory_report(store):
+    store.get(['S1', 'S2'])
+    report = store.memory_report()
+    assert report['sprints'] == ['S1', 'S2']
+    assert report['assignmentCells'] == 3
+    assert report['projectCaseCells'] == 1
+    assert report['bytes'] > 0
@@ -0,0 +1,51 @@
+from app_name.planner.project_catalog import ProjectCatalog
+
+PROJECTS = [
+    {'id': 1, 'name': 'Alpha', 'project_group': 'Retail'},
+    {'id': 2, 'name': 'Beta', 'project_group': None},
+    {'id': 3, 'name': 'Gamma', 'project_group': 'Banking'},
+    {'id': 4, 'name': 'alphabet', 'project_group': 'Retail'},
+    {'id': 5, 'name': None, 'project_group': 'Retail'},
+]
+
+
+def test_groups_are_sorted_with_all_groups_first():
+    assert ProjectCatalog(PROJECTS).groups == ['All Groups', 'Banking', 'Retail']
+
+
+def test_filters_by_group_and_name_case_insensitively():
+    catalog = ProjectCatalog(PROJECTS)
+    assert catalog.ids(group='Retail', name='ALPHA') == [1, 4]
+    assert catalog.ids(name='a') == [1, 2, 3, 4]
+    assert catalog.ids(group='All Groups') == [1, 2, 3, 4, 5]
+    assert catalog.ids(group='Unknown') == []
+
+
+def test_name_filter_ignores_accents():
+    catalog = ProjectCatalog([{'id': 1, 'name': 'Migración', 'project_group': None}])
+    assert catalog.ids(name='MIGRACION') == [1]
+    assert catalog.ids(name='ción') == [1]
+
+
+def test_window_reports_the_total_of_matches():
+    window = ProjectCatalog(PROJECTS).window(group='Retail', offset=1, limit=1)
+    assert window == {'projects': [PROJECTS[3]], 'total': 3, 'offset': 1, 'limit': 1}
+
+
+def test_window_past_the_end_is_empty():
+    window = ProjectCatalog(PROJECTS).window(offset=10, limit=5)
+    assert window['projects'] == [] and window['total'] == 5
+
+
+def test_filters_are_memoized_up_to_a_limit():
+    catalog = ProjectCatalog(PROJECTS, max_memoized=2)
+    assert catalog.positions(name='al') is catalog.positions(name='AL')
+    catalog.positions(name='b')
+    catalog.positions(name='g')
+    assert len(catalog._memoized) == 1
+
+
+def test_empty_catalog():
+    catalog = ProjectCatalog([])
+    assert catalog.window(name='x') == {'projects': [], 'total': 0, 'offset': 0, 'limit': None}
+    assert catalog.groups == ['All Groups']
@@ -0,0 +1,67 @@
+from app_name.planner.project_search import ProjectSearchIndex, fold, tokenize, trigrams
+
+PROJECTS = [
+    {'id': 101, 'name': 'Gestión de Almacenes', 'project_group': 'Retail'},
+    {'id': 102, 'name': 'Almacén Central', 'project_group': 'Retail'},
+    {'id': 203, 'name': 'Migración Cloud', 'project_group': 'Banking'},
+    {'id': 204, 'name': 'Cuadro de Mando', 'project_group': 'Banking'},
+    {'id': 305, 'name': 'Portal Empleado', 'project_group': None},
+]
+
+
+def ids(results):
+    return [project['id'] for project in results]
+
+
+def test_fold_strips_accents_and_case():
+    assert fold('Gestión CAÑÓN') == 'gestion canon'
+    assert fold(None) == ''
+    assert tokenize(fold('Cuadro-de  Mando')) == ['cuadro', 'de', 'mando']
+    assert trigrams('ab cd') == {'ab ', 'b c', ' cd'}
+
+
+def test_prefix_search_ignores_accents():
+    index = ProjectSearchIndex(PROJECTS)
+    assert ids(index.search('almacen')) == [102, 101]
+    assert ids(index.search('MIGRACIÓN')) == [203]
+    assert ids(index.search('gest alm')) == [101]
+
+
+def test_exact_code_ranks_first():
+    index = ProjectSearchIndex(PROJECTS)
+    results = index.search('204')
+    assert ids(results) == [204]
+    assert results[0]['score'] == 100.0
+    # Code prefixes tie, so they are ordered by name
+    assert ids(index.search('20')) == [204, 203]
+
+
+def test_substring_and_similar_names_are_found_by_trigrams():
+    index = ProjectSearchIndex(PROJECTS)
+    assert ids(index.search('mpleado')) == [305]
+    assert ids(index.search('migrasion cloud')) == [203]
+
+
+def test_empty_queries_find_nothing():
+    index = ProjectSearchIndex(PROJECTS)
+    assert index.search('') == []
+    assert index.search('  ¿? ') == []
+    assert index.search('zzz') == []
+
+
+def test_limit():
+    assert len(ProjectSearchIndex(PROJECTS).search('a', limit=2)) == 2
+
+
+def test_update_reindexes_only_changes():
+    index = ProjectSearchIndex(PROJECTS)
+    renamed = dict(PROJECTS[4], name='Portal Proveedores')
+    regrouped = dict(PROJECTS[3], project_group='Retail')
+    counts = index.update(PROJECTS[1:3] + [regrouped, renamed, {'id': 406, 'name': 'Nuevo', 'project_group': None}])
+    assert counts == {'added': 1, 'removed': 1, 'updated': 1}
+    assert index.size == 5
+    assert index.search('gestion') == []
+    assert ids(index.search('proveedores')) == [305]
+    assert index.search('empleado') == []
+    assert index.search('cuadro')[0]['project_group'] == 'Retail'
+    assert ids(index.search('nuevo')) == [406]
@@ -0,0 +1,100 @@
+import datetime
+
+import pyarrow as pa
+import pytz
+
+from app_name.planner.sprint_calendar import SprintCalendar
+
+ROWS = [
+    {'sprint': '2024-S2', 'start_date': datetime.date(2024, 1, 15), 'end_date': datetime.date(2024, 1, 26),
+     'working_days': 10},
+    {'sprint': '2024-S1', 'start_date': datetime.date(2024, 1, 1), 'end_date': datetime.date(2024, 1, 12),
+     'working_days': 9},
+    {'sprint': '2024-S3', 'start_date': datetime.date(2024, 1, 29), 'end_date': datetime.date(2024, 2, 9),
+     'working_days': 10},
+]
+
+
+class FakeClock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_calendar(now, rows=ROWS, timezone='UTC'):
+    loads = []
+
+    def loader():
+        loads.append(now)
+        return rows
+
+    clock = FakeClock(pytz.utc.localize(now))
+    return SprintCalendar(loader, timezone=timezone, clock=clock), clock, loads
+
+
+def test_upcoming_is_chronological_and_excludes_ended_sprints():
+    calendar, _, _ = make_calendar(datetime.datetime(2024, 1, 12, 10))
+    assert calendar.upcoming() == ['2024-S2', '2024-S3']
+
+
+def test_index_is_loaded_once_per_day():
+    calendar, clock, loads = make_calendar(datetime.datetime(2024, 1, 10, 10))
+    calendar.upcoming()
+    clock.now = clock.now + datetime.timedelta(hours=5)
+    calendar.upcoming()
+    assert len(loads) == 1
+
+
+def test_index_rolls_over_at_midnight_in_its_timezone():
+    # 22:30 UTC is 23:30 in Madrid (UTC+1 in winter), and an hour later it is already Jan 13 there
+    calendar, clock, loads = make_calendar(datetime.datetime(2024, 1, 12, 22, 30), timezone='Europe/Madrid')
+    assert calendar.upcoming() == ['2024-S2', '2024-S3']
+    assert calendar.loaded_for == datetime.date(2024, 1, 12)
+    clock.now = clock.now + datetime.timedelta(hours=1)
+    assert clock.now.date() == datetime.date(2024, 1, 12)
+    calendar.upcoming()
+    assert calendar.loaded_for == datetime.date(2024, 1, 13)
+    assert len(loads) == 2
+
+
+def test_invalidate_reloads_on_next_use():
+    calendar, _, loads = make_calendar(datetime.datetime(2024, 1, 10))
+    assert not calendar.invalidate()
+    calendar.upcoming()
+    assert calendar.invalidate()
+    calendar.upcoming()
+    assert len(loads) == 2
+
+
+def test_stale_index_is_used_until_reloaded():
+    calendar, clock, loads = make_calendar(datetime.datetime(2024, 1, 12, 23, 0))
+    assert calendar.expired_for() is None
+    assert calendar.upcoming() == ['2024-S2', '2024-S3']
+    assert not calendar.expired()
+    assert calendar.expired_for() == 0
+    clock.now = clock.now + datetime.timedelta(hours=1, minutes=30)
+    assert calendar.expired()
+    assert calendar.expired_for() == 1800
+    # Yesterday's index answers for today's date
+    assert calendar.upcoming(allow_stale=True) == ['2024-S2', '2024-S3']
+    assert len(loads) == 1
+    calendar.upcoming()
+    assert len(loads) == 2 and not calendar.expired()
+
+
+def test_describe():
+    calendar, _, _ = make_calendar(datetime.datetime(2024, 1, 10))
+    assert calendar.describe(['2024-S2', 'X']) == [
+        {'sprint': '2024-S2', 'startDate': '2024-01-15', 'endDate': '2024-01-26', 'workingDays': 10}]
+    assert [sprint['sprint'] for sprint in calendar.describe()] == ['2024-S1', '2024-S2', '2024-S3']
+
+
+def test_accepts_arrow_tables_with_string_dates():
+    rows = pa.Table.from_pylist([{'sprint': 'S1', 'start_date': '2024-01-01', 'end_date': '2024-01-12',
+                                  'working_days': 9}])
+    calendar, _, _ = make_calendar(datetime.datetime(2024, 1, 5), rows=rows)
+    assert calendar.upcoming() == ['S1']
+    assert calendar.describe() == [{'sprint': 'S1', 'startDate': '2024-01-01', 'endDate': '2024-01-12', 'workingDays': 9}]
@@ -1,5 +1,605 @@
+import datetime
+import threading
+import time
+
+import pyarrow as pa
+import pytest
+from google.cloud.bigquery import Row
+
+from app_name import main
+from app_name.utils.local_bigquery import LocalBigQueryClient, seed_database
+
+
+class ResultRows(list):
+    """
+    List of rows that can also be downloaded as Arrow, like google.cloud.bigquery.table.RowIterator
+    """
+
+    page_size = 2
+
+    def to_arrow(self):
+        return pa.Table.from_pylist([dict(row) for row in self])
+
+    @property
+    def pages(self):
+        return (self[start:start + self.page_size] for start in range(0, len(self), self.page_size))
+
+
+def make_rows(records):
+    """
+    Builds BigQuery rows from a list of dicts
+    @param records: list of dicts with the same keys
+    @return: ResultRows of google.cloud.bigquery.Row
+    """
+    return ResultRows(Row(tuple(record.values()), {key: i for i, key in enumerate(record)}) for record in records)
+
+
+PROJECTS = [
+    {'id': 1, 'name': 'Alpha', 'project_group': 'Retail'},
+    {'id': 2, 'name': 'Beta', 'project_group': None},
+    {'id': 3, 'name': 'Gamma', 'project_group': 'Banking'},
+    {'id': 4, 'name': 'Delta', 'project_group': 'Retail'},
+]
+
+
+def sprint_rows(*names):
+    """
+    Builds sprint calendar rows for sprints that have not ended yet, in the given order
+    @param names: sprint names
+    @return: list of dicts as returned by the sprint calendar query
+    """
+    return [{'sprint': name, 'start_date': f'2099-{i + 1:02d}-01', 'end_date': f'2099-{i + 1:02d}-14',
+             'working_days': 10} for i, name in enumerate(names)]
+
+
+@pytest.fixture
+def bq_client(mocker):
+    """
+    Replaces the module BigQuery client with a mock that answers each query by matching a fragment of its SQL
+    """
+    results = {}
+
+    def query(sql, job_config=None):
+        job = mocker.MagicMock()
+        for fragment, rows in results.items():
+            if fragment in sql:
+                job.result.return_value = make_rows(rows)
+                return job
+        job.result.return_value = ResultRows()
+        return job
+
+    client = mocker.MagicMock()
+    client.query.side_effect = query
+    client.results = results
+    mocker.patch.object(main, 'bigquery_client', client)
+    main.reference_cache.invalidate()
+    main.sprint_calendar.invalidate()
+    main.assignment_store.invalidate()
+    yield client
+    main.reference_cache.invalidate()
+    main.sprint_calendar.invalidate()
+    main.assignment_store.invalidate()
+
+
 def test_index(client):
     response = client.get('/')
     result = response.get_json()
     assert result is not None
     assert "message" in result
+
+
+def test_get_sprints_is_cached(client, bq_client):
+    bq_client.results['calendar_sprint_str_i'] = sprint_rows('S1', 'S2')
+    first = client.get('/api/sprints')
+    second = client.get('/api/sprints')
+    assert first.get_json() == ['S1', 'S2']
+    assert second.get_json() == ['S1', 'S2']
+    assert bq_client.query.call_count == 1
+
+
+def test_get_sprints_details(client, bq_client):
+    bq_client.results['calendar_sprint_str_i'] = [
+        {'sprint': 'S2', 'start_date': '2099-02-01', 'end_date': '2099-02-14', 'working_days': 10},
+        {'sprint': 'S0', 'start_date': '2000-01-01', 'end_date': '2000-01-14', 'working_days': 10},
+        {'sprint': 'S1', 'start_date': '2099-01-01', 'end_date': '2099-01-14', 'working_days': 9},
+    ]
+    result = client.get('/api/sprints?details=true').get_json()
+    assert result == [
+        {'sprint': 'S1', 'startDate': '2099-01-01', 'endDate': '2099-01-14', 'workingDays': 9},
+        {'sprint': 'S2', 'startDate': '2099-02-01', 'endDate': '2099-02-14', 'workingDays': 10},
+    ]
+
+
+def test_get_team_data_errors_are_not_cached(client, bq_client):
+    bq_client.query.side_effect = Exception("boom")
+    response = client.get('/api/team-data')
+    assert response.status_code == 500
+    assert main.reference_cache.stats()['entries'] == 0
+
+
+def test_invalidate_cache(client, bq_client, config):
+    bq_client.results['calendar_sprint_str_i'] = sprint_rows('S1')
+    client.get('/api/sprints')
+    response = client.post('/api/cache/invalidate?token=' + config['token'])
+    assert response.get_json() == {'invalidated': 1}
+    client.get('/api/sprints')
+    assert bq_client.query.call_count == 2
+
+
+def test_invalidate_cache_requires_token(client):
+    response = client.post('/api/cache/invalidate')
+    assert response.status_code == 403
+
+
+def test_get_cache_stats(client, bq_client):
+    response = client.get('/api/cache/stats')
+    assert set(response.get_json()['reference']) >= {'hits', 'misses', 'entries'}
+    assert 'bytes' in response.get_json()['sprintData']
+    assert response.get_json()['queryCoalescing']['inFlight'] == 0
+
+
+def test_get_projects_and_groups_derives_groups(client, bq_client):
+    bq_client.results['project_code_int_i'] = PROJECTS
+    result = client.get('/api/projects-and-groups').get_json()
+    assert len(result['projects']) == 4
+    assert result['projectGroups'] == ['All Groups', 'Banking', 'Retail']
+    assert bq_client.query.call_count == 1
+
+
+def test_get_team_data_derives_teams(client, bq_client):
+    bq_client.results['person_name_str_i'] = [
+        {'id': 'Ana', 'name': 'Ana', 'team': 'Data', 'subteam': 'BI', 'expectedDays': 10.0},
+        {'id': 'Luis', 'name': 'Luis', 'team': 'Cloud', 'subteam': 'Ops', 'expectedDays': 8.0},
+    ]
+    result = client.get('/api/team-data').get_json()
+    assert result['teams'] == ['All Teams', 'Cloud', 'Data']
+    assert bq_client.query.call_count == 1
+
+
+def test_get_projects_and_groups_filters_and_windows(client, bq_client):
+    bq_client.results['project_code_int_i'] = PROJECTS
+    result = client.get('/api/projects-and-groups?group=Retail&name=A&offset=1&limit=1').get_json()
+    assert result['projects'] == [{'id': 4, 'name': 'Delta', 'project_group': 'Retail'}]
+    assert (result['total'], result['offset'], result['limit']) == (2, 1, 1)
+    assert result['projectGroups'] == ['All Groups', 'Banking', 'Retail']
+
+
+def test_get_projects_and_groups_rejects_bad_window(client, bq_client):
+    assert client.get('/api/projects-and-groups?limit=-1').status_code == 400
+    assert client.get('/api/projects-and-groups?offset=x').status_code == 400
+
+
+def test_search_projects(client, bq_client):
+    bq_client.results['project_code_int_i'] = PROJECTS
+    result = client.get('/api/projects/search?q=delt').get_json()
+    assert [project['id'] for project in result['projects']] == [4]
+    assert client.get('/api/projects/search?q=a&limit=2').get_json()['projects'][0]['name'] == 'Alpha'
+    assert client.get('/api/projects/search?q=').get_json()['projects'] == []
+    assert client.get('/api/projects/search?q=a&limit=x').status_code == 400
+
+
+def test_get_sprint_data_of_a_project_window(client, bq_client):
+    bq_client.results['project_code_int_i'] = PROJECTS
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': project_id, 'memberId': 'Ana',
+                                                     'days': 1} for project_id in (1, 2, 3, 4)]
+    response = client.get('/api/sprint-data?sprints=S1&name=a&limit=2')
+    result = response.get_json()
+    assert [project['id'] for project in result['projects']] == [1, 2]
+    assert result['totalProjects'] == 4
+    assert response.headers['X-Total-Count'] == '4'
+    assert [row['projectId'] for row in result['assignments']] == [1, 2]
+
+
+def test_get_bootstrap_returns_reference_and_default_sprint_data(client, bq_client, mocker):
+    mocker.patch.object(main, 'PROJECTS_PAGE_SIZE', 1)
+    bq_client.results['calendar_sprint_str_i'] = sprint_rows('S1', 'S2')
+    bq_client.results['project_code_int_i'] = PROJECTS[:2]
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3},
+                                                    {'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 1}]
+    response = client.get('/api/bootstrap')
+    result = response.get_json()
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert result['selectedSprints'] == ['S1']
+    assert [project['id'] for project in result['projects']] == [1]
+    assert result['totalProjects'] == 2
+    assert result['assignments'] == [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3}]
+    assert set(result) >= {'sprints', 'projects', 'projectGroups', 'teamMembers', 'teams', 'projectCases'}
+
+
+def test_get_bootstrap_answers_not_modified(client, bq_client):
+    bq_client.results['calendar_sprint_str_i'] = sprint_rows('S1')
+    etag = client.get('/api/bootstrap').headers['ETag']
+    response = client.get('/api/bootstrap', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+
+
+def test_update_assignments_batch_merges_in_one_job(client, bq_client):
+    edits = [
+        {'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 2},
+        {'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': '4'},
+        {'sprint': 'S1', 'projectId': 2, 'memberId': 'Luis', 'days': 1},
+        {'sprint': 'S1', 'projectId': 2},
+    ]
+    response = client.post('/api/assignments:batch', json=edits)
+    result = response.get_json()
+    assert response.status_code == 200
+    assert result['merged'] == 3
+    assert [r['status'] for r in result['results']] == ['merged', 'merged', 'merged', 'error']
+    assert bq_client.query.call_count == 1
+    sql, = bq_client.query.call_args.args
+    assert 'UNNEST(@rows)' in sql
+    rows = bq_client.query.call_args.kwargs['job_config'].query_parameters[0].values
+    assert len(rows) == 2
+
+
+def test_update_project_cases_batch_reports_merge_errors(client, bq_client):
+    bq_client.query.side_effect = Exception("DML quota exceeded")
+    response = client.post('/api/project-cases:batch', json={'rows': [{'sprint': 'S1', 'projectId': 1, 'subteam': 'BI'}]})
+    assert response.status_code == 500
+    assert response.get_json()['results'][0]['error'] == 'DML quota exceeded'
+
+
+def test_update_assignments_batch_rejects_empty_payload(client, bq_client):
+    response = client.post('/api/assignments:batch', json=[])
+    assert response.status_code == 400
+
+
+def test_update_assignment_merges_single_cell(client, bq_client):
+    edit = {'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 2}
+    response = client.post('/api/assignment', json=edit)
+    assert response.get_json() == edit
+    assert bq_client.query.call_count == 1
+
+
+@pytest.fixture
+def write_buffer(mocker, tmp_path):
+    buffer = main.WriteBehindBuffer(str(tmp_path / 'edits.journal'), flush_fn=mocker.MagicMock(),
+                                    key_fn=main.edit_key, flush_interval=60)
+    mocker.patch.object(main, 'write_buffer', buffer)
+    yield buffer
+    buffer.stop()
+
+
+def test_write_behind_refuses_several_workers(write_buffer):
+    with pytest.raises(RuntimeError, match='single worker'):
+        main.start_background_services(workers=2)
+
+
+def test_update_assignments_batch_queues_edits_when_write_behind(client, bq_client, write_buffer):
+    edits = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 2}]
+    result = client.post('/api/assignments:batch', json=edits).get_json()
+    assert result['queued'] == 1
+    assert bq_client.query.call_count == 0
+    assert write_buffer.stats()['pending'] == 1
+
+
+def test_get_sprint_data_overlays_pending_edits(client, bq_client, write_buffer):
+    bq_client.results['person_name as memberId'] = [
+        {'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3},
+        {'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 1},
+    ]
+    write_buffer.submit('assignment', [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 5},
+                                       {'sprint': 'S2', 'projectId': 1, 'memberId': 'Ana', 'days': 9}])
+    result = client.get('/api/sprint-data?sprints=S1').get_json()
+    assert sorted(a['days'] for a in result['assignments']) == [1, 5]
+
+
+def test_get_capacity_summary(client, bq_client):
+    bq_client.results['project_code_int_i'] = [{'id': 1, 'name': 'Alpha', 'project_group': 'Retail'}]
+    bq_client.results['person_name_str_i'] = [
+        {'id': 'Ana', 'name': 'Ana', 'team': 'Data', 'subteam': 'BI', 'expectedDays': 10.0},
+    ]
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3}]
+    result = client.get('/api/capacity-summary?sprints=S1').get_json()
+    assert result['members']['Ana']['difference'] == 7.0
+    assert result['totals']['assigned'] == 3.0
+
+
+def test_get_capacity_summary_requires_sprints(client, bq_client):
+    assert client.get('/api/capacity-summary').status_code == 400
+
+
+def test_get_sprint_data_is_served_from_resident_store(client, bq_client):
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3}]
+    client.get('/api/sprint-data?sprints=S1')
+    client.post('/api/assignment', json={'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 6})
+    result = client.get('/api/sprint-data?sprints=S1').get_json()
+    assert result['assignments'] == [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 6}]
+    # Two reads for the first load and one MERGE for the edit
+    assert bq_client.query.call_count == 3
+
+
+def test_get_sprint_data_columnar(client, bq_client):
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3},
+                                                    {'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 1}]
+    result = client.get('/api/sprint-data?sprints=S1&format=columnar').get_json()
+    assert result['assignments'] == {'sprint': ['S1', 'S1'], 'projectId': [1, 2], 'memberId': ['Ana', 'Ana'],
+                                     'days': [3, 1]}
+    assert result['projectCases'] == {'sprint': [], 'projectId': [], 'subteam': [], 'days': []}
+
+
+def test_get_sprint_data_arrow(client, bq_client):
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3}]
+    bq_client.results['team as subteam'] = [{'sprint': 'S1', 'projectId': 1, 'subteam': 'BI', 'days': 2}]
+    response = client.get('/api/sprint-data?sprints=S1&format=arrow')
+    assert response.mimetype == 'application/vnd.apache.arrow.stream'
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.column('kind').to_pylist() == ['assignments', 'projectCases']
+    assert table.column('memberId').to_pylist() == ['Ana', None]
+    assert table.column('subteam').to_pylist() == [None, 'BI']
+
+
+def test_get_sprint_data_rejects_unknown_format(client, bq_client):
+    assert client.get('/api/sprint-data?sprints=S1&format=xml').status_code == 400
+
+
+def test_get_sprint_data_streamed(client, bq_client, write_buffer, mocker):
+    bq_client.results['person_name as memberId'] = [
+        {'sprint': 'S1', 'projectId': project_id, 'memberId': 'Ana', 'days': 1} for project_id in range(5)
+    ]
+    write_buffer.submit('assignment', [{'sprint': 'S1', 'projectId': 0, 'memberId': 'Ana', 'days': 4}])
+    run = mocker.spy(main.query_runner, 'run')
+    response = client.get('/api/sprint-data?sprints=S1&stream=true')
+    assert response.is_streamed
+    # Through the query runner, for its deadline, coalescing and phase timings
+    assert run.call_args.kwargs['page_size'] == main.SPRINT_DATA_PAGE_SIZE
+    result = response.get_json()
+    days = sorted((a['projectId'], a['days']) for a in result['assignments'])
+    assert days == [(0, 4), (1, 1), (2, 1), (3, 1), (4, 1)]
+    assert result['projectCases'] == []
+    assert main.assignment_store.memory_report()['sprints'] == []
+
+
+def test_get_sprint_data_stream_requires_json_format(client, bq_client):
+    assert client.get('/api/sprint-data?sprints=S1&stream=1&format=arrow').status_code == 400
+
+
+def test_get_sprint_data_since_returns_changed_cells(client, bq_client):
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3},
+                                                    {'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 1}]
+    snapshot = client.get('/api/sprint-data?sprints=S1').get_json()
+    assert snapshot['delta'] is False
+    client.post('/api/assignment', json={'sprint': 'S1', 'projectId': 2, 'memberId': 'Ana', 'days': 6})
+    response = client.get(f"/api/sprint-data?sprints=S1&format=columnar&since={snapshot['version']}")
+    result = response.get_json()
+    assert result['delta'] is True
+    assert result['version'] == snapshot['version'] + 1
+    assert result['assignments'] == {'sprint': ['S1'], 'projectId': [2], 'memberId': ['Ana'], 'days': [6]}
+    assert response.headers['X-Data-Version'] == str(result['version'])
+
+
+def test_get_sprint_data_since_unknown_version_returns_snapshot(client, bq_client):
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3}]
+    result = client.get('/api/sprint-data?sprints=S1&since=1').get_json()
+    assert result['delta'] is False
+    assert len(result['assignments']) == 1
+    assert client.get('/api/sprint-data?sprints=S1&since=abc').status_code == 400
+
+
+def test_events_stream_pushes_edits_of_other_clients(client, bq_client):
+    response = client.get('/api/events?sprints=S1&client=me')
+    assert response.mimetype == 'text/event-stream'
+    chunks = (chunk.decode() for chunk in response.response)
+    assert next(chunks) == 'retry: 5000\n\n'
+    client.post('/api/assignment?client=me', json={'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 2})
+    client.post('/api/assignment?client=other', json={'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 6})
+    client.post('/api/assignment', json={'sprint': 'S2', 'projectId': 1, 'memberId': 'Ana', 'days': 1})
+    event = next(chunks)
+    assert event.startswith(f'id: {main.change_log.version - 1}\nevent: assignment\n')
+    assert '"days": 6' in event
+    assert event.count('event:') == 1
+    response.close()
+    assert main.event_broker.stats()['subscriptions'] == 0
+
+
+def test_events_refuses_streams_over_the_limit(client, mocker):
+    mocker.patch.object(main.event_broker, 'max_subscribers', 1)
+    first = client.get('/api/events?sprints=S1')
+    response = client.get('/api/events?sprints=S2')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(main.EVENTS_RETRY_AFTER_SECONDS)
+    first.close()
+    assert client.get('/api/events?sprints=S2').status_code == 200
+
+
+def test_events_stream_ends_after_its_lifetime(client, mocker):
+    mocker.patch.object(main, 'EVENTS_MAX_STREAM_SECONDS', 0.2)
+    response = client.get('/api/events?sprints=S1')
+    assert list(response.response)[0] == b'retry: 5000\n\n'
+    assert main.event_broker.stats()['subscriptions'] == 0
+
+
+def test_events_requires_sprints(client):
+    assert client.get('/api/events').status_code == 400
+
+
+def test_reconcile_sprint_data(client, bq_client, config):
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 3}]
+    client.get('/api/sprint-data?sprints=S1')
+    bq_client.results['person_name as memberId'] = [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ana', 'days': 4}]
+    response = client.post('/api/sprint-data/reconcile?token=' + config['token'])
+    assert response.get_json() == {'changed': 1}
+
+
+def test_endpoints_run_on_the_local_data_source(client, mocker):
+    local_client = LocalBigQueryClient()
+    seed_database(local_client, sprints=3, projects=5, members=4)
+    mocker.patch.object(main, 'bigquery_client', local_client)
+    main.reference_cache.invalidate()
+    main.sprint_calendar.invalidate()
+    main.assignment_store.invalidate()
+
+    bootstrap = client.get('/api/bootstrap').get_json()
+    sprint, member = bootstrap['selectedSprints'][0], bootstrap['teamMembers'][0]['id']
+    edit = {'sprint': sprint, 'projectId': bootstrap['projects'][0]['id'], 'memberId': member, 'days': 9}
+    assert client.post('/api/assignments:batch', json=[edit]).get_json()['merged'] == 1
+    main.assignment_store.invalidate()
+    assert edit in client.get(f'/api/sprint-data?sprints={sprint}').get_json()['assignments']
+    main.reference_cache.invalidate()
+    main.sprint_calendar.invalidate()
+    main.assignment_store.invalidate()
+
+
+def test_metrics_count_requests_by_endpoint(client, bq_client, mocker):
+    telemetry = main.Telemetry()
+    telemetry.counter('http_requests_total', '')
+    telemetry.histogram('http_request_duration_seconds', '')
+    telemetry.histogram('app_phase_duration_seconds', '')
+    mocker.patch.object(main, 'telemetry', telemetry)
+    mocker.patch.object(main.query_runner, 'telemetry', telemetry)
+    client.get('/api/sprints')
+    client.get('/no-such-page')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="/api/sprints",method="GET",status="200"} 1' in text
+    assert 'http_requests_total{endpoint="unmatched",method="GET",status="404"} 1' in text
+    assert 'http_request_duration_seconds_count{endpoint="/api/sprints"} 1' in text
+    assert 'app_phase_duration_seconds_count{endpoint="/api/sprints",phase="bigquery_wait"} 1' in text
+    assert 'app_phase_duration_seconds_count{endpoint="/api/sprints",phase="json_serialization"} 1' in text
+
+
+def test_cold_start_serves_persisted_results_and_revalidates(client, bq_client, mocker, tmp_path):
+    previous = main.ResultCache(str(tmp_path))
+    version = main.queries_version(main.sprint_data_queries([]))
+    previous.write('sprint-data/S1', {
+        'assignments': pa.table({'sprint': ['S1'], 'projectId': [1], 'memberId': ['Ann'], 'days': [2.0]}),
+        'projectCases': pa.table({'sprint': ['S1'], 'projectId': [1], 'subteam': ['Data'], 'days': [1.0]}),
+    }, version)
+    mocker.patch.object(main, 'result_cache', main.ResultCache(str(tmp_path)))
+    revalidations = []
+    mocker.patch.object(main, 'revalidate_in_background', lambda name, refresh: revalidations.append(refresh))
+    bq_client.results['FROM `olimpo-bi.capacity_planner_app.people_assignment`'] = [
+        {'sprint': 'S1', 'projectId': 1, 'memberId': 'Ann', 'days': 3.0}]
+
+    first = client.get('/api/sprint-data?sprints=S1').get_json()
+    assert first['assignments'] == [{'sprint': 'S1', 'projectId': 1, 'memberId': 'Ann', 'days': 2}]
+    assert bq_client.query.call_count == 0
+
+    revalidation, = revalidations
+    revalidation()
+    assert client.get('/api/sprint-data?sprints=S1').get_json()['assignments'][0]['days'] == 3
+    assert main.ResultCache(str(tmp_path)).read('sprint-data/S1', version)['assignments']['days'].to_pylist() == [3.0]
+
+
+def test_workers_share_reference_results(client, bq_client, mocker, tmp_path, config):
+    mocker.patch.object(main, 'shared_cache', main.SharedResultCache(str(tmp_path)))
+    bq_client.results['luce_people'] = [
+        {'id': 'Ann', 'name': 'Ann', 'team': 'Data', 'subteam': 'BI', 'expectedDays': 10.0}]
+    assert client.get('/api/team-data').get_json()['teams'] == ['All Teams', 'Data']
+    # A worker without its own copy reads the one published by the first
+    main.reference_cache.invalidate()
+    assert client.get('/api/team-data').get_json()['teamMembers'][0]['id'] == 'Ann'
+    assert bq_client.query.call_count == 1
+    assert client.get('/api/cache/stats').get_json()['sharedCache']['hits'] == 1
+
+    client.post('/api/cache/invalidate?name=team-data&token=' + config['token'])
+    client.get('/api/team-data')
+    assert bq_client.query.call_count == 2
+
+
+def test_reads_serve_the_last_good_data_when_the_refresh_is_late(client, bq_client, mocker):
+    now = [0.0]
+    mocker.patch.object(main, 'reference_cache', main.TTLCache(grace=3600, clock=lambda: now[0]))
+    mocker.patch.object(main, 'revalidator', main.Revalidator(max_stale_age=3600, on_stale=main.note_data_age))
+    mocker.patch.object(main, 'READ_DEADLINE_SECONDS', 0.1)
+    bq_client.results['luce_people'] = [
+        {'id': 'Ann', 'name': 'Ann', 'team': 'Data', 'subteam': 'BI', 'expectedDays': 10.0}]
+    assert 'X-Data-Age' not in client.get('/api/team-data').headers
+
+    now[0] = 1000
+    release = threading.Event()
+    answer = bq_client.query.side_effect
+
+    def slow_query(sql, job_config=None):
+        release.wait(5)
+        return answer(sql, job_config)
+
+    bq_client.query.side_effect = slow_query
+    bq_client.results['luce_people'] = [
+        {'id': 'Bob', 'name': 'Bob', 'team': 'Data', 'subteam': 'BI', 'expectedDays': 10.0}]
+    response = client.get('/api/team-data')
+    assert response.headers['X-Data-Age'] == '1000'
+    assert response.get_json()['teamMembers'][0]['id'] == 'Ann'
+
+    release.set()
+    for _ in range(100):
+        if main.revalidator.stats()['refreshes']:
+            break
+        time.sleep(0.05)
+    response = client.get('/api/team-data')
+    assert 'X-Data-Age' not in response.headers
+    assert response.get_json()['teamMembers'][0]['id'] == 'Bob'
+
+
+def test_sprints_are_served_from_the_previous_day_while_the_calendar_reloads(client, bq_client, mocker):
+    mocker.patch.object(main, 'revalidator', main.Revalidator(max_stale_age=3600, on_stale=main.note_data_age))
+    mocker.patch.object(main, 'READ_DEADLINE_SECONDS', 0.1)
+    calendar = main.sprint_calendar.resolve()
+    now = [calendar.timezone.localize(datetime.datetime(2030, 1, 1, 23, 50))]
+    mocker.patch.object(calendar, '_clock', lambda: now[0])
+    bq_client.results['calendar_sprint_str_i'] = sprint_rows('S1', 'S2')
+    assert client.get('/api/sprints').get_json() == ['S1', 'S2']
+
+    # Ten minutes after midnight the index has expired and its reload is late
+    now[0] += datetime.timedelta(minutes=20)
+    release = threading.Event()
+    answer = bq_client.query.side_effect
+    bq_client.query.side_effect = lambda sql, job_config=None: release.wait(5) and answer(sql, job_config)
+    bq_client.results['calendar_sprint_str_i'] = sprint_rows('S2', 'S3')
+    response = client.get('/api/sprints?details=true')
+    release.set()
+    assert response.headers['X-Data-Age'] == '600'
+    assert [sprint['sprint'] for sprint in response.get_json()] == ['S1', 'S2']
+    for _ in range(100):
+        if main.revalidator.stats()['refreshes']:
+            break
+        time.sleep(0.05)
+    response = client.get('/api/sprints')
+    assert 'X-Data-Age' not in response.headers
+    assert response.get_json() == ['S2', 'S3']
+
+
+def test_read_deadline_counts_from_the_request_arrival():
+    with main.app.test_request_context('/api/sprints', environ_base={main.REQUEST_STARTED: 100.0}):
+        main.start_read_deadline()
+        assert main.g.read_deadline == 100.0 + main.READ_DEADLINE_SECONDS
+    with main.app.test_request_context('/api/sprints'):
+        main.start_read_deadline()
+        assert main.g.read_deadline > time.monotonic()
+
+
+def test_expired_sprint_data_is_served_while_it_refreshes(client, bq_client, mocker):
+    mocker.patch.object(main, 'revalidator', main.Revalidator(on_stale=main.note_data_age))
+    mocker.patch.object(main, 'READ_DEADLINE_SECONDS', 0.1)
+    mocker.patch.object(main.assignment_store.resolve(), 'max_age', 0)
+    bq_client.results['FROM `olimpo-bi.capacity_planner_app.people_assignment`'] = [
+        {'sprint': 'S1', 'projectId': 1, 'memberId': 'Ann', 'days': 2.0}]
+    assert client.get('/api/sprint-data?sprints=S1').get_json()['assignments'][0]['days'] == 2
+
+    release = threading.Event()
+    answer = bq_client.query.side_effect
+    bq_client.query.side_effect = lambda sql, job_config=None: release.wait(5) and answer(sql, job_config)
+    response = client.get('/api/sprint-data?sprints=S1')
+    release.set()
+    assert 'X-Data-Age' in response.headers
+    assert response.get_json()['assignments'][0]['days'] == 2
+    for _ in range(100):
+        if not main.revalidator.stats()['inFlight']:
+            break
+        time.sleep(0.05)
+    assert main.revalidator.stats()['refreshes'] == 1
+
+
+def test_swagger_ui_is_served_by_a_lazily_built_app(client):
+    response = client.get('/apispec_1.json')
+    assert response.status_code == 200
+    assert 'paths' in response.get_json()
+
+
+def test_warmup_creates_the_lazy_resources(client, mocker):
+    resource = main.LazyProxy(lambda: 'client', name='bigquery_client')
+    mocker.patch.object(main, 'LAZY_RESOURCES', [resource])
+    assert set(client.get('/_ah/warmup').get_json()) == {'bigquery_client'}
+    assert resource.resolved
@@ -0,0 +1,220 @@
+import asyncio
+import time
+
+from flask import Flask, Response, jsonify, request
+from google.api_core.exceptions import NotFound
+
+from app_name.utils.asgi import REQUEST_STARTED, AsgiAdapter, wsgi_environ
+from app_name.utils.query_runner import QueryRunner
+
+
+class FakeJob(object):
+    """
+    Job that is done after a delay, like a BigQuery job running server-side
+    """
+
+    def __init__(self, rows, delay):
+        self.rows = rows
+        self.ready_at = time.monotonic() + delay
+        self.cancelled = False
+
+    def done(self):
+        return time.monotonic() >= self.ready_at
+
+    def result(self, timeout=None):
+        if isinstance(self.rows, Exception):
+            raise self.rows
+        return self.rows
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def make_app(mocker, results, delay=0.05, deadline=5):
+    jobs = []
+
+    def query(sql, job_config=None):
+        jobs.append(FakeJob(results[sql], delay))
+        return jobs[-1]
+
+    client = mocker.Mock()
+    client.query.side_effect = query
+    runner = QueryRunner(max_workers=4, deadline=deadline)
+    app = Flask(__name__)
+    app.calls = 0
+    app.started = []
+    app.closed = False
+
+    @app.route('/reads')
+    def reads():
+        app.calls += 1
+        app.started.append(request.environ[REQUEST_STARTED])
+        try:
+            first = runner.run(client, {'a': 'q1'})
+            second = runner.run(client, {'b': 'q2', 'c': 'q3'})
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        return jsonify({**first, **second})
+
+    @app.route('/edit', methods=['POST'])
+    def edit():
+        app.calls += 1
+        return jsonify({'rows': runner.run(client, {'a': 'q1'})['a'], 'body': request.get_json()})
+
+    @app.route('/stream')
+    def stream():
+        return Response((chunk for chunk in [b'a', b'', b'b']), mimetype='text/plain')
+
+    @app.route('/endless')
+    def endless():
+        def chunks():
+            try:
+                while True:
+                    time.sleep(0.01)
+                    yield b'x'
+            finally:
+                app.closed = True
+        return Response(chunks(), mimetype='text/event-stream')
+
+    return AsgiAdapter(app, runner, threads=2), app, client, jobs
+
+
+def call(adapter, path, method='GET', body=b'', headers=(), disconnect_after=None):
+    path, _, query_string = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string.encode(),
+             'headers': [(b'host', b'localhost')] + list(headers), 'http_version': '1.1', 'scheme': 'http',
+             'server': ('localhost', 80), 'client': ('127.0.0.1', 5000), 'root_path': ''}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # The client stays connected until disconnect_after body messages were sent, or for good
+        while disconnect_after is None or len(sent) <= disconnect_after:
+            await asyncio.sleep(0.01)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(adapter(scope, receive, send))
+    return sent
+
+
+def test_reads_are_replayed_until_their_queries_are_ready(mocker):
+    adapter, app, client, _ = make_app(mocker, {'q1': [1], 'q2': [2], 'q3': [3]})
+    sent = call(adapter, '/reads')
+    assert sent[0]['status'] == 200
+    assert b''.join(message.get('body', b'') for message in sent[1:]) == b'{"a":[1],"b":[2],"c":[3]}\n'
+    # Each query is submitted once; the view runs once per group of queries plus once to answer
+    assert client.query.call_count == 3
+    assert app.calls == 3
+    # Every replay carries the arrival time of the request, so the read deadline is not reset
+    assert len(set(app.started)) == 1
+
+
+def test_many_reads_wait_without_holding_threads(mocker):
+    adapter, _, _, _ = make_app(mocker, {'q1': [1], 'q2': [2], 'q3': [3]}, delay=0.3)
+
+    async def burst():
+        async def one():
+            sent = []
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                # Connected until the response is sent
+                await asyncio.Event().wait()
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/reads', 'query_string': b'', 'headers': []}
+            await adapter(scope, receive, send)
+            return sent[0]['status']
+
+        return await asyncio.gather(*(one() for _ in range(20)))
+
+    start = time.monotonic()
+    statuses = asyncio.run(burst())
+    # 20 requests x 2 rounds of 0.3 s on 2 threads would take 6 s if each wait held a thread
+    assert statuses == [200] * 20
+    assert time.monotonic() - start < 2
+
+
+def test_query_errors_reach_the_endpoint(mocker):
+    adapter, _, _, _ = make_app(mocker, {'q1': NotFound('missing table')})
+    sent = call(adapter, '/reads')
+    assert sent[0]['status'] == 500
+    assert b'missing table' in sent[1]['body']
+
+
+def test_deadline_reaches_the_endpoint_and_cancels_jobs(mocker):
+    adapter, _, _, jobs = make_app(mocker, {'q1': [1]}, delay=10, deadline=0.2)
+    sent = call(adapter, '/reads')
+    assert sent[0]['status'] == 500
+    assert b'did not finish' in sent[1]['body']
+    assert jobs[0].cancelled
+
+
+def test_writes_run_once(mocker):
+    adapter, app, _, _ = make_app(mocker, {'q1': [1]})
+    sent = call(adapter, '/edit', method='POST', body=b'{"x": 1}', headers=[(b'content-type', b'application/json')])
+    assert sent[0]['status'] == 200
+    assert b'"body":{"x":1}' in sent[1]['body']
+    assert app.calls == 1
+
+
+def test_streamed_bodies_are_sent_as_produced(mocker):
+    adapter, _, _, _ = make_app(mocker, {})
+    sent = call(adapter, '/stream')
+    assert [message.get('body') for message in sent[1:]] == [b'a', b'b', b'']
+    assert [message.get('more_body', False) for message in sent[1:]] == [True, True, False]
+
+
+def test_streams_stop_and_close_when_the_client_disconnects(mocker):
+    adapter, app, _, _ = make_app(mocker, {})
+    sent = call(adapter, '/endless', disconnect_after=3)
+    assert sent[0]['status'] == 200
+    assert app.closed
+    assert all(message.get('more_body') for message in sent[1:])
+
+
+def test_head_sends_no_body(mocker):
+    adapter, _, _, _ = make_app(mocker, {'q1': [1], 'q2': [2], 'q3': [3]})
+    sent = call(adapter, '/reads', method='HEAD')
+    assert sent[0]['status'] == 200
+    assert sent[1]['body'] == b''
+
+
+def test_wsgi_environ():
+    scope = {'type': 'http', 'method': 'GET', 'path': '/api/sprint-data', 'query_string': b'sprints=S1',
+             'headers': [(b'content-type', b'application/json'), (b'accept', b'a'), (b'accept', b'b')],
+             'server': ('example.com', 8080), 'scheme': 'https'}
+    environ = wsgi_environ(scope, b'{}')
+    assert environ['PATH_INFO'] == '/api/sprint-data'
+    assert environ['QUERY_STRING'] == 'sprints=S1'
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    assert environ['HTTP_ACCEPT'] == 'a,b'
+    assert environ['SERVER_PORT'] == '8080'
+    assert environ['wsgi.url_scheme'] == 'https'
+    assert environ['wsgi.input'].read() == b'{}'
+
+
+def test_lifespan(mocker):
+    adapter, _, _, _ = make_app(mocker, {})
+    adapter.on_startup = mocker.Mock()
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(adapter({'type': 'lifespan'}, receive, send))
+    assert [message['type'] for message in sent] == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    adapter.on_startup.assert_called_once_with()
@@ -0,0 +1,80 @@
+import pytest
+
+from app_name.utils.cache import TTLCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return TTLCache(max_entries=2, default_ttl=10, clock=clock)
+
+
+def test_get_returns_stored_value(cache):
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_get_expired_entry_is_a_miss(cache, clock):
+    cache.set('a', 1, ttl=5)
+    clock.now = 5
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_set_evicts_least_recently_used(cache):
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_get_or_load_calls_loader_once(cache, mocker):
+    loader = mocker.MagicMock(return_value=[1, 2])
+    assert cache.get_or_load('a', loader) == [1, 2]
+    assert cache.get_or_load('a', loader) == [1, 2]
+    loader.assert_called_once()
+
+
+def test_get_or_load_does_not_cache_errors(cache, mocker):
+    loader = mocker.MagicMock(side_effect=ValueError("boom"))
+    with pytest.raises(ValueError):
+        cache.get_or_load('a', loader)
+    assert cache.stats()['entries'] == 0
+
+
+def test_invalidate(cache):
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.invalidate('a') == 1
+    assert cache.invalidate('missing') == 0
+    assert cache.invalidate() == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_expired_entries_are_kept_for_the_grace_period(clock):
+    cache = TTLCache(max_entries=2, default_ttl=10, grace=30, clock=clock)
+    cache.set('a', 1)
+    clock.now = 15
+    assert cache.get('a') is None
+    assert cache.get_stale('a') == (1, 15)
+    clock.now = 40
+    assert cache.get_stale('a') is None
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
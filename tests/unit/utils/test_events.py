@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+from app_name.utils.events import EventBroker, SubscriberLimitReached, Subscription
+
+
+def test_publish_reaches_subscribers_of_the_topic_only():
+    broker = EventBroker()
+    s1 = broker.subscribe(['S1'])
+    s12 = broker.subscribe(['S1', 'S2'])
+    assert broker.publish('S2', 'edit') == 1
+    assert s1.get(timeout=0) == ([], False)
+    assert s12.get(timeout=0) == (['edit'], False)
+
+
+def test_subscription_backlog_is_bounded():
+    subscription = Subscription(['S1'], max_backlog=2)
+    for event in range(3):
+        subscription.put(event)
+    assert subscription.get(timeout=0) == ([1, 2], True)
+    assert subscription.get(timeout=0) == ([], False)
+
+
+def test_get_waits_for_an_event():
+    subscription = Subscription(['S1'])
+    threading.Timer(0.05, subscription.put, args=['edit']).start()
+    assert subscription.get(timeout=5) == (['edit'], False)
+
+
+def test_unsubscribe_and_stats():
+    broker = EventBroker()
+    subscription = broker.subscribe(['S1', 'S2'])
+    assert broker.stats() == {'topics': 2, 'subscriptions': 1, 'published': 0, 'rejected': 0}
+    broker.unsubscribe(subscription)
+    broker.publish('S1', 'edit')
+    assert broker.stats() == {'topics': 0, 'subscriptions': 0, 'published': 1, 'rejected': 0}
+
+
+def test_subscriptions_are_limited():
+    broker = EventBroker(max_subscribers=2)
+    first = broker.subscribe(['S1'])
+    broker.subscribe(['S2'])
+    with pytest.raises(SubscriberLimitReached):
+        broker.subscribe(['S1'])
+    broker.unsubscribe(first)
+    broker.subscribe(['S1'])
+    assert broker.stats()['rejected'] == 1
@@ -0,0 +1,82 @@
+import datetime
+import json
+
+import pytest
+
+from app_name.utils.job_stats import JobStatsClient, JobStatsCollector, job_statistics, operation_type
+from app_name.utils.local_bigquery import LocalBigQueryClient, seed_database
+from app_name.utils.telemetry import Telemetry
+
+
+@pytest.fixture
+def collector(mocker):
+    monitoring = mocker.MagicMock()
+    return JobStatsCollector(monitoring, mocker.sentinel.metric)
+
+
+def written(collector):
+    collector.join()
+    return [call.kwargs['new_values'] for call in collector.monitoring.write_metric.call_args_list]
+
+
+def test_operation_type():
+    assert operation_type('  merge `t` AS target USING ...') == 'write'
+    assert operation_type('SELECT * FROM t') == 'read'
+    assert operation_type('WITH x AS (SELECT 1) SELECT * FROM x') == 'read'
+
+
+def test_job_statistics(mocker):
+    created = datetime.datetime(2024, 1, 1)
+    job = mocker.Mock(total_bytes_processed=100, total_bytes_billed=10485760, slot_millis=42, cache_hit=False,
+                      created=created, started=created + datetime.timedelta(milliseconds=5),
+                      ended=created + datetime.timedelta(milliseconds=25))
+    assert job_statistics(job) == {'bytes_processed': 100, 'bytes_billed': 10485760, 'slot_millis': 42,
+                                   'cache_hit': False, 'queue_ms': 5.0, 'execution_ms': 20.0}
+    assert job_statistics(object())['queue_ms'] is None
+
+
+def test_queries_of_the_local_client_are_recorded(collector):
+    local = LocalBigQueryClient()
+    seed_database(local, sprints=2, projects=2, members=2)
+    client = JobStatsClient(local, collector)
+    assert client.has_tables()
+
+    with Telemetry().endpoint('/api/sprints'):
+        job = client.query('SELECT DISTINCT calendar_sprint_str_i FROM `olimpo-bi.sprints.luce_calendarSprint`')
+    assert len(list(job.result())) == 2
+
+    record, = written(collector)
+    assert (record['operation_type'], record['function_name'], record['rows'], record['status'], record['var1']) == \
+        ('read', '/api/sprints', 2, 'DONE', job.job_id)
+    assert set(json.loads(record['message'])) >= {'bytes_processed', 'cache_hit', 'queue_ms', 'execution_ms'}
+    assert collector.stats() == {'emitted': 1, 'dropped': 0, 'pending': 0}
+    local.close()
+
+
+def test_writes_report_the_affected_rows(collector, mocker):
+    job = mocker.Mock(spec=['result', 'num_dml_affected_rows'], num_dml_affected_rows=3)
+    collector.track(job, 'MERGE INTO t USING s ON TRUE', 'endpoint').result()
+    record, = written(collector)
+    assert (record['operation_type'], record['rows']) == ('write', 3)
+
+
+def test_failed_jobs_are_recorded_once(collector, mocker):
+    job = mocker.Mock(spec=['result'])
+    job.result.side_effect = ValueError('bad query')
+    tracked = collector.track(job, 'SELECT 1', 'endpoint')
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            tracked.result()
+    record, = written(collector)
+    assert record['status'] == 'FAILED'
+    assert json.loads(record['message'])['error'] == 'bad query'
+
+
+def test_records_are_dropped_when_the_queue_is_full(mocker):
+    collector = JobStatsCollector(mocker.MagicMock(), None, max_pending=1)
+    collector.monitoring.write_metric.side_effect = RuntimeError('sink down')
+    for _ in range(3):
+        collector.track(mocker.Mock(spec=['result']), 'SELECT 1', 'endpoint').result()
+    collector.join()
+    assert collector.stats()['emitted'] == 0
+    assert collector.stats()['dropped'] == 3
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from app_name.utils.lazy import LazyMount, LazyProxy
+
+
+def test_proxy_creates_its_target_once_on_first_use(mocker):
+    factory = mocker.Mock(return_value=mocker.Mock(value=42))
+    proxy = LazyProxy(factory, name='client')
+    assert not proxy.resolved
+    factory.assert_not_called()
+
+    threads = [threading.Thread(target=lambda: proxy.value) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert proxy.value == 42
+    assert proxy.resolved and proxy.init_seconds is not None
+    factory.assert_called_once()
+
+
+def test_proxy_is_falsy_when_the_factory_returns_none():
+    assert not LazyProxy(lambda: None)
+
+
+def test_proxy_retries_after_a_failure(mocker):
+    factory = mocker.Mock(side_effect=[RuntimeError('no credentials'), 'client'])
+    proxy = LazyProxy(factory)
+    with pytest.raises(RuntimeError):
+        proxy.resolve()
+    assert proxy.resolve() == 'client'
+
+
+def test_mount_creates_the_app_on_its_first_request(mocker):
+    app = mocker.Mock(return_value=[b'app'])
+    docs = mocker.Mock(return_value=[b'docs'])
+    factory = mocker.Mock(return_value=docs)
+    middleware = LazyMount(app, ('/apidocs',), factory)
+
+    assert middleware({'PATH_INFO': '/api/sprints'}, None) == [b'app']
+    factory.assert_not_called()
+    assert middleware({'PATH_INFO': '/apidocs/'}, None) == [b'docs']
+    assert middleware({'PATH_INFO': '/apidocs/index.html'}, None) == [b'docs']
+    factory.assert_called_once()
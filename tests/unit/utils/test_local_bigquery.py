@@ -0,0 +1,79 @@
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from app_name.utils.local_bigquery import LocalBigQueryClient, seed_database
+
+ASSIGNMENTS = '`olimpo-bi.capacity_planner_app.people_assignment`'
+
+
+@pytest.fixture
+def local_client():
+    client = LocalBigQueryClient()
+    seed_database(client, sprints=3, projects=5, members=4, seed=1)
+    yield client
+    client.close()
+
+
+def sprint_names(client):
+    query = """
+        SELECT DISTINCT calendar_sprint_str_i as sprint_name
+        FROM `olimpo-bi.sprints.luce_calendarSprint`
+        ORDER BY calendar_sprint_str_i ASC
+    """
+    return [row.sprint_name for row in client.query(query).result()]
+
+
+def test_seed_database(local_client):
+    assert local_client.has_tables()
+    assert len(sprint_names(local_client)) == 3
+
+
+def test_query_with_array_parameter(local_client):
+    sprints = sprint_names(local_client)[:2]
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter('sprints', 'STRING', sprints)])
+    result = local_client.query(f"""
+        SELECT sprint, project_id as projectId FROM {ASSIGNMENTS} WHERE sprint IN UNNEST(@sprints)
+    """, job_config=job_config).result(page_size=5)
+    assert {row['sprint'] for row in result} == set(sprints)
+    assert [len(page) for page in result.pages][0] == 5
+    assert result.to_arrow().column_names == ['sprint', 'projectId']
+
+
+def test_merge_updates_and_inserts(local_client):
+    sprint = sprint_names(local_client)[0]
+    existing = local_client.query(f"SELECT * FROM {ASSIGNMENTS} WHERE sprint = @sprint LIMIT 1", job_config=(
+        bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter('sprint', 'STRING', sprint)])
+    )).result()[0]
+    rows = [(sprint, existing['project_id'], existing['person_name'], 42), (sprint, 1, 'Nobody', 7)]
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter('rows', 'STRUCT', [
+        bigquery.StructQueryParameter(
+            None,
+            bigquery.ScalarQueryParameter('sprint', 'STRING', row[0]),
+            bigquery.ScalarQueryParameter('projectId', 'INT64', row[1]),
+            bigquery.ScalarQueryParameter('memberId', 'STRING', row[2]),
+            bigquery.ScalarQueryParameter('days', 'INT64', row[3]),
+        ) for row in rows
+    ])])
+    local_client.query(f"""
+        MERGE INTO {ASSIGNMENTS} T
+        USING (
+            SELECT r.sprint AS sprint, r.projectId AS project_id, r.memberId AS person_name, r.days AS assignment
+            FROM UNNEST(@rows) AS r
+        ) S
+        ON T.sprint = S.sprint AND T.project_id = S.project_id AND T.person_name = S.person_name
+        WHEN MATCHED THEN
+            UPDATE SET T.assignment = S.assignment
+        WHEN NOT MATCHED THEN
+            INSERT (sprint, project_id, person_name, assignment)
+            VALUES (S.sprint, S.project_id, S.person_name, S.assignment)
+    """, job_config=job_config).result()
+    cells = {(row['project_id'], row['person_name']): row['assignment']
+             for row in local_client.query(f"SELECT * FROM {ASSIGNMENTS}").result() if row['sprint'] == sprint}
+    assert cells[(existing['project_id'], existing['person_name'])] == 42
+    assert cells[(1, 'Nobody')] == 7
+
+
+def test_missing_table_raises_not_found(local_client):
+    with pytest.raises(NotFound):
+        local_client.query('SELECT * FROM `p.missing.table`').result()
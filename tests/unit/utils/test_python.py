@@ -1,6 +1,6 @@
 import pytest
 
-from app_name.utils.python import list_to_string
+from app_name.utils.python import list_to_string, sorted_distinct, to_bool
 
 
 @pytest.mark.parametrize(
@@ -17,3 +17,20 @@ def test_positive_list_to_string(expected_string, s):
     # Apply the function to test
     actual_string = list_to_string(s=s)
     assert actual_string == expected_string
+
+
+def test_sorted_distinct_skips_nulls_and_duplicates():
+    assert sorted_distinct(['b', None, 'a', 'b']) == ['a', 'b']
+
+
+def test_sorted_distinct_prepends_sentinel():
+    assert sorted_distinct(['b', 'a'], first='All') == ['All', 'a', 'b']
+    assert sorted_distinct([], first='All') == ['All']
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(True, True), (0, False), ("true", True), ("1", True), ("False", False), ("off", False), ("", False)]
+)
+def test_to_bool(value, expected):
+    assert to_bool(value) is expected
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from app_name.utils.query_runner import QueryRunner, QueryDeadlineExceeded, JobsPending, bind_results, unbind_results
+from app_name.utils.single_flight import SingleFlight
+
+
+@pytest.fixture
+def runner():
+    return QueryRunner(max_workers=4, deadline=5)
+
+
+def make_client(mocker, results, delay=0.0):
+    def query(sql, job_config=None):
+        job = mocker.MagicMock()
+
+        def result(timeout=None):
+            time.sleep(delay)
+            if isinstance(results[sql], Exception):
+                raise results[sql]
+            return results[sql]
+
+        job.result.side_effect = result
+        return job
+
+    client = mocker.MagicMock()
+    client.query.side_effect = query
+    return client
+
+
+def test_run_returns_rows_by_name(runner, mocker):
+    client = make_client(mocker, {'q1': [1, 2], 'q2': [3]})
+    results = runner.run(client, {'a': 'q1', 'b': ('q2', 'config')})
+    assert results == {'a': [1, 2], 'b': [3]}
+    client.query.assert_any_call('q2', job_config='config')
+
+
+def test_run_fetches_arrow_tables(runner, mocker):
+    result = mocker.MagicMock()
+    result.to_arrow.return_value = 'table'
+    client = make_client(mocker, {'q1': result})
+    assert runner.run(client, {'a': 'q1'}, as_arrow=True) == {'a': 'table'}
+
+
+def test_run_waits_on_jobs_concurrently(runner, mocker):
+    client = make_client(mocker, {'q1': [], 'q2': []}, delay=0.2)
+    start = time.monotonic()
+    runner.run(client, {'a': 'q1', 'b': 'q2'})
+    assert time.monotonic() - start < 0.35
+
+
+def test_run_propagates_not_found(runner, mocker):
+    client = make_client(mocker, {'q1': [], 'q2': NotFound('missing table')})
+    with pytest.raises(NotFound):
+        runner.run(client, {'a': 'q1', 'b': 'q2'})
+
+
+def test_run_raises_when_deadline_exceeded(runner, mocker):
+    client = make_client(mocker, {'q1': []}, delay=0.3)
+    with pytest.raises(QueryDeadlineExceeded):
+        runner.run(client, {'a': 'q1'}, deadline=0.05)
+
+
+def test_identical_concurrent_queries_share_one_job(mocker):
+    runner = QueryRunner(max_workers=8, deadline=5, single_flight=SingleFlight())
+    client = make_client(mocker, {'q1': [1, 2]}, delay=0.2)
+    results = [None] * 4
+
+    def request(i):
+        results[i] = runner.run(client, {'a': 'q1'})
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [{'a': [1, 2]}] * 4
+    assert client.query.call_count == 1
+    assert runner.single_flight.stats()['coalesced'] == 3
+
+
+def test_paged_runs_share_the_job_but_not_the_iterator(mocker):
+    runner = QueryRunner(max_workers=8, deadline=5, single_flight=SingleFlight())
+    job = mocker.MagicMock()
+
+    def result(timeout=None, page_size=None):
+        time.sleep(0.2)
+        return iter([[1, 2], [3]][:page_size])
+
+    job.result.side_effect = result
+    client = mocker.MagicMock()
+    client.query.return_value = job
+    results = [None] * 3
+
+    def request(i):
+        results[i] = runner.run(client, {'a': 'q1'}, page_size=2)['a']
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.query.call_count == 1
+    assert len({id(iterator) for iterator in results}) == 3
+    assert [list(iterator) for iterator in results] == [[[1, 2], [3]]] * 3
+
+
+def test_coalesced_queries_propagate_errors(mocker):
+    runner = QueryRunner(max_workers=4, deadline=5, single_flight=SingleFlight())
+    client = make_client(mocker, {'q1': [], 'q2': NotFound('missing table')})
+    with pytest.raises(NotFound):
+        runner.run(client, {'a': 'q1', 'b': 'q2'})
+
+
+def test_run_with_bound_results_raises_jobs_pending(runner, mocker):
+    client = make_client(mocker, {'q1': [1, 2], 'q2': [3]})
+    token = bind_results({})
+    try:
+        with pytest.raises(JobsPending) as pending:
+            runner.run(client, {'a': 'q1', 'b': 'q2'})
+    finally:
+        unbind_results(token)
+    assert len(pending.value.jobs) == 2
+    assert client.query.call_count == 2
+
+    ready = asyncio.run(runner.wait_async(pending.value))
+    token = bind_results(ready)
+    try:
+        assert runner.run(client, {'a': 'q1', 'b': 'q2'}) == {'a': [1, 2], 'b': [3]}
+    finally:
+        unbind_results(token)
+    assert client.query.call_count == 2
+
+
+def test_run_with_bound_results_raises_query_errors(runner, mocker):
+    client = make_client(mocker, {'q1': NotFound('missing table')})
+    token = bind_results({})
+    try:
+        with pytest.raises(JobsPending) as pending:
+            runner.run(client, {'a': 'q1'})
+        bind_results(asyncio.run(runner.wait_async(pending.value)))
+        with pytest.raises(NotFound):
+            runner.run(client, {'a': 'q1'})
+    finally:
+        unbind_results(token)
@@ -0,0 +1,58 @@
+import os
+
+import pyarrow as pa
+
+from app_name.utils.result_cache import ResultCache
+
+
+def make_tables():
+    return {'assignments': pa.table({'sprint': ['S1', 'S1'], 'days': [1.0, 2.5]}),
+            'projectCases': pa.table({'sprint': pa.array([], pa.string())})}
+
+
+def test_write_and_read(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.write('sprint-data/S1', make_tables(), version='v1')
+    tables = cache.read('sprint-data/S1', version='v1')
+    assert tables['assignments'].equals(make_tables()['assignments'])
+    assert tables['projectCases'].num_rows == 0
+    assert cache.read('sprint-data/S1', version='v2') is None
+    assert cache.read('sprint-data/S2', version='v1') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['writes'] == 1
+
+
+def test_entries_survive_the_instance_and_expire(tmp_path):
+    now = [1000.0]
+    ResultCache(str(tmp_path), clock=lambda: now[0]).write('sprints', make_tables(), version='v1')
+    cache = ResultCache(str(tmp_path), max_age=60, clock=lambda: now[0])
+    assert cache.read('sprints', version='v1') is not None
+    now[0] += 61
+    assert cache.read('sprints', version='v1') is None
+
+
+def test_take_serves_an_entry_once(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.write('sprints', make_tables(), version='v1')
+    assert cache.take('sprints', version='v1') is not None
+    assert cache.take('sprints', version='v1') is None
+
+
+def test_half_written_entries_are_ignored(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.write('sprints', make_tables(), version='v1')
+    table_path = next(path for path in os.listdir(tmp_path) if path.endswith('.assignments.arrow'))
+    with open(tmp_path / table_path, 'wb') as table_file:
+        with pa.ipc.new_file(table_file, make_tables()['assignments'].schema) as writer:
+            writer.write_table(make_tables()['assignments'])
+    assert cache.read('sprints', version='v1') is None
+
+
+def test_metadata_and_remove(tmp_path):
+    cache = ResultCache(str(tmp_path), clock=lambda: 1000.0)
+    cache.write('sprints', make_tables(), version='v1')
+    metadata = cache.metadata('sprints')
+    assert metadata['version'] == 'v1' and metadata['written_at'] == 1000.0
+    assert metadata['tables'] == ['assignments', 'projectCases']
+    assert cache.remove('sprints')
+    assert cache.metadata('sprints') is None and cache.read('sprints', version='v1') is None
+    assert not cache.remove('sprints')
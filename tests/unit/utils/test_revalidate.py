@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from app_name.utils.revalidate import Revalidator
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def revalidator(clock):
+    ages = []
+    revalidator = Revalidator(deadline=0.2, max_stale_age=60, backoff=5, max_backoff=12, on_stale=ages.append,
+                              clock=clock)
+    revalidator.ages = ages
+    return revalidator
+
+
+def test_fresh_data_ready_in_time_is_returned(revalidator):
+    assert revalidator.get('projects', lambda: 'fresh', stale=('old', 10)) == ('fresh', None)
+    assert revalidator.ages == []
+    assert revalidator.stats()['refreshes'] == 1
+
+
+def test_slow_refresh_serves_the_stale_copy_and_completes_in_background(revalidator):
+    release, done = threading.Event(), threading.Event()
+
+    def refresh():
+        release.wait(5)
+        done.set()
+        return 'fresh'
+
+    assert revalidator.get('projects', refresh, stale=('old', 10)) == ('old', 10)
+    # A second reader joins the refresh in flight instead of starting another one
+    assert revalidator.get('projects', lambda: pytest.fail('refreshed twice'), stale=('old', 11)) == ('old', 11)
+    assert revalidator.stats()['inFlight'] == 1
+    release.set()
+    assert done.wait(5)
+    assert revalidator.ages == [10, 11]
+    assert revalidator.stats()['staleServed'] == 2
+
+
+def test_without_stale_copy_the_refresh_runs_inline(revalidator):
+    assert revalidator.get('projects', lambda: 'fresh') == ('fresh', None)
+    with pytest.raises(ValueError):
+        revalidator.get('team', lambda: (_ for _ in ()).throw(ValueError('boom')))
+    # A copy older than max_stale_age is not served either
+    with pytest.raises(ValueError):
+        revalidator.get('team', lambda: (_ for _ in ()).throw(ValueError('boom')), stale=('old', 61))
+
+
+def test_inline_refresh_is_shared_and_only_removes_itself(revalidator):
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def refresh():
+        started.set()
+        release.wait(5)
+        return 'fresh'
+
+    reader = threading.Thread(target=lambda: results.append(revalidator.get('projects', refresh)))
+    reader.start()
+    assert started.wait(5)
+    # A reader with a stale copy joins the inline refresh instead of starting a second one
+    assert revalidator.get('projects', lambda: pytest.fail('refreshed twice'), stale=('old', 10)) == ('old', 10)
+    assert revalidator.stats()['inFlight'] == 1
+    release.set()
+    reader.join(5)
+    assert results == [('fresh', None)]
+    assert revalidator.stats()['inFlight'] == 0
+    assert revalidator.stats()['refreshes'] == 1
+
+
+def test_failed_refreshes_back_off(revalidator, clock):
+    calls = []
+
+    def failing():
+        calls.append(clock.now)
+        raise RuntimeError('BigQuery unavailable')
+
+    assert revalidator.get('projects', failing, stale=('old', 10)) == ('old', 10)
+    clock.now = 4
+    assert revalidator.get('projects', failing, stale=('old', 14)) == ('old', 14)
+    clock.now = 5
+    revalidator.get('projects', failing, stale=('old', 15))
+    # The second failure doubles the backoff to 10 seconds, capped by max_backoff at the third
+    clock.now = 14
+    revalidator.get('projects', failing, stale=('old', 24))
+    clock.now = 15
+    revalidator.get('projects', failing, stale=('old', 25))
+    clock.now = 26
+    revalidator.get('projects', failing, stale=('old', 36))
+    clock.now = 27
+    assert revalidator.get('projects', lambda: 'fresh', stale=('old', 37)) == ('fresh', None)
+    assert calls == [0, 5, 15]
+    assert revalidator.stats()['failures'] == 3 and revalidator.stats()['backingOff'] == 0
@@ -0,0 +1,34 @@
+import json
+
+import pyarrow as pa
+
+from app_name.utils.serializers import iter_json_document, to_columns, to_ipc_stream, to_records
+
+
+def make_tables():
+    return {
+        'a': pa.table({'sprint': ['S1', 'S2'], 'days': [1, 2]}),
+        'b': pa.table({'sprint': ['S1'], 'subteam': ['BI'], 'days': [0.5]}),
+    }
+
+
+def test_to_records():
+    assert to_records(make_tables())['a'] == [{'sprint': 'S1', 'days': 1}, {'sprint': 'S2', 'days': 2}]
+
+
+def test_to_columns():
+    assert to_columns(make_tables())['b'] == {'sprint': ['S1'], 'subteam': ['BI'], 'days': [0.5]}
+
+
+def test_to_ipc_stream_unifies_schemas_and_tags_rows():
+    table = pa.ipc.open_stream(to_ipc_stream(make_tables())).read_all()
+    assert table.column_names == ['kind', 'sprint', 'days', 'subteam']
+    assert table.column('kind').to_pylist() == ['a', 'a', 'b']
+    assert table.column('days').to_pylist() == [1.0, 2.0, 0.5]
+    assert table.column('subteam').to_pylist() == [None, None, 'BI']
+
+
+def test_iter_json_document_joins_pages():
+    chunks = list(iter_json_document({'a': iter([[{'x': 1}, {'x': 2}], [], [{'x': 3}]]), 'b': iter([[]])}))
+    assert len(chunks) > 3
+    assert json.loads(''.join(chunks)) == {'a': [{'x': 1}, {'x': 2}, {'x': 3}], 'b': []}
@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import threading
+
+import pyarrow as pa
+import pytest
+
+from app_name.utils.shared_cache import SharedResultCache
+
+
+def make_tables(value=1):
+    return {'projects': pa.table({'id': [value], 'name': ['Alpha']})}
+
+
+def test_fresh_entries_are_read_without_loading(tmp_path):
+    now = [1000.0]
+    loads = []
+    writer = SharedResultCache(str(tmp_path), clock=lambda: now[0])
+    reader = SharedResultCache(str(tmp_path), clock=lambda: now[0])
+
+    def loader():
+        loads.append(1)
+        return make_tables(len(loads))
+
+    assert writer.get_or_load('projects', 'v1', loader, ttl=60)['projects'].to_pylist()[0]['id'] == 1
+    now[0] += 30
+    assert reader.get_or_load('projects', 'v1', loader, ttl=60)['projects'].to_pylist()[0]['id'] == 1
+    assert reader.remaining('projects', ttl=60) == 30
+    assert len(loads) == 1
+
+    now[0] += 31
+    assert reader.get_or_load('projects', 'v1', loader, ttl=60)['projects'].to_pylist()[0]['id'] == 2
+    assert reader.get_or_load('projects', 'v2', loader, ttl=60)['projects'].to_pylist()[0]['id'] == 3
+    assert writer.stats()['loads'] == 1
+    assert reader.stats()['hits'] == 1 and reader.stats()['loads'] == 2 and reader.stats()['bytes'] > 0
+
+
+def test_loader_errors_are_propagated_and_not_published(tmp_path):
+    cache = SharedResultCache(str(tmp_path))
+
+    def loader():
+        raise RuntimeError('query failed')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('projects', 'v1', loader, ttl=60)
+    assert cache.get_or_load('projects', 'v1', make_tables, ttl=60)['projects'].num_rows == 1
+
+
+def test_stale_copy_is_served_while_another_thread_refreshes(tmp_path):
+    now = [1000.0]
+    cache = SharedResultCache(str(tmp_path), clock=lambda: now[0])
+    cache.get_or_load('projects', 'v1', make_tables, ttl=60)
+    now[0] += 61
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return make_tables(2)
+
+    refresher = threading.Thread(target=cache.get_or_load, args=('projects', 'v1', slow_loader, 60))
+    refresher.start()
+    started.wait(5)
+    stale = cache.get_or_load('projects', 'v1', lambda: pytest.fail('refreshed twice'), ttl=60)
+    release.set()
+    refresher.join()
+    assert stale['projects'].to_pylist()[0]['id'] == 1
+    assert cache.get_or_load('projects', 'v1', make_tables, ttl=60)['projects'].to_pylist()[0]['id'] == 2
+    assert cache.stats()['staleHits'] == 1
+
+
+def load_in_process(directory, barrier, loads_path):
+    def loader():
+        with open(loads_path, 'a') as loads:
+            loads.write(f'{os.getpid()}\n')
+        return make_tables()
+
+    barrier.wait()
+    SharedResultCache(directory).get_or_load('projects', 'v1', loader, ttl=60)
+
+
+def test_one_process_loads_a_missing_entry(tmp_path):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(4)
+    loads_path = str(tmp_path / 'loads.txt')
+    processes = [context.Process(target=load_in_process, args=(str(tmp_path / 'shared'), barrier, loads_path))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0] * 4
+    with open(loads_path) as loads:
+        assert len(loads.readlines()) == 1
+
+
+def test_invalidate(tmp_path):
+    cache = SharedResultCache(str(tmp_path))
+    cache.get_or_load('projects', 'v1', make_tables, ttl=60)
+    assert cache.invalidate('projects')
+    assert cache.remaining('projects', ttl=60) == 0
+    cache.get_or_load('projects', 'v1', make_tables, ttl=60)
+    assert cache.stats()['loads'] == 2
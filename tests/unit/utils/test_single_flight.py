@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+from google.cloud import bigquery
+
+from app_name.utils.single_flight import SingleFlight, query_key
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'rows'
+
+    results, _ = run_concurrently(5, lambda: flight.do('k', work))
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {'rows'}
+    assert flight.stats() == {'executions': 1, 'coalesced': 4, 'errors': 0, 'inFlight': 0}
+
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError('boom')
+
+    _, errors = run_concurrently(3, lambda: flight.do('k', fail))
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.stats()['errors'] == 1
+    assert flight.do('k', lambda: 'ok') == ('ok', False)
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do('k', lambda: 1) == (1, False)
+    assert flight.do('k', lambda: 2) == (2, False)
+    assert flight.stats()['coalesced'] == 0
+
+
+def test_waiting_caller_times_out():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        return 1
+
+    leader = threading.Thread(target=flight.do, args=('k', slow))
+    leader.start()
+    started.wait()
+    with pytest.raises(TimeoutError):
+        flight.do('k', slow, timeout=0.05)
+    leader.join()
+
+
+def test_query_key_normalizes_whitespace_outside_literals():
+    assert query_key('SELECT a\n  FROM t ') == query_key('SELECT a FROM t')
+    assert query_key("SELECT 'a  b'") != query_key("SELECT 'a b'")
+    assert query_key('SELECT 1', as_arrow=True) != query_key('SELECT 1', as_arrow=False)
+
+
+def test_query_key_includes_parameters():
+    def config(value):
+        return bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter('s', 'STRING', value)])
+
+    assert query_key('SELECT @s', config('S1')) == query_key('SELECT  @s', config('S1'))
+    assert query_key('SELECT @s', config('S1')) != query_key('SELECT @s', config('S2'))
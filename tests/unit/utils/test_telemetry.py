@@ -0,0 +1,93 @@
+import contextvars
+import json
+import os
+import threading
+
+from app_name.utils.telemetry import Telemetry, current_endpoint
+
+
+def make_telemetry(directory=None):
+    telemetry = Telemetry(directory=directory)
+    telemetry.counter('requests_total', 'Requests.')
+    telemetry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+    return telemetry
+
+
+def test_counters_from_many_threads_are_summed():
+    telemetry = make_telemetry()
+
+    def work():
+        for _ in range(1000):
+            telemetry.inc('requests_total', {'endpoint': '/a'})
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert telemetry.snapshot() == {('requests_total', (('endpoint', '/a'),)): 8000}
+
+
+def test_render_histogram_in_prometheus_format():
+    telemetry = make_telemetry()
+    for value in (0.05, 0.5, 5):
+        telemetry.observe('latency_seconds', {'endpoint': '/a'}, value)
+    lines = telemetry.render().splitlines()
+    assert '# TYPE latency_seconds histogram' in lines
+    assert 'latency_seconds_bucket{endpoint="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{endpoint="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{endpoint="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{endpoint="/a"} 5.55' in lines
+    assert 'latency_seconds_count{endpoint="/a"} 3' in lines
+
+
+def test_phase_is_labelled_with_the_endpoint_of_copied_contexts():
+    telemetry = make_telemetry()
+    telemetry.histogram('app_phase_duration_seconds', 'Phases.')
+    with telemetry.endpoint('/api/x'):
+        context = contextvars.copy_context()
+    assert current_endpoint() == 'none'
+
+    def timed():
+        with telemetry.phase('bigquery_wait'):
+            pass
+
+    thread = threading.Thread(target=context.run, args=(timed,))
+    thread.start()
+    thread.join()
+    (key, value), = telemetry.snapshot().items()
+    assert key == ('app_phase_duration_seconds', (('endpoint', '/api/x'), ('phase', 'bigquery_wait')))
+    assert value[-1] == 1
+
+
+def test_collect_sums_the_files_of_other_processes(tmp_path):
+    telemetry = make_telemetry(str(tmp_path))
+    telemetry.inc('requests_total', {'endpoint': '/a'}, 2)
+    # Written by another worker that is still running (our parent process)
+    with open(tmp_path / f'metrics-{os.getppid()}.json', 'w') as metrics_file:
+        json.dump([['requests_total', [['endpoint', '/a']], 3]], metrics_file)
+    assert 'requests_total{endpoint="/a"} 5' in telemetry.render().splitlines()
+
+    telemetry.flush()
+    assert (tmp_path / f'metrics-{os.getpid()}.json').exists()
+    # The own file is not counted twice
+    assert 'requests_total{endpoint="/a"} 5' in telemetry.render().splitlines()
+
+
+def test_files_of_finished_processes_are_removed(tmp_path):
+    stale = tmp_path / 'metrics-999999999.json'
+    stale.write_text('[]')
+    telemetry = make_telemetry(str(tmp_path))
+    assert stale.exists()
+    telemetry.start()
+    assert not stale.exists()
+
+
+def test_unwritable_directory_keeps_metrics_in_process(tmp_path, mocker):
+    mocker.patch('os.makedirs', side_effect=OSError(30, 'Read-only file system'))
+    telemetry = make_telemetry(str(tmp_path / 'metrics'))
+    telemetry.start()
+    assert telemetry.directory is None
+    telemetry.inc('requests_total', {'endpoint': '/a'})
+    telemetry.flush()
+    assert 'requests_total{endpoint="/a"} 1' in telemetry.render().splitlines()
@@ -39,3 +39,14 @@ def test_get_date_sub_path_returns_correct_path():
     result = io.get_date_sub_path("myfile")
     result = re.match(r'\d+/\d+/\d+/myfile', result)
     assert result is not None
+
+
+def test_fetch_env_variable_or_default_returns_default_when_not_set(config):
+    result = io.fetch_env_variable_or_default(config, "FAKE", 42)
+    assert result == 42
+
+
+def test_fetch_env_variable_or_default_casts_value(config, monkeypatch):
+    monkeypatch.setenv("FAKE_NUMBER", "15")
+    result = io.fetch_env_variable_or_default(config, "FAKE_NUMBER", 0, int)
+    assert result == 15
@@ -0,0 +1,88 @@
+import pytest
+
+from app_name.utils.write_behind import WriteBehindBuffer
+
+
+def key_fn(kind, row):
+    return row['sprint'], row['projectId'], row['memberId']
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'journal' / 'edits.journal')
+
+
+@pytest.fixture
+def flush_fn(mocker):
+    return mocker.MagicMock()
+
+
+@pytest.fixture
+def buffer(journal_path, flush_fn):
+    buffer = WriteBehindBuffer(journal_path, flush_fn=flush_fn, key_fn=key_fn, flush_interval=60)
+    yield buffer
+    buffer.stop()
+
+
+def edit(days, member='Ana'):
+    return {'sprint': 'S1', 'projectId': 1, 'memberId': member, 'days': days}
+
+
+def test_submit_journals_and_coalesces(buffer, journal_path):
+    buffer.submit('assignment', [edit(1)])
+    buffer.submit('assignment', [edit(2), edit(3, member='Luis')])
+    with open(journal_path) as journal:
+        assert len(journal.readlines()) == 3
+    assert sorted(row['days'] for row in buffer.pending_rows('assignment')) == [2, 3]
+
+
+def test_flush_writes_pending_edits_and_compacts_journal(buffer, flush_fn, journal_path):
+    buffer.submit('assignment', [edit(1), edit(2)])
+    assert buffer.flush() == 1
+    flush_fn.assert_called_once_with('assignment', [edit(2)])
+    with open(journal_path) as journal:
+        assert journal.read() == ''
+    assert buffer.stats() == {'pending': 0, 'flushed': 1, 'failed_flushes': 0}
+
+
+def test_failed_flush_keeps_edits_pending(buffer, flush_fn):
+    flush_fn.side_effect = Exception("BigQuery unavailable")
+    buffer.submit('assignment', [edit(1)])
+    assert buffer.flush() == 0
+    assert buffer.pending_rows('assignment') == [edit(1)]
+    assert buffer.stats()['failed_flushes'] == 1
+
+
+def test_edits_being_flushed_stay_visible_until_written(buffer, flush_fn):
+    seen = []
+
+    def merge(kind, rows):
+        # A read during the MERGE, after a newer edit of another cell
+        buffer.submit('assignment', [edit(3, member='Luis')])
+        seen.append(buffer.pending_rows('assignment'))
+
+    flush_fn.side_effect = merge
+    buffer.submit('assignment', [edit(1)])
+    assert buffer.flush() == 1
+    assert seen == [[edit(1), edit(3, member='Luis')]]
+    assert buffer.pending_rows('assignment') == [edit(3, member='Luis')]
+
+
+def test_start_replays_unflushed_journal(journal_path, flush_fn, buffer):
+    buffer.submit('assignment', [edit(1), edit(4)])
+    with open(journal_path, 'a') as journal:
+        journal.write('{"kind": "assignment", "row"')  # torn write
+    restarted = WriteBehindBuffer(journal_path, flush_fn=flush_fn, key_fn=key_fn, flush_interval=60)
+    restarted.start()
+    assert restarted.pending_rows('assignment') == [edit(4)]
+    restarted.stop()
+    flush_fn.assert_called_once_with('assignment', [edit(4)])
+
+
+def test_check_journal_fails_when_journal_is_not_writable(journal_path, flush_fn, mocker):
+    buffer = WriteBehindBuffer(journal_path, flush_fn=flush_fn, key_fn=key_fn)
+    mocker.patch('app_name.utils.write_behind.os.access', return_value=False)
+    with pytest.raises(OSError, match='not writable'):
+        buffer.check_journal()
+    with pytest.raises(OSError):
+        buffer.start()